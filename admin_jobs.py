@@ -0,0 +1,196 @@
+"""Bulk admin operations on teams, run in the background.
+
+Ending a game used to mean flipping ``status`` to ``'offline'`` on each
+``leaderboard`` document by hand, hundreds of single updates at the
+busiest moment of an event. ``POST /admin/jobs`` instead starts one of
+
+    set_status     set every selected team's status ('online' or 'offline');
+                   offline teams keep it while playing and score nothing
+    reset_scores   zero totalPoints, wins and gamesPlayed
+    close_rounds   end the round each team is playing; answers and hints
+                   for it are refused and the next /game starts a new one
+
+for a list of teams or all of them. The request returns at once with the
+job; a one-thread executor applies it to the local store in a single
+transaction (so /api/status and the leaderboard change immediately) and
+then writes Firestore in batches of ``MAX_BATCH_WRITES`` updates, one
+commit per 500 teams. Progress is recorded in the local store after every
+batch, so any worker can answer ``GET /admin/jobs/<id>``.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core.exceptions import NotFound
+
+from local_store import COUNTER_FIELDS
+from score_writer import MAX_BATCH_WRITES
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('set_status', 'reset_scores', 'close_rounds')
+STATUSES = ('online', 'offline')
+
+
+def job_document(row):
+    """A job row as returned by the admin API"""
+    return {
+        'id': row['id'],
+        'action': row['action'],
+        'state': row['state'],
+        'total': row['total'],
+        'done': row['done'],
+        'failed': row['failed'],
+        'batches': row['batches'],
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+class AdminJobs:
+    """Runs admin jobs one at a time on a background thread.
+
+    ``storage`` is the app's ``storage.FirestoreStorage`` (unavailable in
+    offline mode). ``on_rows`` receives the local leaderboard rows a job changed, so the
+    app can update its in-memory views.
+    """
+
+    def __init__(self, store, storage, on_rows=None):
+        self._store = store
+        self._storage = storage
+        self._on_rows = on_rows
+        self._executor = None
+        self._lock = threading.Lock()
+        self.commits = 0
+
+    def submit(self, action, teams=None, status=None):
+        """Queue a job for teams (a list of names, or None for every team); returns its row.
+
+        Raises ValueError for an unknown action, status or team list.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+        if action == 'set_status' and status not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+        if teams is not None:
+            if not isinstance(teams, list) or not all(isinstance(name, str) and name for name in teams):
+                raise ValueError("teams must be a list of team names")
+            teams = list(dict.fromkeys(teams))
+        params = {'teams': teams, 'status': status}
+        job_id = uuid.uuid4().hex[:12]
+        row = self._store.create_admin_job(job_id, action, params)
+        # Created on first use: the gunicorn master must not fork with a live thread
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='admin-jobs')
+        self._executor.submit(self.run, job_id, action, params)
+        logger.info("🛠️ Admin job %s queued: %s for %s teams", job_id, action,
+                    'all' if teams is None else len(teams))
+        return row
+
+    def get(self, job_id):
+        return self._store.get_admin_job(job_id)
+
+    def recent(self, limit=20):
+        return self._store.admin_jobs(limit)
+
+    def run(self, job_id, action, params):
+        """Apply a job locally, then to Firestore; records progress and never raises"""
+        started = time.perf_counter()
+        try:
+            self._store.update_admin_job(job_id, state='running')
+            online = self._storage.available
+            targets = self._targets(online, params['teams'])
+            self._store.update_admin_job(job_id, total=len(targets))
+            team_names = list(targets)
+
+            if action == 'close_rounds':
+                # Rounds only live in the local store
+                self._store.close_rounds(team_names, time.time())
+                self._store.update_admin_job(job_id, state='done', done=len(team_names))
+                return
+
+            if action == 'set_status':
+                update = {'status': params['status']}
+                rows = self._store.set_status(team_names, params['status'])
+            else:
+                update = {field: 0 for field in COUNTER_FIELDS.values()}
+                rows = self._store.reset_counters(team_names)
+            if self._on_rows is not None:
+                self._on_rows(rows)
+
+            if not online:
+                self._store.update_admin_job(job_id, state='done', done=len(team_names))
+                return
+            # Teams without a Firestore document have nothing to update there
+            self._store.update_admin_job(job_id, done=sum(targets[name] is None for name in team_names))
+            writes = [(name, targets[name]) for name in team_names if targets[name] is not None]
+            failed = self._commit(job_id, writes, update)
+            self._store.update_admin_job(job_id, state='failed' if failed else 'done',
+                                         error=f"{failed} teams not updated in Firestore" if failed else None)
+        except Exception as e:
+            logger.exception("❌ Admin job %s failed: %s", job_id, e)
+            self._store.update_admin_job(job_id, state='failed', error=str(e))
+        finally:
+            logger.info("🛠️ Admin job %s (%s) finished in %.0f ms", job_id, action,
+                        (time.perf_counter() - started) * 1000)
+
+    def _targets(self, online, teams):
+        """{team_name: firestore document id or None} for the job's teams.
+
+        Document ids come from the local mirror. If some are unknown (or
+        the job is for every team), the leaderboard collection is read once
+        to find them, instead of a query per team.
+        """
+        targets = {row['team_name']: row['firestore_id'] for row in self._store.team_rows(teams)}
+        if teams is not None:
+            targets = {name: targets.get(name) for name in teams}
+        if online and (teams is None or None in targets.values()):
+            for snapshot in self._storage.leaderboard():
+                name = (snapshot.to_dict() or {}).get('name')
+                if name and (teams is None or name in targets):
+                    targets[name] = snapshot.id
+        return targets
+
+    def _commit(self, job_id, writes, update):
+        """Send update to every (team_name, document id) in batches; returns how many failed"""
+        failed_total = 0
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            chunk = writes[start:start + MAX_BATCH_WRITES]
+            try:
+                self._storage.write_teams([('update', doc_id, update) for _, doc_id in chunk])
+                self.commits += 1
+                failed = 0
+            except NotFound:
+                # One deleted document fails the whole batch; retry one by one
+                failed = self._update_individually(chunk, update)
+            except Exception as e:
+                logger.warning("❌ Admin batch commit failed: %s", e)
+                failed = len(chunk)
+            failed_total += failed
+            self._store.update_admin_job(job_id, done=len(chunk) - failed, failed=failed, batches=1)
+        return failed_total
+
+    def _update_individually(self, chunk, update):
+        failed = 0
+        for team_name, doc_id in chunk:
+            try:
+                self._storage.update_team(doc_id, update)
+            except NotFound:
+                # Nothing left to change in Firestore
+                logger.warning("⚠️ Leaderboard doc %s for %s is gone, skipping", doc_id, team_name)
+                self._store.set_firestore_id(team_name, None)
+            except Exception as e:
+                logger.warning("❌ Admin update for %s failed: %s", team_name, e)
+                failed += 1
+        return failed
+
+    def close(self, wait=True):
+        """Stop the job thread, after the queued jobs if wait"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,248 @@
+"""Server-side answer checking.
+
+Answers used to be compared in the browser with ``toLowerCase().trim()``
+against an answer embedded in the page. ``AnswerIndex`` maps every question
+id to the set of normalized answers it accepts, so checking a guess is one
+normalization plus a set lookup. Each image's entries are built the first
+time one of its questions is checked (or all at once with ``warm``), which
+keeps worker start-up as fast as opening the question bank.
+
+Guesses that are not an exact match get a second, fuzzy pass: the guess
+counts if it has the same words as an accepted answer in any order, or is
+within a few typos of one (see ``typo_budget``). Numbers never fuzz, so
+"1948" is still wrong for "1947", and a guess that is exactly another
+question's answer on the same image ("Penicillium" for "Penicillin") is
+never fuzzed into a match. Fuzzy verdicts are kept in an LRU keyed
+by (question id, normalized guess), since players resubmit the same miss.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from cache import TTLCache
+from question_bank import parse_qid
+
+# Each revealed hint costs this fraction of the question's base points
+HINT_PENALTY = 0.25
+
+_ARTICLES = {'a', 'an', 'the'}
+# Parenthesised notes that are not an alternative answer by themselves
+_NOTE_WORDS = {'reported', 'approx', 'approximately', 'est', 'estimated', 'disputed'}
+_DIGIT_GROUP = re.compile(r'(?<=\d)[,\s](?=\d{3}\b)')
+_APOSTROPHES = re.compile(r"[’'`]")
+_NON_WORD = re.compile(r'[\W_]+')
+_PARENTHESIS = re.compile(r'^(.*?)\s*\(([^()]*)\)\s*(.*)$')
+
+# One accepted answer, precomputed for fuzzy comparison
+Candidate = namedtuple('Candidate', 'text tokens sorted_text numbers budget')
+
+
+def normalize_answer(text):
+    """Fold case, accents and punctuation so equivalent answers compare equal.
+
+    "The Story of My Experiments with Truth!" and "story of my experiments
+    with truth" normalize the same; articles are dropped unless the answer
+    is nothing but articles.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = text.replace('&', ' and ')
+    text = _DIGIT_GROUP.sub('', text)
+    text = _APOSTROPHES.sub('', text)
+    tokens = _NON_WORD.sub(' ', text).split()
+    words = [t for t in tokens if t not in _ARTICLES]
+    return ' '.join(words or tokens)
+
+
+def answer_variants(answer):
+    """The answer plus the alternatives it spells out.
+
+    "Affordable Care Act (Obamacare)" also accepts either part, and
+    "Prime Minister / President of Cuba" accepts either side of the slash.
+    """
+    variants = [answer]
+    match = _PARENTHESIS.match(answer)
+    if match:
+        outside = f"{match.group(1)} {match.group(3)}".strip()
+        inside = match.group(2).strip()
+        if outside:
+            variants.append(outside)
+        if inside and not inside.isdigit() and inside.casefold() not in _NOTE_WORDS:
+            variants.append(inside)
+    if ' / ' in answer:
+        variants.extend(part.strip() for part in answer.split(' / ') if part.strip())
+    return variants
+
+
+def typo_budget(length):
+    """Edits allowed against an answer of ``length`` normalized characters"""
+    if length <= 4:
+        return 0
+    if length <= 9:
+        return 1
+    if length <= 19:
+        return 2
+    return 3
+
+
+def bounded_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 if it exceeds limit.
+
+    Only the diagonal band of width ``limit`` is computed, and the scan stops
+    as soon as every cell in a row is over the limit.
+    """
+    if a == b:
+        return 0
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > limit:
+        return limit + 1
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        lo = max(1, i - limit)
+        hi = min(len_b, i + limit)
+        current = [over] * (len_b + 1)
+        current[0] = i if i <= limit else over
+        char_a = a[i - 1]
+        row_min = current[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if cost > over:
+                cost = over
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return previous[len_b]
+
+
+def make_candidate(normalized):
+    tokens = normalized.split()
+    return Candidate(
+        text=normalized,
+        tokens=frozenset(tokens),
+        sorted_text=' '.join(sorted(tokens)),
+        numbers=frozenset(t for t in tokens if any(c.isdigit() for c in t)),
+        budget=typo_budget(len(normalized)),
+    )
+
+
+def fuzzy_match(normalized_guess, candidates):
+    """True if the guess is the same words or within typo budget of a candidate"""
+    tokens = normalized_guess.split()
+    if not tokens:
+        return False
+    token_set = frozenset(tokens)
+    numbers = frozenset(t for t in tokens if any(c.isdigit() for c in t))
+    sorted_guess = None
+    for candidate in candidates:
+        if numbers != candidate.numbers:
+            continue
+        if token_set == candidate.tokens:
+            return True
+        budget = candidate.budget
+        if not budget or abs(len(normalized_guess) - len(candidate.text)) > budget:
+            continue
+        if bounded_distance(normalized_guess, candidate.text, budget) <= budget:
+            return True
+        if sorted_guess is None:
+            sorted_guess = ' '.join(sorted(tokens))
+        if bounded_distance(sorted_guess, candidate.sorted_text, budget) <= budget:
+            return True
+    return False
+
+
+def accepted_answers(question):
+    """Normalized answers accepted for a question_bank.Question"""
+    accepted = set()
+    for text in answer_variants(question.answer) + list(question.aliases):
+        normalized = normalize_answer(text)
+        if normalized:
+            accepted.add(normalized)
+    return frozenset(accepted)
+
+
+def score_for(base_points, hints_used):
+    """Points for a correct answer after the hint penalty (never below 1)"""
+    return max(1, int(base_points - base_points * HINT_PENALTY * hints_used))
+
+
+class AnswerIndex:
+    """question id -> (accepted normalized answers, base points, fuzzy candidates)"""
+
+    def __init__(self, bank, verdict_cache_size=8192):
+        self._bank = bank
+        self._entries = {}
+        self._built_images = set()
+        # image key -> normalized answers accepted by any of its questions
+        self._image_answers = {}
+        # Verdicts only change when the bank does, so the TTL is just a backstop
+        self.verdicts = TTLCache(maxsize=verdict_cache_size, ttl=3600)
+
+    def _build_image(self, image_key):
+        entries = {}
+        for question in self._bank.questions(image_key):
+            accepted = accepted_answers(question)
+            candidates = tuple(make_candidate(text) for text in sorted(accepted))
+            entries[question.qid] = (accepted, question.points, candidates)
+        self._image_answers[image_key] = frozenset().union(*(entry[0] for entry in entries.values()))
+        self._entries.update(entries)
+        self._built_images.add(image_key)
+
+    def _entry(self, qid):
+        entry = self._entries.get(qid)
+        if entry is None:
+            try:
+                image_key, _ = parse_qid(qid)
+            except ValueError:
+                raise KeyError(qid) from None
+            if image_key in self._built_images or image_key not in self._bank:
+                raise KeyError(qid)
+            self._build_image(image_key)
+            entry = self._entries.get(qid)
+            if entry is None:
+                raise KeyError(qid)
+        return entry
+
+    def warm(self):
+        """Build entries for every image up front"""
+        for image_key in self._bank.image_keys():
+            if image_key not in self._built_images:
+                self._build_image(image_key)
+
+    def __contains__(self, qid):
+        try:
+            self._entry(qid)
+        except KeyError:
+            return False
+        return True
+
+    def base_points(self, qid):
+        return self._entry(qid)[1]
+
+    def check(self, qid, guess, fuzzy=True):
+        """True if guess is an accepted answer for qid; KeyError if unknown"""
+        accepted, _, candidates = self._entry(qid)
+        normalized = normalize_answer(guess)
+        if normalized in accepted:
+            return True
+        if not fuzzy or not normalized:
+            return False
+        key = (qid, normalized)
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            image_key, _ = parse_qid(qid)
+            verdict = (normalized not in self._image_answers[image_key]
+                       and fuzzy_match(normalized, candidates))
+            self.verdicts.set(key, verdict)
+        return verdict
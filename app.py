@@ -1,81 +1,112 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore
+# Created before the heavy imports (Flask, firebase_admin) so they are timed too
+from startup import StartupReport
+STARTUP = StartupReport()
+
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, abort, \
+    stream_with_context
+import gc
+import hashlib
+import hmac
 import json
+import logging
 import sqlite3
 import os
+import secrets
 from functools import wraps
-import random
+import time
+from log_config import configure_logging, init_request_ids
+from metrics import REGISTRY, TEMPLATE_RENDER, init_request_metrics, instrument_firestore
+from assets import init_assets, compress_html
+from question_bank import load_question_bank, parse_qid
+from cache import TTLCache, BytesLRUCache
+from status_feed import StatusHub, status_payload
+from score_writer import ScoreWriter
+from local_store import LocalStore, default_store_path, team_document
+from answers import AnswerIndex, score_for
+from fragments import QuestionFragments
+from image_variants import FORMATS, ImageVariants, preferred_format, variant_etag
+import progress
+from progress import ProgressWriter
+from scheduler import Scheduler, new_seed
+from firestore_pool import FirestorePool
+from storage import FirestoreStorage, connect, participant_team_name
+from ranking import Ranking
+from participants import ParticipantIndex
+from admin_jobs import AdminJobs, job_document
+import export
+import calibration
+from events import EventWriter, MAX_EVENTS_PER_REQUEST, parse_events, server_event
+
+configure_logging()
+logger = logging.getLogger('app')
+STARTUP.mark('imports')
 
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'
-
-# Initialize Firebase
-try:
-    # Support multiple ways to provide credentials:
-    # - FIREBASE_CREDENTIALS_PATH : path to service-account JSON file
-    # - FIREBASE_CREDENTIALS_JSON : full JSON content as env var
-    # - FIREBASE_CREDENTIALS : legacy; can be either a path or the JSON string
-    legacy_env = os.environ.get('FIREBASE_CREDENTIALS')
-    firebase_cred_path = os.environ.get('FIREBASE_CREDENTIALS_PATH') or legacy_env
-    firebase_cred_json = os.environ.get('FIREBASE_CREDENTIALS_JSON')
-
-    # If legacy env looks like JSON (starts with '{'), prefer it as JSON
-    if not firebase_cred_json and legacy_env and legacy_env.strip().startswith('{'):
-        firebase_cred_json = legacy_env
-
-    cred = None
-
-    # Try file path first (if provided and exists)
-    if firebase_cred_path and os.path.exists(firebase_cred_path):
-        cred = credentials.Certificate(firebase_cred_path)
-        firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        print(f"✅ Firebase initialized successfully with file: {firebase_cred_path}")
-
-    # Otherwise, try JSON content (but avoid parsing empty strings)
-    elif firebase_cred_json and firebase_cred_json.strip():
-        try:
-            cred_dict = json.loads(firebase_cred_json)
-            cred = credentials.Certificate(cred_dict)
-            firebase_admin.initialize_app(cred)
-            db = firestore.client()
-            print("✅ Firebase initialized successfully from JSON environment variable")
-        except Exception as inner_e:
-            print(f"❌ Failed to parse FIREBASE_CREDENTIALS_JSON: {inner_e}")
-            db = None
+# The session names the team, so its signing key must not be guessable.
+# Without SECRET_KEY a random key is used: sessions end when the server
+# restarts, and gunicorn workers only share it when forked from a preloaded app.
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    logger.warning("⚠️ SECRET_KEY is not set; using a random session key for this process")
+    app.secret_key = secrets.token_hex(32)
+init_request_ids(app)
+# Per-endpoint latency and Firestore call counts at /metrics
+init_request_metrics(app, token=os.environ.get('METRICS_TOKEN'))
+# Fingerprinted, precompressed CSS/JS at /assets (asset_url() in templates)
+ASSETS = init_assets(app)
+app.after_request(compress_html)
 
-    else:
-        print("⚠️ No valid Firebase credentials provided. Set FIREBASE_CREDENTIALS_PATH (file) or FIREBASE_CREDENTIALS_JSON (JSON string).")
-        print("🚫 Using mock data mode")
-        db = None
-
-except Exception as e:
-    print(f"❌ Firebase initialization failed: {e}")
-    print("🚫 Using mock data mode")
-    db = None
-
-# Initialize SQLite
-def init_sqlite():
-    conn = sqlite3.connect('game.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS game_progress
-                 (team_name TEXT, current_image INTEGER, completed_images TEXT, 
-                  current_score INTEGER, hints_used INTEGER)''')
-    conn.commit()
-    conn.close()
-
-init_sqlite()
-
-# Load game data and count images
-with open("data.json", "r", encoding="utf-8") as f:
-    game_data = json.load(f)
+# Initialize Firebase (or the fake backend / offline mode, see storage.py)
+db = connect()
+
+# Count every Firestore call against the endpoint that made it
+db = instrument_firestore(db)
+STARTUP.mark('firestore config')
+
+# Routes make their Firestore calls through this; it always uses the current db
+STORAGE = FirestoreStorage(lambda: db)
+
+# Participant codes, loaded in bulk and kept fresh by a listener, so login
+# and team lookups don't query Firestore
+PARTICIPANTS = ParticipantIndex()
+
+# Puts a deadline on login's Firestore bootstrap (one batched write since it
+# was folded into a single call): a stalled backend can't hold the request
+# thread, and a late write finishes in the pool. One call per request
+# thread at most, so sized like GUNICORN_THREADS (see gunicorn.conf.py)
+FIRESTORE_POOL = FirestorePool(max_workers=int(os.environ.get('FIRESTORE_POOL_SIZE',
+                                                              os.environ.get('GUNICORN_THREADS', 16))),
+                               timeout=float(os.environ.get('FIRESTORE_TIMEOUT', 10)))
+
+# Initialize SQLite: local leaderboard/progress store (path from GAME_DB_PATH)
+LOCAL_STORE = LocalStore(default_store_path())
+STARTUP.mark('local store')
+
+# Load game data and count images. data.json is compiled into data.bank on
+# first start (or after it changes); workers share the memory-mapped bank.
+QUESTION_BANK = load_question_bank("data.json", "data.bank")
+# Normalized accepted answers per question id, for /api/submit_answer
+ANSWER_INDEX = AnswerIndex(QUESTION_BANK)
+STARTUP.mark('question bank')
+
+# Resized AVIF/WebP/JPEG copies of static/LAUGH, served from /media with
+# content-hashed names; missing ones are built in the background on first use
+IMAGE_VARIANTS = ImageVariants('static', os.environ.get('IMAGE_VARIANTS_DIR', 'variants'))
+# Variant URLs change whenever their bytes do, so browsers may keep them forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Hot variant bytes (the images just offered on /image-select, recent games)
+IMAGE_BYTES = BytesLRUCache(max_bytes=int(os.environ.get('IMAGE_CACHE_BYTES', 32 * 1024 * 1024)))
+
+# Rendered question cards, so /game only fills in positions per request.
+# Room for every card, so warm_caches() can render them all up front
+QUESTION_FRAGMENTS = QuestionFragments(app.jinja_env, maxsize=max(4096, QUESTION_BANK.question_total))
+STARTUP.mark('image variants')
 
 # Get available image numbers from actual data.json keys
 def get_available_images():
-    """Get list of image numbers that actually exist in game_data"""
+    """Get list of image numbers that actually exist in the question bank"""
     available_images = []
-    for key in game_data.keys():
+    for key in QUESTION_BANK.image_keys():
         if key.startswith('LAUGH/'):
             try:
                 # Extract number from "LAUGH/050.jpg"
@@ -89,9 +120,13 @@ def get_available_images():
 # Get available images
 AVAILABLE_IMAGES = get_available_images()
 TOTAL_AVAILABLE_IMAGES = len(AVAILABLE_IMAGES)
-print(f"🎯 Total images in data.json: {len(game_data.keys())}")
-print(f"📊 Available image numbers: {TOTAL_AVAILABLE_IMAGES}")
-print(f"🔢 Image range: {min(AVAILABLE_IMAGES) if AVAILABLE_IMAGES else 0} - {max(AVAILABLE_IMAGES) if AVAILABLE_IMAGES else 0}")
+logger.info("🎯 %d images in data.json, %d available (numbers %d-%d)",
+            len(QUESTION_BANK), TOTAL_AVAILABLE_IMAGES,
+            min(AVAILABLE_IMAGES) if AVAILABLE_IMAGES else 0,
+            max(AVAILABLE_IMAGES) if AVAILABLE_IMAGES else 0)
+
+# Per-team shuffled order of images and questions (seed + cursor per team)
+SCHEDULER = Scheduler(AVAILABLE_IMAGES)
 
 # Login required decorator
 def login_required(f):
@@ -102,21 +137,199 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# /admin routes need Authorization: Bearer <ADMIN_TOKEN>; without it set they don't exist
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
-def resolve_team_name_from_participants():
-    """Return the authoritative team name using session['unique_code'] when possible."""
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {ADMIN_TOKEN}"):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# unique_code -> [team_name, leaderboard DocumentReference or None].
+# Shared by every route so /api/status polling doesn't re-query participants.
+TEAM_CACHE = TTLCache(maxsize=2048, ttl=300)
+REGISTRY.register_cache('team', TEAM_CACHE)
+REGISTRY.register_cache('answer_verdicts', ANSWER_INDEX.verdicts)
+REGISTRY.register_cache('image_bytes', IMAGE_BYTES)
+REGISTRY.register_cache('question_fragments', QUESTION_FRAGMENTS.cache)
+
+
+def resolve_team(with_ref=True):
+    """Return (team_name, leaderboard_ref) for the session's team.
+
+    The team name comes from the participants collection (by unique code)
+    and the leaderboard reference from a lookup by that name; both are
+    cached per unique_code. leaderboard_ref is None in mock mode, when the
+    team has no leaderboard document yet, or when with_ref is False.
+    """
     team_name = session.get('team_name')
     unique_code = session.get('unique_code')
-    if db is not None and unique_code:
+    if not STORAGE.available or not unique_code:
+        return team_name, None
+
+    entry = TEAM_CACHE.get(unique_code)
+    if entry is None:
+        try:
+            participant = find_participant(unique_code)
+            if participant is not None:
+                team_name = participant_team_name(participant.to_dict(), team_name)
+        except Exception as e:
+            logger.warning("Firestore participants lookup error in resolve_team: %s", e)
+            return team_name, None
+        entry = [team_name, None]
+        TEAM_CACHE.set(unique_code, entry)
+
+    if with_ref and entry[1] is None:
         try:
-            participants_ref = db.collection('participants')
-            p_query = participants_ref.where('uniqueCode', '==', unique_code).limit(1).get()
-            if len(p_query) == 1:
-                p_data = p_query[0].to_dict()
-                return p_data.get('teamName') or p_data.get('team_name') or p_data.get('name') or team_name
+            entry[1] = find_leaderboard_ref(entry[0])
         except Exception as e:
-            print(f"Firestore participants lookup error in resolve_team_name: {e}")
-    return team_name
+            logger.warning("Firestore leaderboard lookup error in resolve_team: %s", e)
+    return entry[0], entry[1]
+
+
+def find_participant(unique_code):
+    """The participant's snapshot or None: from the roster index once loaded, else a query"""
+    if PARTICIPANTS.ready:
+        return PARTICIPANTS.get(unique_code)
+    return STORAGE.find_participant(unique_code)
+
+
+def find_leaderboard_ref(team_name):
+    """The team's leaderboard document, or None if it has none.
+
+    Once the leaderboard listener has mirrored the collection, the local
+    store knows every document id; until then this is a query.
+    """
+    if STATUS_HUB.synced:
+        row = LOCAL_STORE.get_team(team_name)
+        if row is None or row['firestore_id'] is None:
+            return None
+        return STORAGE.team_ref(row['firestore_id'])
+    snapshot = STORAGE.find_team(team_name)
+    return snapshot.reference if snapshot is not None else None
+
+
+def remember_leaderboard_ref(unique_code, team_name, leaderboard_ref):
+    """Prime the team cache after a leaderboard document was found or created"""
+    if unique_code:
+        TEAM_CACHE.set(unique_code, [team_name, leaderboard_ref])
+
+
+def forget_team(unique_code):
+    """Drop cached lookups for a team, e.g. when its leaderboard doc is gone"""
+    if unique_code:
+        TEAM_CACHE.invalidate(unique_code)
+
+
+def resolve_team_name_from_participants():
+    """Return the authoritative team name using session['unique_code'] when possible."""
+    return resolve_team(with_ref=False)[0]
+
+
+def mirror_remote_team(doc_id, data):
+    """Leaderboard listener hook: copy a Firestore change into the local store"""
+    try:
+        row = LOCAL_STORE.apply_remote(doc_id, data)
+    except sqlite3.Error as e:
+        logger.error("❌ Failed to mirror leaderboard doc %s: %s", doc_id, e)
+        return None
+    if row is None:
+        return None
+    RANKING.update(row)
+    return team_document(row)
+
+# Standings for /api/leaderboard. Every leaderboard row this worker writes
+# or mirrors updates it; other workers' changes arrive by reconciling with
+# the local store every LEADERBOARD_RECONCILE_INTERVAL seconds.
+RANKING = Ranking(interval=float(os.environ.get('LEADERBOARD_RECONCILE_INTERVAL', 5)))
+LEADERBOARD_MAX_LIMIT = 100
+
+
+# Counter changes land in SQLite first; this worker replicates them to
+# Firestore in batches. Anything still queued is flushed when the worker exits.
+SCORE_WRITER = ScoreWriter(LOCAL_STORE, STORAGE)
+SCORE_WRITER.register_shutdown_flush()
+
+# Each team's image order (scheduler seed and cursor), saved in batches;
+# pending saves are flushed when the worker exits. Rounds are written to the
+# local store directly (see progress.py).
+PROGRESS_WRITER = ProgressWriter(LOCAL_STORE)
+PROGRESS_WRITER.register_shutdown_flush()
+
+# Answer attempts and hint reveals from the game page, queued in memory and
+# appended to the local store in batches (see events.py)
+EVENT_WRITER = EventWriter(LOCAL_STORE)
+EVENT_WRITER.register_shutdown_flush()
+
+# One leaderboard listener per worker. It keeps the local store in step with
+# Firestore (e.g. admin status changes) and feeds /api/status/stream clients.
+STATUS_HUB = StatusHub(on_change=mirror_remote_team,
+                       max_streams=int(os.environ.get('MAX_STATUS_STREAMS', 16)))
+
+def publish_team_row(row):
+    """Show a changed local row in this worker's standings and status streams"""
+    RANKING.update(row)
+    STATUS_HUB.publish(row['team_name'], status_payload(team_document(row)))
+
+def publish_admin_rows(rows):
+    """Admin job hook: publish every team a job changed"""
+    for row in rows:
+        publish_team_row(row)
+
+# Bulk status changes, score resets and round closing from /admin/jobs,
+# applied in the background with batched Firestore writes
+ADMIN_JOBS = AdminJobs(LOCAL_STORE, STORAGE, on_rows=publish_admin_rows)
+
+REGISTRY.gauge_callback('sync_outbox_rows', 'Counter changes waiting to be written to Firestore.',
+                        LOCAL_STORE.outbox_size)
+REGISTRY.counter_callback('score_writer_commits_total', 'Firestore batches committed by the score writer.',
+                          lambda: SCORE_WRITER.commits)
+REGISTRY.counter_callback('score_writer_documents_total', 'Leaderboard documents written by the score writer.',
+                          lambda: SCORE_WRITER.writes)
+REGISTRY.gauge_callback('progress_pending_records', 'Team progress records waiting to be saved.',
+                        PROGRESS_WRITER.pending)
+REGISTRY.counter_callback('progress_flushes_total', 'Batched game progress writes.',
+                          lambda: PROGRESS_WRITER.flushes)
+REGISTRY.gauge_callback('event_writer_pending', 'Gameplay events waiting to be saved.',
+                        EVENT_WRITER.pending)
+REGISTRY.counter_callback('events_written_total', 'Gameplay events saved to the local store.',
+                          lambda: EVENT_WRITER.written)
+REGISTRY.counter_callback('events_dropped_total', 'Gameplay events dropped because the queue was full.',
+                          lambda: EVENT_WRITER.dropped)
+REGISTRY.gauge_callback('firestore_pool_in_flight', 'Firestore calls running or queued in the pool.',
+                        lambda: FIRESTORE_POOL.in_flight)
+REGISTRY.counter_callback('firestore_pool_timeouts_total', 'Requests that gave up waiting for pooled Firestore calls.',
+                          lambda: FIRESTORE_POOL.timeouts)
+REGISTRY.gauge_callback('participants_indexed', "Participant codes in this worker's roster index.",
+                        lambda: len(PARTICIPANTS))
+REGISTRY.gauge_callback('leaderboard_ranked_teams', "Teams in this worker's leaderboard index.",
+                        lambda: len(RANKING))
+REGISTRY.counter_callback('leaderboard_reconcile_corrections_total',
+                          'Leaderboard index entries corrected by reconciling with the local store.',
+                          lambda: RANKING.drift)
+REGISTRY.counter_callback('admin_job_commits_total', 'Firestore batches committed by admin jobs.',
+                          lambda: ADMIN_JOBS.commits)
+REGISTRY.gauge_callback('status_stream_clients', 'Open /api/status/stream connections.',
+                        lambda: STATUS_HUB.subscriber_count())
+REGISTRY.counter_callback('status_streams_refused_total', 'Status streams refused because every slot was taken.',
+                          lambda: STATUS_HUB.streams_refused)
+
+
+@app.before_request
+def start_background_sync():
+    """Start this worker's sync threads and Firestore listeners on first use"""
+    PROGRESS_WRITER.start()
+    EVENT_WRITER.start()
+    if db is not None:
+        SCORE_WRITER.start()
+        STATUS_HUB.start(db)
+        PARTICIPANTS.start(db)
 
 @app.route('/')
 def index():
@@ -130,377 +343,500 @@ def login():
         unique_code = request.form.get('unique_code')
         
         # Verify code with Firestore (if Firebase is available)
-        if db is not None:
+        if STORAGE.available:
             try:
-                participants_ref = db.collection('participants')
-                query = participants_ref.where('uniqueCode', '==', unique_code).limit(1)
-                results = query.get()
+                participant_doc = find_participant(unique_code)
                 
-                if len(results) == 1:
-                    participant_doc = results[0]
-                    team_data = participant_doc.to_dict()
-                    # Be flexible with field names (teamName, team_name, name)
-                    team_name = team_data.get('teamName') or team_data.get('team_name') or team_data.get('name')
-                    if not team_name:
-                        # Fallback to a default constructed name
-                        team_name = f"Team-{unique_code}"
+                if participant_doc is not None:
+                    # Fallback to a default constructed name
+                    team_name = participant_team_name(participant_doc.to_dict(), f"Team-{unique_code}")
 
                     session['team_name'] = team_name
                     session['unique_code'] = unique_code
-                    # Safely increment total participants once per participant
+                    # Fresh login: never trust lookups cached for a previous session
+                    forget_team(unique_code)
+                    # At most one batched write, with a deadline
                     try:
-                        participant_doc = results[0]
-                        participant_ref = participant_doc.reference
-                        participant_dict = participant_doc.to_dict()
-                        already_counted = participant_dict.get('counted', False)
-
-                        if not already_counted:
-                            # Use an atomic increment to update a central counters doc
-                            counters_ref = db.collection('meta').document('counters')
-                            counters_ref.set({'totalParticipants': firestore.Increment(1)}, merge=True)
-                            # Mark this participant as counted to avoid double-counting on re-login
-                            participant_ref.update({'counted': True})
-                            print(f"✅ totalParticipants incremented for uniqueCode={unique_code}")
-                        else:
-                            print(f"ℹ️ Participant already counted for uniqueCode={unique_code}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to update totalParticipants: {e}")
-                    # Ensure leaderboard document exists for this team name
-                    try:
-                        leaderboard_ref = db.collection('leaderboard')
-                        lb_q = leaderboard_ref.where('name', '==', session['team_name']).limit(1).get()
-                        if len(lb_q) == 0:
-                            # Create initial leaderboard entry
-                            leaderboard_ref.add({
-                                'name': session['team_name'],
-                                'totalPoints': 0,
-                                'wins': 0,
-                                'gamesPlayed': 0,
-                                'status': 'online'
-                            })
-                            print(f"✅ Created leaderboard entry for {session['team_name']}")
-                        else:
-                            print(f"ℹ️ Leaderboard entry exists for {session['team_name']}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to ensure leaderboard entry: {e}")
+                        FIRESTORE_POOL.gather(lambda: bootstrap_login(participant_doc, team_name, unique_code))
+                    except TimeoutError as e:
+                        logger.warning("⚠️ Login bootstrap still running in the background: %s", e)
 
                     return redirect(url_for('dashboard'))
                 else:
                     return render_template('login.html', error='Invalid code!')
                     
             except Exception as e:
-                print(f"Firebase error: {e}")
+                logger.exception("Firebase error during login: %s", e)
                 return render_template('login.html', error='Database error!')
         else:
-            # Mock login for development without Firebase
+            # Local login for development without Firebase
             session['team_name'] = f"Team-{unique_code}"
             session['unique_code'] = unique_code
+            RANKING.update(LOCAL_STORE.ensure_team(session['team_name'], unique_code))
             return redirect(url_for('dashboard'))
     
     return render_template('login.html')
 
+def bootstrap_login(participant_doc, team_name, unique_code):
+    """Count the participant once and make sure the team has a leaderboard entry, mirrored locally"""
+    try:
+        team_ref = find_leaderboard_ref(team_name)
+        counted = PARTICIPANTS.is_counted(participant_doc)
+        team_ref, created = STORAGE.bootstrap_login(participant_doc, counted, team_name, team_ref)
+        if not counted:
+            PARTICIPANTS.mark_counted(participant_doc)
+            logger.info("✅ totalParticipants incremented for uniqueCode=%s", unique_code)
+        if created is not None:
+            logger.info("✅ Created leaderboard entry for %s", team_name)
+            LOCAL_STORE.apply_remote(team_ref.id, created)
+        remember_leaderboard_ref(unique_code, team_name, team_ref)
+        RANKING.update(LOCAL_STORE.ensure_team(team_name, unique_code))
+    except Exception as e:
+        logger.warning("⚠️ Login bootstrap writes failed: %s", e)
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    team_name = session['team_name']
-    
-    # Get leaderboard data from Firestore (if available)
-    if db is not None:
-        try:
-            leaderboard_ref = db.collection('leaderboard')
-            query = leaderboard_ref.where('name', '==', team_name).limit(1)
-            results = query.get()
-            
-            if len(results) == 1:
-                team_stats = results[0].to_dict()
-                status = team_stats.get('status', 'offline')
-                score = team_stats.get('totalPoints', 0)
-                wins = team_stats.get('wins', 0)
-                games_played = team_stats.get('gamesPlayed', 0)
-            else:
-                status, score, wins, games_played = 'offline', 0, 0, 0
-        except Exception as e:
-            print(f"Firestore error: {e}")
-            status, score, wins, games_played = 'offline', 0, 0, 0
-    else:
-        # Mock data for development
-        status, score, wins, games_played = 'online', 150, 5, 10
+    team_name = resolve_team_name_from_participants()
+    team_stats = current_team_status()
     
     return render_template('dashboard.html', 
                          team_name=team_name,
-                         status=status,
-                         score=score,
-                         wins=wins,
-                         games_played=games_played,
+                         status=team_stats['status'],
+                         score=team_stats['score'],
+                         wins=team_stats['wins'],
+                         games_played=team_stats['games_played'],
                          total_images=TOTAL_AVAILABLE_IMAGES)
 
-@app.route('/api/status')
-@login_required
-def api_status():
-    # Prefer authoritative team name from participants collection (by unique code)
-    team_name = session.get('team_name')
-    unique_code = session.get('unique_code')
-    if db is not None and unique_code:
-        try:
-            participants_ref = db.collection('participants')
-            p_query = participants_ref.where('uniqueCode', '==', unique_code).limit(1).get()
-            if len(p_query) == 1:
-                p_data = p_query[0].to_dict()
-                team_name = p_data.get('teamName') or p_data.get('team_name') or p_data.get('name') or team_name
-        except Exception as e:
-            print(f"Firestore participants lookup error in api_status: {e}")
+def current_team_status():
+    """Return the /api/status payload for the session's team.
+
+    Served from the local store, which the shared leaderboard listener keeps
+    in step with Firestore. The Firestore document is only read (and
+    mirrored locally) when the team isn't stored yet or the listener is down.
+    """
+    team_name = resolve_team_name_from_participants()
+    try:
+        row = LOCAL_STORE.get_team(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Local store error: %s", e)
+        row = None
     
-    if db is not None:
+    if STORAGE.available and (row is None or not STATUS_HUB.listening):
         try:
-            leaderboard_ref = db.collection('leaderboard')
-            query = leaderboard_ref.where('name', '==', team_name).limit(1)
-            results = query.get()
+            _, team_ref = resolve_team()
+            snapshot = STORAGE.read_team(team_ref) if team_ref is not None else None
             
-            if len(results) == 1:
-                team_data = results[0].to_dict()
-                return jsonify({
-                    'status': team_data.get('status', 'offline'),
-                    'score': team_data.get('totalPoints', 0),
-                    'wins': team_data.get('wins', 0),
-                    'games_played': team_data.get('gamesPlayed', 0)
-                })
+            if snapshot is not None and snapshot.exists:
+                row = LOCAL_STORE.apply_remote(snapshot.id, snapshot.to_dict())
+                if row is not None:
+                    RANKING.update(row)
+            elif team_ref is not None:
+                # Cached document was deleted; look it up again next time
+                forget_team(session.get('unique_code'))
         except Exception as e:
-            print(f"Firestore error: {e}")
+            logger.warning("Firestore status read failed: %s", e)
+    
+    if row is None:
+        if STORAGE.available:
+            return {'status': 'offline', 'score': 0, 'wins': 0, 'games_played': 0}
+        # Offline mode: the local store is the source of truth
+        row = LOCAL_STORE.ensure_team(team_name, session.get('unique_code'))
+        RANKING.update(row)
+    return status_payload(team_document(row))
+
+@app.route('/api/status')
+@login_required
+def api_status():
+    return jsonify(current_team_status())
+
+@app.route('/api/leaderboard')
+@login_required
+def api_leaderboard():
+    """Top teams (?limit=, default 10) and the session team's standing.
+
+    The ETag is a hash of the body, so it agrees across workers and a
+    poller gets 304 until the standings it sees actually change.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        limit = 10
+    try:
+        RANKING.reconcile_if_due(LOCAL_STORE.leaderboard_rows)
+    except sqlite3.Error as e:
+        logger.error("❌ Leaderboard reconcile failed: %s", e)
     
-    # Return mock data if Firebase is not available
-    return jsonify({'status': 'online', 'score': 150, 'wins': 5, 'games_played': 10})
+    _, teams = RANKING.top(limit)
+    me = RANKING.entry(resolve_team_name_from_participants())
+    body = json.dumps({'teams': teams, 'total_teams': len(RANKING), 'me': me}, sort_keys=True)
+    etag = hashlib.blake2b(body.encode('utf-8'), digest_size=8).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Always revalidate; a 304 costs a rank lookup and no body
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/status/stream')
+@login_required
+def api_status_stream():
+    """Server-Sent Events feed of the team's status; /api/status is the fallback"""
+    if not STATUS_HUB.open_stream():
+        # Every stream thread is busy; main.js polls /api/status instead
+        return Response(status=503, headers={'Retry-After': '60'})
+    try:
+        team_name = resolve_team_name_from_participants()
+        initial = current_team_status()
+    except Exception:
+        STATUS_HUB.close_stream()
+        raise
+    response = Response(STATUS_HUB.stream(team_name, initial),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # The server closes the response when the stream ends or the client leaves
+    response.call_on_close(STATUS_HUB.close_stream)
+    return response
 
 @app.route('/image-select')
 @login_required
 def image_select():
-    # Only select from images that actually exist in game_data
+    # Only select from images that actually exist in the question bank
     if AVAILABLE_IMAGES:
-        # Select 4 unique random images from available ones
-        random_images = random.sample(AVAILABLE_IMAGES, min(4, len(AVAILABLE_IMAGES)))
+        # Next 4 images in the team's shuffled order that it hasn't completed
+        random_images = scheduled_images(resolve_team_name_from_participants(), 4)
     else:
         random_images = []
-        print("❌ No available images found in game_data!")
+        logger.error("❌ No available images found in the question bank!")
     
-    print(f"🎲 Selected images: {random_images}")
-    print(f"📊 Total available images: {TOTAL_AVAILABLE_IMAGES}")
+    logger.debug("Selected images %s of %d", random_images, TOTAL_AVAILABLE_IMAGES)
     
     return render_template('image_select.html', 
                          random_images=random_images,
+                         prefetch=image_prefetch_srcsets(random_images),
                          total_images=TOTAL_AVAILABLE_IMAGES)
 
-def extract_questions_from_data(image_data):
-    """Extract all questions from any data structure"""
-    questions = []
-    
-    print(f"🔍 Data type: {type(image_data)}")
-    
-    if isinstance(image_data, dict):
-        print("📊 Processing as dictionary...")
-        for key, value in image_data.items():
-            print(f"   Key: {key}, Type: {type(value)}")
-            
-            # Get points for this difficulty level
-            points = get_difficulty_score(key)
-            
-            if isinstance(value, list):
-                # Structure: {"easy": [questions], "medium": [questions], "impossible": [questions]}
-                for item in value:
-                    if isinstance(item, dict) and 'question' in item:
-                        questions.append({
-                            'question': item['question'],
-                            'answer': item.get('answer', ''),
-                            'hints': item.get('hints', []),
-                            'difficulty': key,
-                            'points': points
-                        })
-            elif isinstance(value, dict) and 'question' in value:
-                # Structure: {"easy": {"question": "...", ...}}
-                questions.append({
-                    'question': value['question'],
-                    'answer': value.get('answer', ''),
-                    'hints': value.get('hints', []),
-                    'difficulty': key,
-                    'points': points
-                })
-    
-    elif isinstance(image_data, list):
-        print("📊 Processing as list...")
-        for item in image_data:
-            if isinstance(item, dict) and 'question' in item:
-                questions.append({
-                    'question': item['question'],
-                    'answer': item.get('answer', ''),
-                    'hints': item.get('hints', []),
-                    'difficulty': item.get('difficulty', 'easy')
-                })
-    
-    print(f"📝 Extracted {len(questions)} questions")
-    return questions
-
-def get_difficulty_score(difficulty):
-    """Get score points based on difficulty level"""
-    difficulty_scores = {
-        'easy': 10,
-        'medium': 20,
-        'hard': 30,
-        'impossible': 50
-    }
-    return difficulty_scores.get(difficulty, 10)
+def team_schedule(team_name):
+    """(seed, cursor, completed images) for the team, creating its seed on first use"""
+    try:
+        record = PROGRESS_WRITER.load(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Progress lookup failed: %s", e)
+        record = {'completed': 0, 'schedule': None}
+    if record['schedule'] is None:
+        seed, cursor = new_seed(), 0
+        PROGRESS_WRITER.save_schedule(team_name, seed, cursor)
+    else:
+        seed, cursor = record['schedule']
+    return seed, cursor, record['completed']
+
+def scheduled_images(team_name, k):
+    """Images to offer the team, without repeats until it has completed them all"""
+    seed, cursor, completed = team_schedule(team_name)
+    images, new_cursor, new_epoch = SCHEDULER.offer(seed, cursor, completed, k)
+    if new_cursor != cursor:
+        PROGRESS_WRITER.save_schedule(team_name, seed, new_cursor, new_epoch)
+        if new_epoch:
+            logger.info("🔁 %s completed every image; starting over in a new order", team_name)
+    return images
+
+def image_prefetch_srcsets(image_numbers):
+    """image number -> srcset of the variants /game/<n> will offer this browser.
+
+    The select page prefetches the one its viewport needs. The same files are
+    loaded into IMAGE_BYTES so the follow-up request skips the disk.
+    Images without variants prefetch the original (and get a variant build
+    scheduled for next time).
+    """
+    fmt = preferred_format(request.headers.get('Accept'), FORMATS)
+    srcsets = {}
+    for image_number in image_numbers:
+        image_key = f"LAUGH/{image_number:03d}.jpg"
+        files = IMAGE_VARIANTS.files(image_key, fmt) or IMAGE_VARIANTS.files(image_key, 'jpeg')
+        if not files:
+            srcsets[image_number] = url_for('static', filename=image_key)
+            continue
+        srcsets[image_number] = ', '.join(
+            f"{url_for('media', filename=filename)} {width}w" for width, filename, _ in files)
+        for _, filename, _ in files:
+            load_image_bytes(filename)
+    return srcsets
 
 @app.route('/game/<int:image_number>')
 @login_required
 def game(image_number):
-    print(f"\n🎮 === GAME ROUTE CALLED ===")
-    print(f"📥 Requested image number: {image_number}")
-    
     # Find the image data
     image_key = f"LAUGH/{image_number:03d}.jpg"
     
-    if image_key in game_data:
-        image_data = game_data[image_key]
-        print(f"✅ Found image: '{image_key}'")
+    if image_key in QUESTION_BANK:
+        available_count = QUESTION_BANK.question_count(image_key)
         
-        # Extract all questions
-        all_questions = extract_questions_from_data(image_data)
-        
-        if not all_questions:
-            print("❌ No questions found in the data!")
-            print("💡 Data content:", image_data)
+        if not available_count:
+            logger.warning("No questions found for %s", image_key)
             return redirect(url_for('image_select'))
         
-        # Select 10 random questions (or all if less than 10)
-        selected_count = min(10, len(all_questions))
-        selected_questions = random.sample(all_questions, selected_count)
+        # Resume the team's unfinished round for this image, or draw 10
+        # questions (or all if less than 10) in the team's order for a new one
+        team_name = resolve_team_name_from_participants()
+        game_round = resumable_round(team_name, image_number, available_count)
+        if game_round is None:
+            seed, cursor, _ = team_schedule(team_name)
+            chosen = SCHEDULER.questions(seed, cursor, image_key, QUESTION_BANK.difficulty_positions(image_key), 10)
+            game_round = progress.new_round(image_number, chosen)
+            LOCAL_STORE.start_round(team_name, game_round)
+        # The round itself stays server-side; the session only names it
+        session['round_id'] = game_round['id']
+        session.pop('round', None)
         
-        print(f"🎲 Selected {selected_count} random questions from {len(all_questions)} available")
+        selected_questions = [QUESTION_BANK.question(image_key, position)
+                              for position in progress.positions(game_round['selected'])]
+        selected_count = len(selected_questions)
         
         # Group by difficulty for the template
         questions_by_difficulty = {}
         for question in selected_questions:
-            difficulty = question['difficulty']
-            if difficulty not in questions_by_difficulty:
-                questions_by_difficulty[difficulty] = []
-            
-            question_data = {
-                'question': question['question'],
-                'answer': question['answer'],
-                    'hints': question['hints'],
-                    'points': question['points']
-            }
-            questions_by_difficulty[difficulty].append(question_data)
+            questions_by_difficulty.setdefault(question.difficulty, []).append(question)
+        
+        logger.debug("Game %s: %d of %d questions, difficulties %s", image_key, selected_count,
+                     available_count, list(questions_by_difficulty))
         
-        print(f"📊 Difficulties found: {list(questions_by_difficulty.keys())}")
-        print(f"🎯 Rendering game.html with {selected_count} questions")
-        print("=== GAME ROUTE END ===\n")
+        # Responsive variants when they exist, the original otherwise
+        picture = IMAGE_VARIANTS.picture(image_key, lambda filename: url_for('media', filename=filename))
+        image_url = picture['src'] if picture else url_for('static', filename=image_key)
         
-        # Create the URL for the image using url_for
-        image_url = url_for('static', filename=image_key)
+        # Cached cards in difficulty order; only their positions are filled in here
+        ordered = [question for questions in questions_by_difficulty.values() for question in questions]
+        question_cards = QUESTION_FRAGMENTS.cards(ordered)
         
-        return render_template('game.html', 
+        started = time.perf_counter()
+        html = render_template('game.html', 
                              image_number=image_number,
                              image_key=image_key,
                              image_url=image_url,
-                             image_data=questions_by_difficulty,
+                             picture=picture,
+                             question_cards=question_cards,
+                             resume=round_resume_state(game_round, ordered),
                              total_questions=selected_count)
+        TEMPLATE_RENDER.observe(time.perf_counter() - started, 'game.html')
+        return html
     else:
-        print(f"❌ Image '{image_key}' not found in game_data!")
-        print(f"📊 Available images: {TOTAL_AVAILABLE_IMAGES}")
-        print(f"🔢 Available numbers: {AVAILABLE_IMAGES}")
+        logger.debug("Image %s not found (%d available images)", image_key, TOTAL_AVAILABLE_IMAGES)
         
         # Show error message on image select page
         return redirect(url_for('image_select'))
 
-@app.route('/api/update_score', methods=['POST'])
+def resumable_round(team_name, image_number, question_count):
+    """The team's unfinished round if it is for image_number, or None"""
+    try:
+        game_round = LOCAL_STORE.current_round(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Progress lookup failed: %s", e)
+        return None
+    # A round picked before data.json shrank can't be resumed
+    if (game_round is None or game_round['image'] != image_number or game_round['selected'] >> question_count
+            or progress.round_finished(game_round)):
+        return None
+    return game_round
+
+def round_resume_state(game_round, ordered_questions):
+    """What game.js needs to restore a resumed round, or None for a new one"""
+    if not game_round['solved'] and not game_round['hints']:
+        return None
+    questions = {}
+    for index, question in enumerate(ordered_questions, 1):
+        position = parse_qid(question.qid)[1]
+        solved = bool(game_round['solved'] >> position & 1)
+        hints = [[i, question.hints[i]] for i in range(min(len(question.hints), progress.HINT_SLOTS))
+                 if progress.hint_bits(game_round['hints'], position) >> i & 1]
+        if solved or hints:
+            questions[index] = {'solved': solved, 'answer': question.answer if solved else None, 'hints': hints}
+    return {'score': game_round['score'], 'questions': questions}
+
+def load_image_bytes(filename):
+    """(bytes, etag, mimetype) for a variant, via the in-memory LRU"""
+    item = IMAGE_BYTES.get(filename)
+    if item is None:
+        item = IMAGE_VARIANTS.read(filename)
+        if item is not None:
+            IMAGE_BYTES.set(filename, item, size=len(item[0]))
+    return item
+
+@app.route('/media/<path:filename>')
+def media(filename):
+    """Serve a content-hashed image variant with far-future caching"""
+    etag = variant_etag(filename)
+    if etag is not None and etag in request.if_none_match:
+        # The hash is the content, so a matching ETag needs no lookup at all
+        response = Response(status=304)
+    else:
+        item = load_image_bytes(filename)
+        if item is None:
+            abort(404)
+        data, etag, mimetype = item
+        response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def session_round_question_ids(team_name):
+    """Question ids of the team's stored round if the session names it, else an empty set"""
+    try:
+        game_round = LOCAL_STORE.current_round(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Progress lookup failed: %s", e)
+        return set()
+    if game_round is None or game_round['id'] != session.get('round_id'):
+        return set()
+    image_key = f"LAUGH/{game_round['image']:03d}.jpg"
+    return {f"{image_key}#{position}" for position in progress.positions(game_round['selected'])}
+
+def team_is_offline(team_name):
+    """True if an admin set the team offline (see /admin/jobs); it scores nothing until set online"""
+    try:
+        row = LOCAL_STORE.get_team(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Local store error: %s", e)
+        return False
+    return row is not None and row['status'] == 'offline'
+
+def current_round_question(team_name, question_id):
+    """Return (round, position) if question_id belongs to the team's stored round named by the session, else None"""
+    if not isinstance(question_id, str) or not session.get('round_id'):
+        return None
+    try:
+        game_round = LOCAL_STORE.current_round(team_name)
+    except sqlite3.Error as e:
+        logger.error("❌ Progress lookup failed: %s", e)
+        return None
+    if game_round is None or game_round['id'] != session['round_id']:
+        return None
+    try:
+        image_key, position = parse_qid(question_id)
+    except ValueError:
+        return None
+    expected_key = f"LAUGH/{game_round['image']:03d}.jpg"
+    if image_key != expected_key or expected_key not in QUESTION_BANK:
+        return None
+    try:
+        parse_qid(question_id, QUESTION_BANK.question_count(expected_key))
+    except ValueError:
+        return None
+    if not game_round['selected'] >> position & 1:
+        return None
+    return game_round, position
+
+@app.route('/api/submit_answer', methods=['POST'])
 @login_required
-def update_score():
-    data = request.json
-    points = data.get('points', 0)
-    # Resolve authoritative team name from participants collection when possible
-    team_name = session.get('team_name')
-    unique_code = session.get('unique_code')
-    if db is not None and unique_code:
-        try:
-            participants_ref = db.collection('participants')
-            p_query = participants_ref.where('uniqueCode', '==', unique_code).limit(1).get()
-            if len(p_query) == 1:
-                p_data = p_query[0].to_dict()
-                team_name = p_data.get('teamName') or p_data.get('team_name') or p_data.get('name') or team_name
-        except Exception as e:
-            print(f"Firestore participants lookup error in update_score: {e}")
+def submit_answer():
+    """Check an answer against the answer index and award points server-side"""
+    data = request.get_json(silent=True) or {}
+    question_id = data.get('question_id')
+    answer = data.get('answer', '')
+    team_name = resolve_team_name_from_participants()
     
-    print(f"Updating score for {team_name}: +{points} points")
+    located = current_round_question(team_name, question_id)
+    if located is None or question_id not in ANSWER_INDEX:
+        return jsonify({'success': False, 'error': 'Unknown question'}), 400
+    game_round, position = located
+    if game_round['solved'] >> position & 1:
+        return jsonify({'success': True, 'correct': True, 'already_solved': True, 'points': 0})
+    if team_is_offline(team_name):
+        return jsonify({'success': False, 'error': 'Your team is offline; wait for the admin'}), 403
     
-    # Update Firestore score (if Firebase is available)
-    if db is not None:
-        try:
-            leaderboard_ref = db.collection('leaderboard')
-            query = leaderboard_ref.where('name', '==', team_name).limit(1)
-            results = query.get()
-            
-            if len(results) == 1:
-                doc = results[0]
-                current_data = doc.to_dict()
-                
-                update_data = {}
-                
-                # Update totalPoints if it exists
-                if 'totalPoints' in current_data:
-                    current_score = current_data.get('totalPoints', 0)
-                    new_score = current_score + points
-                    update_data['totalPoints'] = new_score
-                    print(f"✅ totalPoints updated: {current_score} -> {new_score}")
-                else:
-                    print("❌ totalPoints field not found in document")
-                    return jsonify({'success': False, 'error': 'totalPoints field not found'})
-                
-                # Update wins (questions completed) if it exists
-                if 'wins' in current_data:
-                    current_wins = current_data.get('wins', 0)
-                    new_wins = current_wins + 1
-                    update_data['wins'] = new_wins
-                    print(f"✅ wins (questions) updated: {current_wins} -> {new_wins}")
-                
-                # Update status to online when active
-                if 'status' in current_data:
-                    update_data['status'] = 'online'
-                    print("✅ Status updated to: online")
-                
-                if update_data:
-                    doc.reference.update(update_data)
-                    print(f"✅ Firestore updated successfully: {update_data}")
-                    return jsonify({'success': True, 'updated_fields': update_data})
-                else:
-                    print("❌ No fields to update")
-                    return jsonify({'success': False, 'error': 'No matching fields to update'})
-                    
-            else:
-                # If team not found, create a leaderboard doc for them and apply the update
-                try:
-                    new_doc = leaderboard_ref.add({
-                        'name': team_name,
-                        'totalPoints': points,
-                        'wins': 1,
-                        'gamesPlayed': 0,
-                        'status': 'online'
-                    })
-                    print(f"✅ Created leaderboard entry for missing team {team_name} and set points={points}")
-                    return jsonify({'success': True, 'created': True, 'points_added': points})
-                except Exception as e:
-                    print(f"❌ Failed to create leaderboard entry: {e}")
-                    return jsonify({'success': False, 'error': 'Team not found and creation failed'})
-                
-        except Exception as e:
-            print(f"❌ Score update error: {e}")
-            return jsonify({'success': False, 'error': str(e)})
-    else:
-        # Mock success response when Firebase is not available
-        print(f"✅ Mock score update: {team_name} +{points} points")
-        return jsonify({'success': True, 'mock_update': True, 'points_added': points})
+    if not ANSWER_INDEX.check(question_id, answer):
+        logger.debug("Wrong answer for %s", question_id)
+        EVENT_WRITER.submit([server_event(team_name, question_id, game_round, 'attempt', correct=False)])
+        return jsonify({'success': True, 'correct': False})
+    
+    # Solved bit, hints and points are re-read and written in one transaction,
+    # so a replayed or concurrent request can't score the question twice
+    base_points = ANSWER_INDEX.base_points(question_id)
+    try:
+        game_round, points, row = LOCAL_STORE.solve_question(
+            team_name, game_round['id'], position, lambda hints_used: score_for(base_points, hints_used),
+            sync=STORAGE.available)
+    except sqlite3.Error as e:
+        logger.error("❌ Score update error: %s", e)
+        return jsonify({'success': False, 'error': str(e)})
+    if game_round is None:
+        # Closed by an admin (or replaced) since the lookup above
+        return jsonify({'success': False, 'error': 'Unknown question'}), 400
+    if points is None:
+        return jsonify({'success': True, 'correct': True, 'already_solved': True, 'points': 0})
+    publish_team_row(row)
+    EVENT_WRITER.submit([server_event(team_name, question_id, game_round, 'attempt', correct=True)])
+    
+    return jsonify({
+        'success': True,
+        'correct': True,
+        'points': points,
+        'hints_used': progress.hints_revealed(game_round['hints'], position),
+        'answer': QUESTION_BANK.get(question_id).answer,
+        'total_points': row['total_points']
+    })
+
+@app.route('/api/reveal_hint', methods=['POST'])
+@login_required
+def reveal_hint():
+    """Return a hint's text and record it against this round's score"""
+    data = request.get_json(silent=True) or {}
+    question_id = data.get('question_id')
+    team_name = resolve_team_name_from_participants()
+    
+    located = current_round_question(team_name, question_id)
+    question = QUESTION_BANK.get(question_id) if located is not None else None
+    try:
+        hint_index = int(data.get('hint_index'))
+    except (TypeError, ValueError):
+        hint_index = -1
+    if question is None or not 0 <= hint_index < min(len(question.hints), progress.HINT_SLOTS):
+        return jsonify({'success': False, 'error': 'Unknown hint'}), 400
+    
+    game_round, position = located
+    revealed = progress.hint_bits(game_round['hints'], position)
+    try:
+        game_round = LOCAL_STORE.reveal_hint(team_name, game_round['id'], position, hint_index)
+    except sqlite3.Error as e:
+        logger.error("❌ Hint update error: %s", e)
+        return jsonify({'success': False, 'error': str(e)})
+    if game_round is None:
+        return jsonify({'success': False, 'error': 'Unknown hint'}), 400
+    if progress.hint_bits(game_round['hints'], position) != revealed:
+        EVENT_WRITER.submit([server_event(team_name, question_id, game_round, 'hint', hint_index=hint_index)])
+    
+    return jsonify({'success': True, 'hint': question.hints[hint_index],
+                    'hints_used': progress.hints_revealed(game_round['hints'], position)})
+
+@app.route('/api/events', methods=['POST'])
+@login_required
+def ingest_events():
+    """Queue the game page's timings: {"events": [{"type": "attempt" | "hint", "question_id", "elapsed_ms"}]}
+
+    Only questions of the session's round are accepted; outcomes are
+    recorded by submit_answer and reveal_hint, not taken from here.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_events = data.get('events')
+    if not isinstance(raw_events, list):
+        return jsonify({'success': False, 'error': 'events must be a list'}), 400
+    if len(raw_events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify({'success': False, 'error': f'at most {MAX_EVENTS_PER_REQUEST} events per request'}), 413
+    team_name = resolve_team_name_from_participants()
+    question_ids = session_round_question_ids(team_name)
+    rows, rejected = parse_events(raw_events, team_name, question_ids)
+    accepted = EVENT_WRITER.submit(rows)
+    return jsonify({'success': True, 'accepted': accepted, 'rejected': rejected,
+                    'dropped': len(rows) - accepted}), 202
 
 @app.route('/debug-images')
 def debug_images():
     """Check all available image keys in data.json"""
-    available_keys = list(game_data.keys())
+    available_keys = QUESTION_BANK.image_keys()
     available_numbers = get_available_images()
     
     return jsonify({
@@ -525,90 +861,30 @@ def find_missing_numbers(available_numbers):
 @app.route('/api/complete_image', methods=['POST'])
 @login_required
 def complete_image():
-    """Update gamesPlayed when an image is completed"""
-    # Resolve authoritative team name from participants collection when possible
-    team_name = session.get('team_name')
-    unique_code = session.get('unique_code')
-    if db is not None and unique_code:
-        try:
-            participants_ref = db.collection('participants')
-            p_query = participants_ref.where('uniqueCode', '==', unique_code).limit(1).get()
-            if len(p_query) == 1:
-                p_data = p_query[0].to_dict()
-                team_name = p_data.get('teamName') or p_data.get('team_name') or p_data.get('name') or team_name
-        except Exception as e:
-            print(f"Firestore participants lookup error in complete_image: {e}")
+    """Update gamesPlayed once every question of the session's round is solved"""
+    team_name = resolve_team_name_from_participants()
     
-    print(f"Marking image completion for {team_name}")
+    try:
+        game_round, row = LOCAL_STORE.complete_round(team_name, session.get('round_id'), sync=STORAGE.available)
+    except sqlite3.Error as e:
+        logger.error("❌ Image completion update error: %s", e)
+        return jsonify({'success': False, 'error': str(e)})
+    if row is None:
+        return jsonify({'success': False, 'error': 'Round not finished'}), 400
     
-    if db is not None:
-        try:
-            leaderboard_ref = db.collection('leaderboard')
-            query = leaderboard_ref.where('name', '==', team_name).limit(1)
-            results = query.get()
-            
-            if len(results) == 1:
-                doc = results[0]
-                current_data = doc.to_dict()
-                
-                update_data = {}
-                
-                # Update gamesPlayed if it exists
-                if 'gamesPlayed' in current_data:
-                    current_games = current_data.get('gamesPlayed', 0)
-                    new_games = current_games + 1
-                    update_data['gamesPlayed'] = new_games
-                    print(f"✅ gamesPlayed updated: {current_games} -> {new_games}")
-                else:
-                    print("⚠️ gamesPlayed field not found in document")
-                
-                # Update status to online
-                if 'status' in current_data:
-                    update_data['status'] = 'online'
-                    print("✅ Status updated to: online")
-                
-                if update_data:
-                    doc.reference.update(update_data)
-                    print(f"✅ Image completion recorded: {update_data}")
-                    return jsonify({'success': True, 'updated_fields': update_data})
-                else:
-                    return jsonify({'success': False, 'error': 'No fields to update'})
-                    
-            else:
-                # If team not found, create a leaderboard entry with gamesPlayed = 1
-                try:
-                    leaderboard_ref.add({
-                        'name': team_name,
-                        'totalPoints': 0,
-                        'wins': 0,
-                        'gamesPlayed': 1,
-                        'status': 'online'
-                    })
-                    print(f"✅ Created leaderboard entry for missing team {team_name} with gamesPlayed=1")
-                    return jsonify({'success': True, 'created': True, 'gamesPlayed': 1})
-                except Exception as e:
-                    print(f"❌ Failed to create leaderboard entry for image completion: {e}")
-                    return jsonify({'success': False, 'error': 'Team not found and creation failed'})
-                
-        except Exception as e:
-            print(f"❌ Image completion update error: {e}")
-            return jsonify({'success': False, 'error': str(e)})
-    else:
-        # Mock success response when Firebase is not available
-        print(f"✅ Mock image completion: {team_name}")
-        return jsonify({'success': True, 'mock_update': True})
+    session.pop('round_id', None)
+    publish_team_row(row)
+    logger.debug("Image completed by %s -> gamesPlayed %d", team_name, row['games_played'])
+    return jsonify({
+        'success': True,
+        'updated_fields': {'gamesPlayed': row['games_played'], 'status': row['status']}
+    })
 
 @app.route('/debug-difficulties')
 def debug_difficulties():
     """Debug route to see all difficulty levels in data"""
-    print("🔍 DEBUG: Checking all difficulty levels")
-    
-    all_difficulties = set()
-    for image_key, image_data in game_data.items():
-        if isinstance(image_data, dict):
-            all_difficulties.update(image_data.keys())
+    all_difficulties = set(QUESTION_BANK.difficulties)
     
-    print(f"📊 All difficulty levels found: {sorted(all_difficulties)}")
     return f"All difficulty levels: {sorted(all_difficulties)}"
 
 @app.route('/debug-leaderboard')
@@ -617,14 +893,12 @@ def debug_leaderboard():
     """Debug route to check leaderboard data for current team"""
     team_name = session['team_name']
     
-    if db is not None:
+    if STORAGE.available:
         try:
-            leaderboard_ref = db.collection('leaderboard')
-            query = leaderboard_ref.where('name', '==', team_name).limit(1)
-            results = query.get()
+            snapshot = STORAGE.find_team(team_name)
             
-            if len(results) == 1:
-                team_data = results[0].to_dict()
+            if snapshot is not None:
+                team_data = snapshot.to_dict()
                 return jsonify({
                     'team_name': team_name,
                     'current_data': team_data,
@@ -641,7 +915,7 @@ def debug_leaderboard():
 def check_image(image_number):
     """Check if specific image exists"""
     image_key = f"LAUGH/{image_number:03d}.jpg"
-    exists = image_key in game_data
+    exists = image_key in QUESTION_BANK
     
     return jsonify({
         'image_number': image_number,
@@ -652,8 +926,118 @@ def check_image(image_number):
 
 @app.route('/logout')
 def logout():
+    forget_team(session.get('unique_code'))
     session.clear()
     return redirect(url_for('login'))
 
+@app.route('/admin/jobs', methods=['POST'])
+@admin_required
+def admin_start_job():
+    """Start a bulk job: {"action": "set_status", "status": "offline", "teams": [...]}.
+
+    teams defaults to every team. Returns 202 with the job; poll its url
+    for progress.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        row = ADMIN_JOBS.submit(data.get('action'), teams=data.get('teams'), status=data.get('status'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except sqlite3.Error as e:
+        logger.error("❌ Admin job could not be created: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+    job_url = url_for('admin_job', job_id=row['id'])
+    return jsonify({'success': True, 'job': job_document(row), 'url': job_url}), 202, {'Location': job_url}
+
+@app.route('/admin/jobs', methods=['GET'])
+@admin_required
+def admin_jobs():
+    """The most recent jobs, newest first"""
+    return jsonify({'success': True, 'jobs': [job_document(row) for row in ADMIN_JOBS.recent()]})
+
+@app.route('/admin/jobs/<job_id>')
+@admin_required
+def admin_job(job_id):
+    row = ADMIN_JOBS.get(job_id)
+    if row is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job_document(row)})
+
+@app.route('/admin/export')
+@admin_required
+def admin_export():
+    """Every team's results as ?format=csv (default) or ndjson, streamed.
+
+    Teams and rounds come from the local store, so every row is one
+    snapshot. ?source=firestore pages the teams from Firestore instead,
+    after sending it the counter changes still waiting in the sync outbox.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'success': False, 'error': f"format must be one of {', '.join(export.FORMATS)}"}), 400
+    if request.args.get('source') == 'firestore':
+        if not STORAGE.available:
+            return jsonify({'success': False, 'error': 'Firestore is not configured'}), 400
+        # The rounds already count the outbox's deltas; Firestore must too
+        while SCORE_WRITER.flush():
+            pass
+        teams = export.firestore_teams(STORAGE)
+    else:
+        teams = export.local_teams(LOCAL_STORE)
+    lines = export.render(fmt, export.team_results(teams, LOCAL_STORE, QUESTION_BANK))
+    filename = f"results-{time.strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    return Response(stream_with_context(lines), mimetype=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'Cache-Control': 'no-store'})
+
+@app.route('/admin/calibration')
+@admin_required
+def admin_calibration():
+    """Per-question solve rates and suggested points (?min_teams=5, ?changes=1)"""
+    min_teams = request.args.get('min_teams', calibration.MIN_TEAMS, type=int)
+    # This worker's queued events; other workers write theirs within a second
+    EVENT_WRITER.flush()
+    results = calibration.calibrate(LOCAL_STORE.question_stats(), QUESTION_BANK, min_teams)
+    if request.args.get('changes'):
+        results = [r for r in results if r['suggested_points'] not in (None, r['points'])]
+    return jsonify({'success': True, 'questions': results, 'summary': calibration.summary(results)})
+
+def warm_caches():
+    """Build the read-only caches every worker would otherwise fill on first use.
+
+    Covers the answer index, every rendered question card, and variant
+    image bytes (preferred formats first) up to IMAGE_CACHE_BYTES.
+    """
+    ANSWER_INDEX.warm()
+    for image_key in QUESTION_BANK.image_keys():
+        QUESTION_FRAGMENTS.warm(QUESTION_BANK.questions(image_key))
+    entries = IMAGE_VARIANTS.entries
+    for fmt in FORMATS:
+        for entry in entries.values():
+            for _, filename, size in entry['variants'].get(fmt, ()):
+                if IMAGE_BYTES.size + size > IMAGE_BYTES.max_bytes:
+                    return
+                load_image_bytes(filename)
+
+def prepare_fork():
+    """Get the gunicorn master ready to fork workers (preload_app, see gunicorn.conf.py).
+
+    Caches are warmed here once, so workers share them copy-on-write.
+    The master's SQLite connection is closed, because a connection must not
+    be used across fork. Then everything allocated so far moves out of the
+    garbage collector's reach (gc.freeze), so collections in the workers
+    don't write to the shared pages.
+    """
+    warm_caches()
+    STARTUP.mark('warm caches')
+    LOCAL_STORE.close()
+    gc.freeze()
+    STARTUP.log("Preloaded app")
+
+REGISTRY.gauge_callback('startup_phase_seconds', 'Time spent in each start-up phase of this process.',
+                        STARTUP.by_phase, labelnames=('phase',))
+STARTUP.mark('routes')
+STARTUP.log("App")
+
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,607 @@
+"""Micro-benchmarks for hot routes, run in-process with Flask's test client.
+
+Usage:
+    python bench.py game [--rounds N]
+    python bench.py startup [--rounds N]
+    python bench.py status [--rounds N]
+    python bench.py answers [--rounds N]
+    python bench.py schedule [--rounds N]
+    python bench.py serving [--rounds N]
+    python bench.py boot [--rounds N]
+    python bench.py admin [--rounds N]
+    python bench.py events [--rounds N]
+
+Runs without Firebase credentials (offline mode) against a throwaway SQLite
+store. App logging is limited to warnings (override with LOG_LEVEL) and
+anything the app prints is swallowed, so the benchmark report stays readable.
+For whole-event numbers (every route, p50/p95/p99, baselines) see loadtest.py.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.pop('FIREBASE_CREDENTIALS', None)
+os.environ.pop('FIREBASE_CREDENTIALS_PATH', None)
+os.environ.pop('FIREBASE_CREDENTIALS_JSON', None)
+# Only warnings and errors from the app, so the report stays readable
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+# Never write benchmark teams into the repo's game.db
+os.environ['GAME_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='ll-bench-'), 'game.db')
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app as game_app
+from admin_jobs import AdminJobs
+from answers import AnswerIndex
+from events import EventWriter
+import loadtest
+from fake_firestore import FakeFirestore
+from participants import ParticipantIndex
+import progress
+from scheduler import DIFFICULTY_MIX, Scheduler, allocate
+from status_feed import StatusHub
+from storage import FirestoreStorage
+
+
+def logged_in_client(team_name='Team-bench', unique_code='bench'):
+    """Return a test client with a team session already set"""
+    client = game_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['team_name'] = team_name
+        sess['unique_code'] = unique_code
+    return client
+
+
+def seed_teams(db, count):
+    """Create participants and online leaderboard docs for count teams"""
+    refs = []
+    for i in range(count):
+        db.collection('participants').add({'uniqueCode': f'code{i}', 'teamName': f'Team {i}'})
+        _, ref = db.collection('leaderboard').add({
+            'name': f'Team {i}', 'totalPoints': 0, 'wins': 0, 'gamesPlayed': 0, 'status': 'online'
+        })
+        refs.append(ref)
+    return refs
+
+
+def bench_game(rounds):
+    """Requests/sec on /game/<n> across every available image"""
+    client = logged_in_client()
+    images = game_app.AVAILABLE_IMAGES
+    sink = io.StringIO()
+    requests_made = 0
+    with contextlib.redirect_stdout(sink):
+        # Warm up the template cache before timing
+        client.get(f'/game/{images[0]}')
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for image_number in images:
+                response = client.get(f'/game/{image_number}')
+                assert response.status_code == 200, response.status_code
+                requests_made += 1
+                sink.seek(0)
+                sink.truncate()
+        elapsed = time.perf_counter() - start
+    print(f"/game/<n>: {requests_made} requests over {len(images)} images "
+          f"in {elapsed:.2f}s -> {requests_made / elapsed:.1f} req/s "
+          f"({elapsed / requests_made * 1000:.3f} ms/req)")
+    render = game_app.TEMPLATE_RENDER
+    print(f"game.html render: {render.total('game.html') / render.count('game.html') * 1000:.3f} ms mean "
+          f"over {render.count('game.html')} renders "
+          f"({len(game_app.QUESTION_FRAGMENTS.cache)} question cards cached)")
+
+
+# Each loader runs in a fresh interpreter and reports "<seconds> <VmRSS KiB>".
+# ru_maxrss is not used because Linux carries it over from the forking parent.
+_STARTUP_LOADERS = {
+    'baseline': "pass",
+    'json.load': (
+        "import json, question_bank\n"
+        "with open('data.json', encoding='utf-8') as f:\n"
+        "    index = question_bank.build_question_index(json.load(f))"
+    ),
+    'data.bank': (
+        "import question_bank\n"
+        "bank = question_bank.load_question_bank('data.json', 'data.bank')"
+    ),
+}
+_STARTUP_TEMPLATE = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{loader}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "rss = [l.split()[1] for l in open('/proc/self/status') if l.startswith('VmRSS:')][0]\n"
+    "print(elapsed, rss)"
+)
+
+
+def bench_startup(rounds):
+    """Question data load time and resident memory per worker process"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Make sure the bank exists so we time loading, not compiling
+    subprocess.run([sys.executable, '-c', _STARTUP_TEMPLATE.format(loader=_STARTUP_LOADERS['data.bank'])],
+                   cwd=here, check=True, capture_output=True)
+    results = {}
+    for name, loader in _STARTUP_LOADERS.items():
+        times, rss = [], []
+        for _ in range(rounds):
+            out = subprocess.run([sys.executable, '-c', _STARTUP_TEMPLATE.format(loader=loader)],
+                                 cwd=here, check=True, capture_output=True, text=True).stdout
+            elapsed, resident = out.split()
+            times.append(float(elapsed))
+            rss.append(int(resident))
+        results[name] = (min(times), min(rss))
+    base_rss = results['baseline'][1]
+    for name, (elapsed, resident) in results.items():
+        if name == 'baseline':
+            continue
+        print(f"{name:>10}: load {elapsed * 1000:7.2f} ms, "
+              f"RSS {resident / 1024:6.1f} MiB (+{(resident - base_rss) / 1024:.1f} MiB over bare interpreter)")
+
+
+def bench_status(rounds):
+    """Backend reads to deliver status to N clients: polling vs. the SSE stream.
+
+    Polling: every client fetches /api/status ``rounds`` times (one per 3 s).
+    Streaming: every client holds /api/status/stream open while the admin
+    flips all teams offline ``rounds`` times.
+    """
+    sink = io.StringIO()
+    for clients in (1, 10, 50, 200):
+        with contextlib.redirect_stdout(sink):
+            db = FakeFirestore()
+            game_app.db = db
+            game_app.TEAM_CACHE.clear()
+            # A slot per client, so every stream is served (app.py's default is 16)
+            game_app.STATUS_HUB = StatusHub(on_change=game_app.mirror_remote_team, max_streams=clients)
+            game_app.PARTICIPANTS = ParticipantIndex()
+            refs = seed_teams(db, clients)
+            team_clients = [logged_in_client(f'Team {i}', f'code{i}') for i in range(clients)]
+            for client in team_clients:
+                client.get('/api/status')  # warm the team cache
+
+            before = db.total_ops('get', 'query')
+            for _ in range(rounds):
+                for client in team_clients:
+                    client.get('/api/status')
+            poll_reads = db.total_ops('get', 'query') - before
+
+            responses = [client.get('/api/status/stream', buffered=False) for client in team_clients]
+            streams = [resp for resp in responses if resp.status_code == 200]
+            refused = len(responses) - len(streams)
+            for resp in responses:
+                if resp.status_code != 200:
+                    resp.close()
+            iterators = [iter(resp.response) for resp in streams]
+            for it in iterators:
+                next(it)  # retry
+                next(it)  # initial state
+            before = db.total_ops('get', 'query')
+            delivered = [0] * len(streams)
+
+            def reader(i):
+                for _ in range(rounds):
+                    next(iterators[i])
+                    delivered[i] += 1
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(len(streams))]
+            for t in threads:
+                t.start()
+            start = time.perf_counter()
+            for r in range(rounds):
+                status = 'offline' if r % 2 == 0 else 'online'
+                for ref in refs:
+                    ref.update({'status': status})
+                while sum(delivered) < len(streams) * (r + 1):
+                    time.sleep(0.001)
+            fanout = time.perf_counter() - start
+            for t in threads:
+                t.join()
+            for resp in streams:
+                resp.close()
+            stream_reads = db.total_ops('get', 'query') - before
+            listeners = db.ops[('listen', 'leaderboard')]
+        print(f"{clients:>4} clients x {rounds} updates: polling {clients * rounds:>5} requests / "
+              f"{poll_reads} Firestore reads, stream 0 requests / {stream_reads} Firestore reads "
+              f"({listeners} listener, {sum(delivered)} events pushed in {fanout * 1000:.1f} ms, "
+              f"{refused} streams refused)")
+    game_app.db = None
+
+
+def typo_variants(answer, rng):
+    """Misspellings a player might type: drop, swap, replace or add one letter"""
+    letters = [i for i, ch in enumerate(answer) if ch.isalpha()]
+    if len(letters) < 2:
+        return []
+    i = rng.choice(letters[:-1])
+    j = rng.choice(letters)
+    replacement = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return [
+        answer[:j] + answer[j + 1:],
+        answer[:i] + answer[i + 1] + answer[i] + answer[i + 2:],
+        answer[:j] + replacement + answer[j + 1:],
+        answer[:j] + replacement + answer[j:],
+        ' '.join(reversed(answer.split())),
+    ]
+
+
+def bench_answers(rounds):
+    """Fuzzy answer checks over every question: latency and verdict quality.
+
+    Each answer is checked against typo variants of itself (should pass)
+    and against the other answers for the same image (should fail).
+    """
+    bank = game_app.QUESTION_BANK
+    rng = random.Random(7)
+    checks = []
+    for image_key in bank.image_keys():
+        questions = bank.questions(image_key)
+        for question in questions:
+            for variant in typo_variants(question.answer, rng):
+                checks.append((question.qid, variant, True))
+            for other in rng.sample(questions, min(3, len(questions))):
+                if other.answer.casefold() != question.answer.casefold():
+                    checks.append((question.qid, other.answer, False))
+
+    index = AnswerIndex(bank)
+    start = time.perf_counter()
+    index.warm()
+    print(f"index build: {bank.question_total} questions in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for label, fresh in (('cold', True), ('cached', False)):
+        timings = []
+        accepted = rejected_typos = false_accepts = 0
+        for _ in range(rounds):
+            if fresh:
+                index.verdicts.clear()
+            for qid, guess, expected in checks:
+                start = time.perf_counter()
+                verdict = index.check(qid, guess)
+                timings.append(time.perf_counter() - start)
+                if expected:
+                    accepted += verdict
+                    rejected_typos += not verdict
+                else:
+                    false_accepts += verdict
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1e6
+        p99 = timings[int(len(timings) * 0.99)] * 1e6
+        print(f"{label:>7}: {len(timings)} checks, p50 {p50:.1f} us, p99 {p99:.1f} us, "
+              f"max {timings[-1] * 1e6:.0f} us")
+    typos = accepted + rejected_typos
+    print(f"typo variants accepted: {accepted}/{typos} ({accepted / typos:.1%}); "
+          f"wrong answers accepted: {false_accepts}")
+
+
+def chi_square(counts):
+    """Pearson statistic of counts against a uniform expectation"""
+    expected = sum(counts) / len(counts)
+    return sum((count - expected) ** 2 / expected for count in counts)
+
+
+def bench_schedule(rounds):
+    """Scheduler coverage, uniformity and draw cost over simulated teams.
+
+    Every team plays two full epochs, picking one of its offered images at
+    random each time. Coverage: each epoch completes every image exactly
+    once and never offers a completed one. Uniformity: the image a team is
+    offered first, and how often each question is picked, should be flat
+    across teams (chi-square near its degrees of freedom).
+    """
+    bank = game_app.QUESTION_BANK
+    images = game_app.AVAILABLE_IMAGES
+    n = len(images)
+    scheduler = Scheduler(images)
+    rng = random.Random(16)
+    teams = 40 * rounds
+    offer_times = []
+    coverage_failures = repeats_offered = 0
+    for _ in range(teams):
+        seed, cursor, completed = rng.getrandbits(62), 0, 0
+        for _ in range(2):
+            played = []
+            while True:
+                start = time.perf_counter()
+                offered, cursor, new_epoch = scheduler.offer(seed, cursor, completed, 4)
+                offer_times.append(time.perf_counter() - start)
+                if new_epoch:
+                    completed = 0
+                    break
+                repeats_offered += sum(completed >> image & 1 for image in offered)
+                image = rng.choice(offered)
+                played.append(image)
+                completed |= 1 << image
+            coverage_failures += sorted(played) != images
+    offer_times.sort()
+    first_slot = {image: 0 for image in images}
+    for _ in range(n * 40):
+        first_slot[scheduler.offer(rng.getrandbits(62), 0, 0, 1)[0][0]] += 1
+    print(f"coverage: {teams} teams x 2 epochs of {n} images, {coverage_failures} epochs missed or repeated "
+          f"an image, {repeats_offered} completed images offered again")
+    print(f"first image uniformity: chi-square {chi_square(list(first_slot.values())):.1f} "
+          f"on {n - 1} degrees of freedom ({n * 40} teams)")
+    print(f"offer(): p50 {offer_times[len(offer_times) // 2] * 1e6:.1f} us, "
+          f"p99 {offer_times[int(len(offer_times) * 0.99)] * 1e6:.1f} us")
+
+    # Questions: difficulty mix per round, no repeats until a difficulty is used up
+    mix_failures = early_repeats = 0
+    position_counts = {}
+    draw_times = []
+    for image_key in bank.image_keys():
+        by_difficulty = bank.difficulty_positions(image_key)
+        expected = allocate(10, {name: len(p) for name, p in by_difficulty.items()}, DIFFICULTY_MIX)
+        difficulty_of = {p: name for name, positions in by_difficulty.items() for p in positions}
+        for team in range(rounds * 4):
+            seen = {name: set() for name in by_difficulty}
+            for epoch in range(2):
+                start = time.perf_counter()
+                chosen = scheduler.questions(team, epoch * n, image_key, by_difficulty, 10)
+                draw_times.append(time.perf_counter() - start)
+                mix = {}
+                for position in chosen:
+                    mix[difficulty_of[position]] = mix.get(difficulty_of[position], 0) + 1
+                    seen[difficulty_of[position]].add(position)
+                    if epoch == 0:
+                        position_counts[position] = position_counts.get(position, 0) + 1
+                mix_failures += mix != expected or len(set(chosen)) != len(chosen)
+            # Two rounds draw 2 x slots questions per difficulty: all distinct, or all of them
+            for name, positions in seen.items():
+                early_repeats += len(positions) != min(2 * expected.get(name, 0), len(by_difficulty[name]))
+    draw_times.sort()
+    print(f"questions: {len(draw_times)} rounds, {mix_failures} with the wrong difficulty mix or duplicates, "
+          f"{early_repeats} difficulties repeated a question in a team's first two rounds before using all of them")
+    # Positions are pooled over images, which all share the same difficulty layout
+    for name, positions in bank.difficulty_positions(bank.image_keys()[0]).items():
+        counts = [position_counts.get(p, 0) for p in positions]
+        print(f"  {name:>10}: picks per position {counts}, chi-square {chi_square(counts):.1f} "
+              f"on {len(counts) - 1} degrees of freedom")
+    print(f"questions(): p50 {draw_times[len(draw_times) // 2] * 1e6:.1f} us")
+
+
+def _login_load(port, clients, duration, teams):
+    """clients threads POSTing /login back to back; returns (latencies, failures)"""
+    latencies, failures = [], []
+    deadline = time.monotonic() + duration
+
+    def run(worker):
+        rng = random.Random(worker)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            body = f"unique_code=code{rng.randrange(teams)}"
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 302
+            except OSError:
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            (latencies if ok else failures).append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures
+
+
+def bench_serving(rounds):
+    """Login throughput under gunicorn with 50-200 ms of injected Firestore latency.
+
+    Each mode starts gunicorn (2 workers) against the fake Firestore and
+    keeps 32 clients logging in for ``rounds`` seconds. A login makes a
+    participants query, then bootstraps the counter and leaderboard entry
+    in one batch, which the pool only puts a deadline on.
+    """
+    modes = (
+        ('sync workers', {'GUNICORN_WORKER_CLASS': 'sync'}),
+        ('gthread, pool off', {'FIRESTORE_POOL_SIZE': '0'}),
+        ('gthread + pool', {}),
+    )
+    clients, teams = 32, 500
+    for label, overrides in modes:
+        with loadtest.gunicorn(teams, '0.05-0.2', WEB_CONCURRENCY='2', GUNICORN_THREADS='16', **overrides) as port:
+            latencies, failures = _login_load(port, clients, rounds, teams)
+        latencies.sort()
+        if not latencies:
+            print(f"{label:>18}: no successful logins ({len(failures)} failures)")
+            continue
+        print(f"{label:>18}: {len(latencies) / rounds:6.1f} logins/s, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.0f} ms, {len(failures)} failures")
+
+
+def _tree_pss_kb(pid):
+    """Proportional set size of pid and its child processes, in kB (Linux /proc)"""
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def bench_boot(rounds):
+    """Cold boot to first request with and without gunicorn preload_app (4 workers).
+
+    Boot is the time from starting gunicorn until /login answers. Then one
+    logged-in client opens /game 8 times on fresh connections, so most
+    workers serve their first /game (cold caches unless preloaded). Memory
+    is the PSS of master + workers afterwards.
+    """
+    image = game_app.AVAILABLE_IMAGES[0]
+    for label, preload in (('per-worker import', '0'), ('preload_app', '1')):
+        boots, first_games, memory = [], [], []
+        for _ in range(rounds):
+            port = loadtest.free_port()
+            env = dict(os.environ, FAKE_FIRESTORE='1', FAKE_FIRESTORE_TEAMS='10', GUNICORN_PRELOAD=preload,
+                       GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY='4',
+                       GAME_DB_PATH=os.path.join(tempfile.mkdtemp(prefix='ll-bench-'), 'game.db'))
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                loadtest.wait_until_serving(port, process, interval=0.005)
+                boots.append(time.perf_counter() - start)
+                browser = loadtest.Browser(port, loadtest.Recorder())
+                browser.call('login', 'POST', '/login', form={'unique_code': 'code1'}, expect=302)
+                browser.call('image_select', 'GET', '/image-select')
+                for _ in range(8):
+                    browser.close()
+                    started = time.perf_counter()
+                    browser.call('game', 'GET', f'/game/{image}')
+                    first_games.append(time.perf_counter() - started)
+                browser.close()
+                memory.append(_tree_pss_kb(process.pid))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        first_games.sort()
+        print(f"{label:>17}: boot to first request {sum(boots) / len(boots) * 1000:6.0f} ms, "
+              f"/game on fresh workers p50 {first_games[len(first_games) // 2] * 1000:5.1f} ms / "
+              f"max {first_games[-1] * 1000:5.1f} ms, PSS {sum(memory) / len(memory) / 1024:6.1f} MB")
+
+
+def bench_admin(rounds):
+    """Ending a game for N teams: one update per document vs. an admin job.
+
+    The fake backend waits 10 ms per call, roughly a Firestore round trip.
+    Each round flips every team offline (and back online) both ways.
+    """
+    latency = 0.01
+    for teams in (100, 500, 1200):
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = FakeFirestore()
+            refs = seed_teams(db, teams)
+            jobs = AdminJobs(game_app.LOCAL_STORE, FirestoreStorage(lambda: db))
+            db.latency = latency
+            single = batched = 0.0
+            single_ops = batched_ops = 0
+            for r in range(rounds):
+                status = 'offline' if r % 2 == 0 else 'online'
+                before = db.total_ops()
+                start = time.perf_counter()
+                for ref in refs:
+                    ref.update({'status': status})
+                single += time.perf_counter() - start
+                single_ops += db.total_ops() - before
+
+                before = db.total_ops()
+                start = time.perf_counter()
+                row = game_app.LOCAL_STORE.create_admin_job(f'bench-{teams}-{r}', 'set_status',
+                                                            {'teams': None, 'status': status})
+                jobs.run(row['id'], 'set_status', {'teams': None, 'status': status})
+                batched += time.perf_counter() - start
+                batched_ops += db.total_ops() - before
+            job = game_app.LOCAL_STORE.get_admin_job(row['id'])
+            assert job['state'] == 'done' and job['done'] == teams, dict(job)
+        print(f"{teams:>5} teams: individual updates {single / rounds * 1000:7.0f} ms / "
+              f"{single_ops // rounds:>4} calls, admin job {batched / rounds * 1000:5.0f} ms / "
+              f"{batched_ops // rounds:>2} calls ({job['batches']} batches)")
+
+
+class _SyncEventWriter:
+    """Saves each request's events before it returns, for comparison with EventWriter"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def start(self):
+        pass
+
+    def submit(self, rows):
+        self._store.append_events(rows)
+        return len(rows)
+
+
+def bench_events(rounds):
+    """/api/events latency with 20-event batches: queued for the writer vs. saved in the request.
+
+    8 client threads post rounds * 50 batches each; the SQLite store is
+    shared, so synchronous saves also wait on each other's transactions.
+    """
+    image_number = game_app.AVAILABLE_IMAGES[0]
+    original = game_app.EVENT_WRITER
+    for label, writer in (('saved in request', _SyncEventWriter(game_app.LOCAL_STORE)),
+                          ('queued', EventWriter(game_app.LOCAL_STORE, interval=0.25))):
+        game_app.EVENT_WRITER = writer
+        latencies = []
+        lock = threading.Lock()
+
+        def client_thread(i):
+            client = logged_in_client(f'Team-events-{i}', f'events-{i}')
+            # Timings are only taken for the questions of the team's round
+            client.get(f'/game/{image_number}')
+            game_round = game_app.LOCAL_STORE.current_round(f'Team-events-{i}')
+            qids = [f'LAUGH/{image_number:03d}.jpg#{position}' for position in progress.positions(game_round['selected'])]
+            batch = {'events': [{'type': 'attempt', 'question_id': qids[n % len(qids)], 'elapsed_ms': 1000 * n}
+                                for n in range(20)]}
+            own = []
+            for _ in range(rounds * 50):
+                started = time.perf_counter()
+                client.post('/api/events', json=batch)
+                own.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(own)
+
+        threads = [threading.Thread(target=client_thread, args=(i,)) for i in range(8)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if isinstance(writer, EventWriter):
+            writer.close()
+        latencies.sort()
+        print(f"{label:>16}: {len(latencies) / elapsed:7.0f} requests/s, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:5.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:5.2f} ms")
+    game_app.EVENT_WRITER = original
+
+
+BENCHMARKS = {
+    'admin': bench_admin,
+    'answers': bench_answers,
+    'boot': bench_boot,
+    'events': bench_events,
+    'game': bench_game,
+    'schedule': bench_schedule,
+    'serving': bench_serving,
+    'startup': bench_startup,
+    'status': bench_status,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args.rounds)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Per-question solve rates from gameplay events, and the points they suggest.
+
+A question's points come from its difficulty label in data.json
+(``question_bank.get_difficulty_score``: easy 10, medium 20, hard 30,
+impossible 50). The labels were guessed when the questions were written;
+``question_events`` (see ``events.py``) shows how teams actually did. Solve
+rates come only from the attempts and hints the server itself recorded;
+the game page's timings only feed the average solve time.
+
+``LocalStore.question_stats`` aggregates the whole table in one SQLite
+``GROUP BY`` pass, so no event is loaded into Python. ``calibrate`` then
+puts each question's solve rate (teams that answered it correctly / teams
+that tried it) into the ``SOLVE_RATE_BANDS`` band it falls in, and
+suggests that band's difficulty and points. Questions tried by fewer than
+``min_teams`` teams get no suggestion.
+
+    python calibration.py [--db game.db] [--min-teams 5] [--changes] [--json]
+
+or ``GET /admin/calibration`` on a running server.
+"""
+import argparse
+import json
+import sys
+
+from question_bank import get_difficulty_score
+
+# Lowest solve rate of each difficulty, hardest last
+SOLVE_RATE_BANDS = (
+    ('easy', 0.75),
+    ('medium', 0.5),
+    ('hard', 0.25),
+    ('impossible', 0.0),
+)
+MIN_TEAMS = 5
+
+
+def difficulty_for(solve_rate):
+    for difficulty, lowest in SOLVE_RATE_BANDS:
+        if solve_rate >= lowest:
+            return difficulty
+    return SOLVE_RATE_BANDS[-1][0]
+
+
+def calibrate(stats, question_bank, min_teams=MIN_TEAMS):
+    """One dict per question in stats (LocalStore.question_stats rows) with current and suggested points"""
+    results = []
+    for row in stats:
+        question = question_bank.get(row['question_id'])
+        if question is None:
+            # Dropped from data.json since
+            continue
+        solve_rate = row['solved'] / row['teams'] if row['teams'] else 0.0
+        suggested = difficulty_for(solve_rate) if row['teams'] >= min_teams else None
+        results.append({
+            'question_id': row['question_id'],
+            'difficulty': question.difficulty,
+            'points': question.points,
+            'teams': row['teams'],
+            'solved': row['solved'],
+            'hinted': row['hinted'],
+            'attempts': row['attempts'],
+            'solve_rate': round(solve_rate, 3),
+            'solve_ms': round(row['solve_ms']) if row['solve_ms'] is not None else None,
+            'suggested_difficulty': suggested,
+            'suggested_points': get_difficulty_score(suggested) if suggested else None,
+        })
+    return results
+
+
+def summary(results):
+    """{difficulty: {'questions', 'solve_rate' (mean), 'changes'}} over calibrated questions"""
+    by_difficulty = {}
+    for result in results:
+        if result['suggested_difficulty'] is None:
+            continue
+        entry = by_difficulty.setdefault(result['difficulty'], {'questions': 0, 'solve_rate': 0.0, 'changes': 0})
+        entry['questions'] += 1
+        entry['solve_rate'] += result['solve_rate']
+        entry['changes'] += result['suggested_difficulty'] != result['difficulty']
+    for entry in by_difficulty.values():
+        entry['solve_rate'] = round(entry['solve_rate'] / entry['questions'], 3)
+    return by_difficulty
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="local store (default GAME_DB_PATH or game.db)")
+    parser.add_argument('--min-teams', type=int, default=MIN_TEAMS)
+    parser.add_argument('--changes', action='store_true', help="only questions whose suggested points differ")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    from local_store import LocalStore, default_store_path
+    from question_bank import load_question_bank
+
+    store = LocalStore(args.db or default_store_path())
+    results = calibrate(store.question_stats(), load_question_bank('data.json', 'data.bank'), args.min_teams)
+    if args.changes:
+        results = [r for r in results if r['suggested_points'] not in (None, r['points'])]
+    if args.json:
+        json.dump({'questions': results, 'summary': summary(results)}, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{'question':<20} {'difficulty':<11} {'teams':>5} {'solved':>6} {'rate':>6} {'solve s':>8}  suggestion")
+    for r in results:
+        suggestion = '' if r['suggested_difficulty'] is None else (
+            f"{r['suggested_difficulty']} ({r['points']} -> {r['suggested_points']} points)"
+            if r['suggested_points'] != r['points'] else 'keep')
+        solve_s = f"{r['solve_ms'] / 1000:.1f}" if r['solve_ms'] is not None else '-'
+        print(f"{r['question_id']:<20} {r['difficulty']:<11} {r['teams']:>5} {r['solved']:>6} "
+              f"{r['solve_rate']:>6.0%} {solve_s:>8}  {suggestion}")
+    for difficulty, entry in summary(results).items():
+        print(f"{difficulty}: {entry['questions']} questions, mean solve rate {entry['solve_rate']:.0%}, "
+              f"{entry['changes']} to move")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
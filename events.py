@@ -0,0 +1,152 @@
+"""Gameplay events for difficulty calibration.
+
+Outcomes are recorded by the server: ``submit_answer`` and
+``reveal_hint`` queue an ``attempt`` (with the answer index's verdict) or
+a ``hint`` event for every answer checked and hint revealed
+(``server_event``), timed from the start of the round. ``game.js`` also
+measures how long after showing the round each attempt and hint
+happened, and posts those timings to ``/api/events`` in batches (every
+few seconds, and with ``sendBeacon`` when the page is hidden).
+``parse_events`` keeps only timings for questions of the team's round in
+progress, stored as ``client_attempt`` and ``client_hint``: a client can
+skew a solve time, never a solve rate.
+
+``EventWriter`` queues the rows in memory and appends them to the local
+store's ``question_events`` table in one transaction every ``interval``
+seconds, so the request never waits on a disk write. The queue is
+bounded: when the writer falls behind, new events are dropped (and
+counted) rather than growing the worker without limit. Losing a few
+events skews a solve rate much less than a stalled worker hurts the
+game. ``calibration.py`` aggregates the table.
+"""
+import atexit
+import logging
+import threading
+import time
+
+import progress
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('attempt', 'hint')
+# Kind stored for each client timing type
+CLIENT_KINDS = {'attempt': 'client_attempt', 'hint': 'client_hint'}
+# Events accepted per request; game.js sends at most 20 at a time
+MAX_EVENTS_PER_REQUEST = 200
+# Longer than any round; larger elapsed times are not kept
+MAX_ELAPSED_MS = 6 * 3600 * 1000
+
+
+def _elapsed_ms(value):
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= MAX_ELAPSED_MS:
+        return None
+    return value
+
+
+def server_event(team_name, question_id, game_round, kind, correct=None, hint_index=None, now=None):
+    """Row for LocalStore.append_events of an attempt or hint the server just handled"""
+    now = time.time() if now is None else now
+    started = game_round.get('started')
+    elapsed_ms = _elapsed_ms(int((now - started) * 1000)) if started else None
+    return (team_name, question_id, kind, correct, hint_index, elapsed_ms, now)
+
+
+def parse_events(raw_events, team_name, question_ids, now=None):
+    """Timing rows from a posted batch, for the questions in question_ids; returns (rows, rejected)"""
+    now = time.time() if now is None else now
+    rows = []
+    rejected = 0
+    for raw in raw_events:
+        if not isinstance(raw, dict) or raw.get('type') not in EVENT_TYPES:
+            rejected += 1
+            continue
+        question_id = raw.get('question_id')
+        elapsed_ms = _elapsed_ms(raw.get('elapsed_ms'))
+        if not isinstance(question_id, str) or question_id not in question_ids or elapsed_ms is None:
+            rejected += 1
+            continue
+        hint_index = None
+        if raw['type'] == 'hint':
+            hint_index = raw.get('hint_index')
+            if not isinstance(hint_index, int) or isinstance(hint_index, bool) \
+                    or not 0 <= hint_index < progress.HINT_SLOTS:
+                rejected += 1
+                continue
+        rows.append((team_name, question_id, CLIENT_KINDS[raw['type']], None, hint_index, elapsed_ms, now))
+    return rows, rejected
+
+
+class EventWriter:
+    """Bounded write-behind queue in front of ``LocalStore.append_events``"""
+
+    def __init__(self, store, interval=1.0, max_pending=50000):
+        self._store = store
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the background thread once per process"""
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("❌ Event flush failed: %s", e)
+
+    def submit(self, rows):
+        """Queue rows; returns how many were accepted (the rest were dropped)"""
+        with self._lock:
+            room = max(0, self.max_pending - len(self._pending))
+            accepted = rows[:room]
+            self._pending.extend(accepted)
+            self.dropped += len(rows) - len(accepted)
+        if len(accepted) < len(rows):
+            logger.warning("⚠️ Event queue full, dropped %d events", len(rows) - len(accepted))
+        return len(accepted)
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Append every queued event in one transaction; returns events written"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            self._store.append_events(pending)
+        except Exception:
+            # Put them back in front of newer ones, within the bound
+            with self._lock:
+                merged = pending + self._pending
+                self.dropped += max(0, len(merged) - self.max_pending)
+                self._pending = merged[:self.max_pending]
+            raise
+        self.written += len(pending)
+        logger.debug("Saved %d gameplay events", len(pending))
+        return len(pending)
+
+    def close(self):
+        """Stop the background thread and write whatever is still queued"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def register_shutdown_flush(self):
+        atexit.register(self.close)
@@ -0,0 +1,161 @@
+"""Full event results as CSV or NDJSON, streamed at constant memory.
+
+One record per team: its leaderboard counters plus, for every image it
+played, whether the round was completed, its score and each question's
+correctness and hints used (from ``round_results``, see ``progress.py``).
+
+Teams are read a page at a time from the local store, which also holds
+the rounds, so a team's counters and rounds agree. Firestore (an
+``order_by('name')`` query with ``start_after`` cursors) is opt-in: its
+counters lag by whatever is still waiting in the sync outbox. Records and lines are generated one team at a
+time, so memory stays flat however many teams there are. ``/admin/export``
+streams the lines as the response body; run this module to write them to
+disk instead, without the server:
+
+    python export.py --out results.csv                 local store (GAME_DB_PATH)
+    python export.py --format ndjson --out results.ndjson --firestore
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import progress
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+PAGE_SIZE = 500
+
+# One CSV row per question played; teams that played nothing get one row
+# with the question columns empty
+CSV_COLUMNS = ('team', 'total_points', 'wins', 'games_played', 'status', 'image', 'image_completed',
+               'round_score', 'question_id', 'difficulty', 'correct', 'hints_used')
+
+
+def local_teams(store, page_size=PAGE_SIZE):
+    """Every team in the local store as a Firestore-shaped document, by name"""
+    after = None
+    while True:
+        rows = store.leaderboard_page(after, page_size)
+        for row in rows:
+            yield {'name': row['team_name'], 'totalPoints': row['total_points'], 'wins': row['wins'],
+                   'gamesPlayed': row['games_played'], 'status': row['status']}
+        if len(rows) < page_size:
+            return
+        after = rows[-1]['team_name']
+
+
+def firestore_teams(storage, page_size=PAGE_SIZE):
+    """Every leaderboard document, by name, one query per page (storage.FirestoreStorage)"""
+    for page in storage.leaderboard_pages(page_size):
+        for snapshot in page:
+            yield snapshot.to_dict()
+
+
+def team_results(teams, store, question_bank=None):
+    """Add each team's rounds from store to its document; yields result records"""
+    for team in teams:
+        images = []
+        for game_round in store.round_results(team['name']):
+            image_key = f"LAUGH/{game_round['image']:03d}.jpg"
+            questions = []
+            for position in progress.positions(game_round['selected']):
+                qid = f"{image_key}#{position}"
+                question = question_bank.get(qid) if question_bank is not None else None
+                questions.append({
+                    'question_id': qid,
+                    'difficulty': question.difficulty if question is not None else None,
+                    'correct': bool(game_round['solved'] >> position & 1),
+                    'hints_used': progress.hints_revealed(game_round['hints'], position),
+                })
+            images.append({'image': game_round['image'], 'completed': progress.round_finished(game_round),
+                           'score': game_round['score'], 'questions': questions})
+        yield {
+            'team': team['name'],
+            'total_points': team.get('totalPoints', 0),
+            'wins': team.get('wins', 0),
+            'games_played': team.get('gamesPlayed', 0),
+            'status': team.get('status'),
+            'images': images,
+        }
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(CSV_COLUMNS)
+    yield take()
+    for record in records:
+        team = [record['team'], record['total_points'], record['wins'], record['games_played'], record['status']]
+        rows = 0
+        for image in record['images']:
+            for question in image['questions']:
+                writer.writerow(team + [image['image'], image['completed'], image['score'], question['question_id'],
+                                        question['difficulty'], question['correct'], question['hints_used']])
+                rows += 1
+        if not rows:
+            writer.writerow(team + [''] * (len(CSV_COLUMNS) - len(team)))
+        yield take()
+
+
+def render(fmt, records):
+    """Lines of the export in fmt ('csv' or 'ndjson')"""
+    return csv_lines(records) if fmt == 'csv' else ndjson_lines(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--out', default='-', help="file to write ('-' for stdout)")
+    parser.add_argument('--db', help="local store (default GAME_DB_PATH or game.db)")
+    parser.add_argument('--firestore', action='store_true',
+                        help="read teams from Firestore (credentials as for the app) instead of the local store")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    from local_store import LocalStore, default_store_path
+    from question_bank import load_question_bank
+
+    store = LocalStore(args.db or default_store_path())
+    if args.firestore:
+        from score_writer import ScoreWriter
+        from storage import FirestoreStorage, connect
+        client = connect()
+        if client is None:
+            parser.error("no Firestore credentials configured")
+        storage = FirestoreStorage(lambda: client)
+        # Send the outbox first, so the counters include every round exported
+        writer = ScoreWriter(store, storage)
+        while writer.flush():
+            pass
+        teams = firestore_teams(storage, args.page_size)
+    else:
+        teams = local_teams(store, args.page_size)
+    records = team_results(teams, store, load_question_bank('data.json', 'data.bank'))
+
+    out = sys.stdout if args.out == '-' else open(args.out, 'w', newline='', encoding='utf-8')
+    try:
+        count = 0
+        for line in render(args.format, records):
+            out.write(line)
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Wrote {count - (args.format == 'csv')} teams to {args.out}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
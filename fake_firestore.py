@@ -0,0 +1,323 @@
+"""In-process stand-in for the parts of the Firestore client the app uses.
+
+Supports ``collection().where().order_by().start_after().limit().get()/stream()``, ``add``,
+``document().get()/create()/set()/update()`` with ``firestore.Increment``,
+``batch()`` and ``on_snapshot`` listeners, and counts every backend
+operation in ``ops`` so benchmarks can report how many round trips a code
+path costs. ``latency`` makes each of those operations sleep like a real
+round trip would.
+
+The app uses it instead of Firebase when ``FAKE_FIRESTORE`` is set (see
+``client_from_env``), e.g. to run gunicorn locally against a slow backend:
+
+    FAKE_FIRESTORE=1 FAKE_FIRESTORE_LATENCY=0.05-0.2 FAKE_FIRESTORE_TEAMS=100 gunicorn app:app
+"""
+import enum
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1.transforms import Increment
+
+
+class ChangeType(enum.Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, type, document):
+        self.type = type
+        self.document = document
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+def _apply(base, data):
+    for key, value in data.items():
+        if isinstance(value, Increment):
+            base[key] = base.get(key, 0) + value.value
+        else:
+            base[key] = value
+
+
+class DocumentReference:
+    def __init__(self, collection, id):
+        self._collection = collection
+        self.id = id
+
+    @property
+    def path(self):
+        return f"{self._collection.id}/{self.id}"
+
+    def get(self):
+        client = self._collection._client
+        client._count('get', self._collection.id)
+        with client._lock:
+            data = self._collection._docs.get(self.id)
+            return DocumentSnapshot(self, dict(data) if data is not None else None)
+
+    def create(self, data):
+        self._collection._client._count('create', self._collection.id)
+        with self._collection._client._lock:
+            if self.id in self._collection._docs:
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            self._collection._write(self, data, merge=False)
+
+    def set(self, data, merge=False):
+        self._collection._client._count('set', self._collection.id)
+        self._collection._write(self, data, merge=merge)
+
+    def update(self, data):
+        self._collection._client._count('update', self._collection.id)
+        if self.id not in self._collection._docs:
+            raise NotFound(f"No document to update: {self.path}")
+        self._collection._write(self, data, merge=True)
+
+    def delete(self):
+        self._collection._client._count('delete', self._collection.id)
+        self._collection._remove(self)
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class Query:
+    def __init__(self, collection, filters=(), limit_to=None, order=None, after=None):
+        self._collection = collection
+        self._filters = filters
+        self._limit = limit_to
+        # Ascending on one field, like the real client; documents without it are left out
+        self._order = order
+        self._after = after
+
+    def _copy(self, **changes):
+        options = {'filters': self._filters, 'limit_to': self._limit, 'order': self._order, 'after': self._after}
+        options.update(changes)
+        return Query(self._collection, **options)
+
+    def where(self, field, op, value):
+        if op != '==':
+            raise NotImplementedError(f"fake_firestore only supports '==', not {op!r}")
+        return self._copy(filters=self._filters + ((field, value),))
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def order_by(self, field):
+        return self._copy(order=field)
+
+    def start_after(self, cursor):
+        """cursor: a snapshot or {order_by field: value}"""
+        if self._order is None:
+            raise ValueError("start_after needs order_by")
+        values = cursor._data if isinstance(cursor, DocumentSnapshot) else cursor
+        return self._copy(after=values[self._order])
+
+    def _matches(self):
+        with self._collection._client._lock:
+            items = list(self._collection._docs.items())
+        results = [
+            DocumentSnapshot(DocumentReference(self._collection, doc_id), dict(data))
+            for doc_id, data in items
+            if all(data.get(field) == value for field, value in self._filters)
+        ]
+        if self._order is not None:
+            results = sorted((r for r in results if self._order in r._data), key=lambda r: r._data[self._order])
+            if self._after is not None:
+                results = [r for r in results if r._data[self._order] > self._after]
+        return results[:self._limit] if self._limit is not None else results
+
+    def get(self):
+        self._collection._client._count('query', self._collection.id)
+        return self._matches()
+
+    def stream(self):
+        self._collection._client._count('query', self._collection.id)
+        return iter(self._matches())
+
+
+class Watch:
+    def __init__(self, collection, callback):
+        self._collection = collection
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._collection._client._lock:
+            if self in self._collection._watches:
+                self._collection._watches.remove(self)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, id):
+        super().__init__(self)
+        self._client = client
+        self.id = id
+        self._docs = {}
+        self._watches = []
+
+    def document(self, document_id=None):
+        return DocumentReference(self, document_id or f"doc{next(self._client._ids)}")
+
+    def add(self, data):
+        self._client._count('add', self.id)
+        ref = self.document()
+        self._write(ref, data, merge=False)
+        return datetime.now(timezone.utc), ref
+
+    def on_snapshot(self, callback):
+        """Register a listener; it receives the full collection immediately"""
+        self._client._count('listen', self.id)
+        watch = Watch(self, callback)
+        with self._client._lock:
+            self._watches.append(watch)
+            docs = [DocumentSnapshot(DocumentReference(self, i), dict(d)) for i, d in self._docs.items()]
+        callback(docs, [DocumentChange(ChangeType.ADDED, d) for d in docs], datetime.now(timezone.utc))
+        return watch
+
+    def _write(self, ref, data, merge):
+        with self._client._lock:
+            existed = ref.id in self._docs
+            base = dict(self._docs.get(ref.id, {})) if merge else {}
+            _apply(base, data)
+            self._docs[ref.id] = base
+            watches = list(self._watches)
+        change = ChangeType.MODIFIED if existed else ChangeType.ADDED
+        self._notify(watches, DocumentChange(change, DocumentSnapshot(ref, dict(base))))
+
+    def _remove(self, ref):
+        with self._client._lock:
+            data = self._docs.pop(ref.id, None)
+            watches = list(self._watches)
+        if data is not None:
+            self._notify(watches, DocumentChange(ChangeType.REMOVED, DocumentSnapshot(ref, data)))
+
+    def _notify(self, watches, change):
+        for watch in watches:
+            watch._callback([change.document], [change], datetime.now(timezone.utc))
+
+
+class WriteBatch:
+    """Buffered writes applied together on ``commit`` (one backend round trip)"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, False))
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, True))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError("A write batch can have at most 500 writes")
+        self._client._count('commit', 'batch')
+        with self._client._lock:
+            # Preconditions see the earlier writes of the same batch
+            exists = {}
+            for op, reference, _, _ in self._writes:
+                existed = exists.get(reference, reference.id in reference._collection._docs)
+                if op == 'create' and existed:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+                if op == 'update' and not existed:
+                    raise NotFound(f"No document to update: {reference.path}")
+                exists[reference] = op != 'delete'
+            for op, reference, data, merge in self._writes:
+                if op == 'delete':
+                    reference._collection._remove(reference)
+                else:
+                    reference._collection._write(reference, data, merge=merge)
+        self._writes = []
+        return []
+
+
+class FakeFirestore:
+    """Drop-in replacement for ``firestore.client()`` in tests and benchmarks"""
+
+    def __init__(self, latency=None):
+        """latency: seconds per backend operation, or a (low, high) range drawn uniformly"""
+        self._collections = {}
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.ops = Counter()
+        self.latency = latency
+
+    def _count(self, op, collection_id):
+        self.ops[(op, collection_id)] += 1
+        # Called before taking the lock, so concurrent calls wait side by side
+        if self.latency:
+            time.sleep(random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency)
+
+    def collection(self, collection_id):
+        with self._lock:
+            if collection_id not in self._collections:
+                self._collections[collection_id] = CollectionReference(self, collection_id)
+            return self._collections[collection_id]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def total_ops(self, *ops):
+        """Total operations, optionally limited to the given op names"""
+        return sum(n for (op, _), n in self.ops.items() if not ops or op in ops)
+
+
+def parse_latency(spec):
+    """'0.1' -> 0.1, '0.05-0.2' -> (0.05, 0.2), '' -> None"""
+    spec = (spec or '').strip()
+    if not spec:
+        return None
+    low, sep, high = spec.partition('-')
+    return (float(low), float(high)) if sep else float(low)
+
+
+def seed_participants(client, count):
+    """Participants code0..code<count-1> named 'Team 0'.. for local logins"""
+    participants = client.collection('participants')
+    for i in range(count):
+        participants.document(f'participant{i}').set({'uniqueCode': f'code{i}', 'teamName': f'Team {i}'})
+
+
+def client_from_env(environ=os.environ):
+    """A FakeFirestore configured from FAKE_FIRESTORE* variables, or None if unset"""
+    if not environ.get('FAKE_FIRESTORE'):
+        return None
+    client = FakeFirestore(latency=parse_latency(environ.get('FAKE_FIRESTORE_LATENCY')))
+    # Seeding shouldn't pay the injected latency
+    latency, client.latency = client.latency, None
+    seed_participants(client, int(environ.get('FAKE_FIRESTORE_TEAMS', 0)))
+    client.ops.clear()
+    client.latency = latency
+    return client
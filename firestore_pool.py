@@ -0,0 +1,71 @@
+"""Bounded thread pool that puts a deadline on Firestore calls.
+
+The Firestore client blocks the calling thread for a full round trip, and
+for as long as a stalled backend takes. ``gather`` runs calls here and
+waits at most ``timeout`` seconds, so the request thread is given back
+either way; late calls finish in the pool. Login's bootstrap is the one
+caller, a single batched write. ``gather`` also takes several independent
+calls and runs them side by side, paying the slowest instead of the sum.
+
+Calls run in a copy of the caller's context, so the request (for metrics
+labels and request ids) is still visible inside them. With
+``max_workers=0`` everything runs inline, which is handy for comparing.
+"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class FirestorePool:
+    def __init__(self, max_workers=16, timeout=10.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='firestore')
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.timeouts = 0
+
+    def _finished(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool; returns a Future"""
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        else:
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        future.add_done_callback(self._finished)
+        return future
+
+    def gather(self, *calls, timeout=None):
+        """Run zero-argument callables side by side and return their results in order.
+
+        The first exception raised by a call is re-raised. Raises
+        TimeoutError if they aren't all done after timeout (default: the
+        pool's) seconds.
+        """
+        futures = [self.submit(call) for call in calls]
+        done, not_done = wait(futures, timeout=self.timeout if timeout is None else timeout)
+        if not_done:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"{len(not_done)} of {len(futures)} Firestore calls still running")
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
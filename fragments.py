@@ -0,0 +1,58 @@
+"""Pre-rendered question cards for /game/<n>.
+
+A question's card (text, difficulty badge, points, answer box, hint
+buttons) is the same in every round except for its position, which shows
+up in element ids and the "Q3." label. Each card is rendered once through
+``partials/question_card.html`` with ``INDEX_MARK`` as the position; a
+request then only joins up to ten cached cards around the real
+positions instead of running the template loop for every question.
+"""
+from markupsafe import Markup
+
+from cache import TTLCache
+
+# Stands in for q_index while rendering; cannot occur in escaped question text
+INDEX_MARK = '\x00q\x00'
+TEMPLATE = 'partials/question_card.html'
+
+
+class QuestionFragments:
+    """LRU of rendered cards keyed by question id"""
+
+    def __init__(self, jinja_env, maxsize=4096):
+        self._env = jinja_env
+        self._template = None
+        # Cards only change with the template, so entries never expire
+        self.cache = TTLCache(maxsize=maxsize, ttl=float('inf'))
+
+    def _get_template(self):
+        if self._template is None:
+            self._template = self._env.get_template(TEMPLATE)
+        elif self._env.auto_reload and not self._template.is_up_to_date:
+            # Template edited while developing: drop cards rendered from the old one
+            self.cache.clear()
+            self._template = self._env.get_template(TEMPLATE)
+        return self._template
+
+    def _fragment(self, question):
+        """The rendered card split around INDEX_MARK"""
+        template = self._get_template()
+        parts = self.cache.get(question.qid)
+        if parts is None:
+            parts = template.render(question=question, q_index=INDEX_MARK).split(INDEX_MARK)
+            self.cache.set(question.qid, parts)
+        return parts
+
+    def card(self, question, index):
+        """The card for question at 1-based position index in the round"""
+        return Markup(str(index).join(self._fragment(question)))
+
+    def cards(self, questions):
+        return [self.card(question, index) for index, question in enumerate(questions, 1)]
+
+    def warm(self, questions):
+        for question in questions:
+            self._fragment(question)
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,84 @@
+"""Gunicorn settings; ``gunicorn app:app`` reads this file from the working directory.
+
+Workers are threaded (gthread) by default. Routes block on Firestore round
+trips and /api/status/stream holds its connection open, so with the
+``sync`` worker each of those pinned a whole process and concurrency was
+the worker count. Now a waiting request holds one thread, and the GIL is
+released while it waits. The app's shared state (caches, the SQLite store
+with one connection per thread, background writers) is thread-safe.
+
+With ``preload_app`` (the default) the master imports the app once,
+warms its read-only caches and forks the workers from it, so a worker
+boots in a few milliseconds and shares the question bank, answer index,
+rendered cards and image bytes copy-on-write. Nothing that must not
+cross fork exists yet at that point: the Firestore client is created on
+first use (storage.LazyClient), background threads start with the first
+request, the master's SQLite connection is closed (app.prepare_fork) and
+each worker starts its own logging thread (post_fork, see log_config.py).
+
+Each open /api/status/stream holds a thread for up to a minute, so a
+worker gets ``MAX_STATUS_STREAMS`` threads for them on top of
+``GUNICORN_THREADS`` for everything else; app.py refuses streams beyond
+that (the page then polls), and no number of open tabs can take a
+request's thread. The sync worker has no thread to spare, so there every
+page polls.
+
+    WEB_CONCURRENCY=2          worker processes
+    GUNICORN_THREADS=16        threads per worker for requests
+    MAX_STATUS_STREAMS=16      open status streams per worker, each with a thread of its own
+    FIRESTORE_POOL_SIZE        threads for login's deadline-bound Firestore write (default GUNICORN_THREADS)
+    GUNICORN_WORKER_CLASS=gthread | sync
+    PORT=8000                  or GUNICORN_BIND=host:port
+    GUNICORN_PRELOAD=1         0 imports the app in every worker instead
+    SECRET_KEY                 session signing key; required with GUNICORN_PRELOAD=0
+"""
+import os
+import sys
+import threading
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class != 'gthread':
+    # Read by app.py in the workers
+    os.environ['MAX_STATUS_STREAMS'] = '0'
+streams = int(os.environ.get('MAX_STATUS_STREAMS', 16))
+# gunicorn turns sync into gthread whenever threads > 1
+threads = int(os.environ.get('GUNICORN_THREADS', 16)) + streams if worker_class == 'gthread' else 1
+# Idle keep-alive connections hold a thread slot; don't let them linger
+keepalive = 5
+timeout = 60
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    """Runs in the master right before the first workers are forked"""
+    if server.cfg.preload_app:
+        import app
+        app.prepare_fork()
+
+
+def post_fork(server, worker):
+    """Runs in each new worker, before it installs its signal handlers"""
+    # The master's log listener thread wasn't copied
+    import log_config
+    log_config.start_logging()
+
+    # A graceful stop waits for open requests, and a status stream only ends
+    # by itself after a minute: end the streams as soon as the stop begins
+    handle_exit = worker.handle_exit
+
+    def end_streams_and_exit(sig, frame):
+        app = sys.modules.get('app')
+        if app is not None:
+            # Not from the signal handler itself: it takes the hub's lock
+            threading.Thread(target=app.STATUS_HUB.close_streams, daemon=True).start()
+        handle_exit(sig, frame)
+
+    worker.handle_exit = end_streams_and_exit
+
+
+def worker_exit(server, worker):
+    """Runs in a worker as it exits: write out the log records still queued"""
+    import log_config
+    log_config.stop_logging()
@@ -0,0 +1,302 @@
+"""Resized AVIF/WebP/progressive-JPEG copies of the game images.
+
+Each ``static/LAUGH/*.jpg`` gets one file per (width, format), named after
+a hash of its bytes (``LAUGH/001-640.3fa9c2d41b7e.webp``). The files can be
+cached forever, because changed content always gets a new URL.
+``manifest.json`` in the output directory maps each image key to its
+variants and to the size/mtime of the source they were made from.
+
+Variants are built ahead of time with ``python image_variants.py``, or
+on demand: the first request for an image that has none schedules a
+build on a background thread and is served the original meanwhile.
+Pillow is optional; without it (or for formats the installed Pillow
+cannot encode) the originals are served as before.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import safe_join
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow not installed: serve originals only
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+# Widths the game layout needs: phones, the half-width desktop column, 2x
+WIDTHS = (320, 640, 1024)
+SIZES = '(max-width: 768px) 100vw, 560px'
+
+# Format -> (Pillow format name, extension, MIME type, save options).
+# Browsers pick the first <source> they support, so order matters.
+FORMATS = {
+    'avif': ('AVIF', 'avif', 'image/avif', {'quality': 50}),
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 78, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 80, 'progressive': True, 'optimize': True}),
+}
+
+
+def available_formats():
+    """Formats the installed Pillow can encode, in preference order"""
+    if Image is None:
+        return []
+    return [name for name in FORMATS if name == 'jpeg' or features.check(name)]
+
+
+def preferred_format(accept_header, formats):
+    """Best format in formats for a request's Accept header (jpeg if nothing better)"""
+    accept = (accept_header or '').lower()
+    for name in formats:
+        if name == 'jpeg' or FORMATS[name][2] in accept:
+            return name
+    return 'jpeg'
+
+
+def variant_etag(filename):
+    """The content hash embedded in a variant's filename, or None"""
+    parts = os.path.basename(filename).split('.')
+    return parts[-2] if len(parts) >= 3 else None
+
+
+def target_widths(width):
+    """Standard widths below the original, plus the original (capped at the largest)"""
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_variants(source_path, image_key, output_dir, formats=None):
+    """Encode every (width, format) variant of one image; returns its manifest entry"""
+    formats = formats or available_formats()
+    stem, _ = os.path.splitext(image_key)
+    signature = _source_signature(source_path)
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    width, height = image.size
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {name: [] for name in formats}
+    for target in target_widths(width):
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS)
+        for name in formats:
+            pil_format, extension, _, options = FORMATS[name]
+            frame = resized.convert('RGB') if pil_format == 'JPEG' and resized.mode != 'RGB' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            filename = f"{stem}-{target}.{digest}.{extension}"
+            path = os.path.join(output_dir, filename)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            variants[name].append([target, filename, len(data)])
+    return {'source': signature, 'width': width, 'height': height, 'variants': variants}
+
+
+class ImageVariants:
+    """Manifest lookups plus background builds for images that have none yet"""
+
+    def __init__(self, source_dir, output_dir, auto_build=True):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.manifest_path = os.path.join(output_dir, 'manifest.json')
+        self.auto_build = auto_build and Image is not None
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._manifest_mtime = None
+        self._pending = set()
+        self._executor = None
+        self._reload()
+
+    def _reload(self):
+        """Re-read the manifest if another process (or the CLI) rewrote it"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable image manifest %s: %s", self.manifest_path, e)
+            return
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        with self._lock:
+            self._entries = manifest.get('images', {})
+            self._manifest_mtime = mtime
+
+    @property
+    def entries(self):
+        return dict(self._entries)
+
+    def _is_fresh(self, image_key, entry):
+        try:
+            return entry['source'] == _source_signature(os.path.join(self.source_dir, image_key))
+        except OSError:
+            return False
+
+    def get(self, image_key):
+        """The manifest entry for image_key, or None (scheduling a build if allowed)"""
+        entry = self._entries.get(image_key)
+        if entry is None or not self._is_fresh(image_key, entry):
+            self._reload()
+            entry = self._entries.get(image_key)
+        if entry is not None and self._is_fresh(image_key, entry):
+            return entry
+        if self.auto_build:
+            self._schedule(image_key)
+        return None
+
+    def _schedule(self, image_key):
+        with self._lock:
+            if image_key in self._pending:
+                return
+            self._pending.add(image_key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+        self._executor.submit(self._build_one, image_key)
+
+    def _build_one(self, image_key):
+        try:
+            self.build([image_key])
+        except Exception as e:
+            logger.warning("Could not build variants for %s: %s", image_key, e)
+        finally:
+            with self._lock:
+                self._pending.discard(image_key)
+
+    def build(self, image_keys, force=False):
+        """Build variants for image_keys and merge them into the manifest"""
+        built = {}
+        for image_key in image_keys:
+            entry = self._entries.get(image_key)
+            if not force and entry is not None and self._is_fresh(image_key, entry):
+                continue
+            source_path = os.path.join(self.source_dir, image_key)
+            if os.path.exists(source_path):
+                built[image_key] = build_variants(source_path, image_key, self.output_dir)
+        if built:
+            self._save(built)
+        return built
+
+    def _save(self, new_entries):
+        with self._lock:
+            # Merge with what other workers may have written since we loaded it
+            images = {}
+            try:
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    on_disk = json.load(f)
+                if on_disk.get('version') == MANIFEST_VERSION:
+                    images = on_disk.get('images', {})
+            except (OSError, ValueError):
+                pass
+            images.update(self._entries)
+            images.update(new_entries)
+            data = json.dumps({'version': MANIFEST_VERSION, 'images': images}, sort_keys=True)
+            _write_atomic(self.manifest_path, data.encode('utf-8'))
+            self._entries = images
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    def files(self, image_key, fmt):
+        """[width, filename, bytes] for each variant of one format, smallest first"""
+        entry = self.get(image_key)
+        return entry['variants'].get(fmt, []) if entry is not None else []
+
+    def read(self, filename):
+        """(bytes, etag, mimetype) for a variant file, or None if there is no such file"""
+        path = safe_join(self.output_dir, filename)
+        etag = variant_etag(filename)
+        extension = os.path.splitext(filename)[1].lstrip('.')
+        mimetype = next((f[2] for f in FORMATS.values() if f[1] == extension), None)
+        if path is None or etag is None or mimetype is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read(), etag, mimetype
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def picture(self, image_key, url_for_file):
+        """Template data for a <picture> element, or None to use the original.
+
+        url_for_file(filename) builds the URL for a variant file.
+        """
+        entry = self.get(image_key)
+        if entry is None:
+            return None
+        sources = []
+        for name, variants in entry['variants'].items():
+            if not variants:
+                continue
+            srcset = ', '.join(f"{url_for_file(filename)} {width}w" for width, filename, _ in variants)
+            sources.append({'format': name, 'type': FORMATS[name][2], 'srcset': srcset})
+        fallback = next((s for s in sources if s['format'] == 'jpeg'), None)
+        if fallback is None:
+            return None
+        _, largest, _ = entry['variants']['jpeg'][-1]
+        return {
+            'sources': [s for s in sources if s is not fallback],
+            'srcset': fallback['srcset'],
+            'src': url_for_file(largest),
+            'sizes': SIZES,
+            'width': entry['width'],
+            'height': entry['height'],
+        }
+
+
+def summarize(manifest_entries, source_dir):
+    """Bytes of the originals vs. the 640px-or-smaller variant per format"""
+    totals = {'original': 0}
+    for image_key, entry in manifest_entries.items():
+        totals['original'] += os.path.getsize(os.path.join(source_dir, image_key))
+        for name, variants in entry['variants'].items():
+            fitting = [v for v in variants if v[0] <= 640] or variants[:1]
+            totals[name] = totals.get(name, 0) + fitting[-1][2]
+    return totals
+
+
+if __name__ == '__main__':
+    if Image is None:
+        sys.exit("Pillow is required to build image variants (pip install Pillow)")
+    source_dir = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('-') else 'static'
+    output_dir = os.environ.get('IMAGE_VARIANTS_DIR', 'variants')
+    force = '--force' in sys.argv
+    variants = ImageVariants(source_dir, output_dir, auto_build=False)
+    keys = sorted(
+        os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+        for root, _, names in os.walk(os.path.join(source_dir, 'LAUGH'))
+        for name in names if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+    built = variants.build(keys, force=force)
+    print(f"✅ Built variants for {len(built)} of {len(keys)} images into {output_dir} "
+          f"({', '.join(available_formats())})")
+    totals = summarize(variants.entries, source_dir)
+    for name, size in totals.items():
+        print(f"   {name:>8}: {size / 1024:8.1f} KiB")
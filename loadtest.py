@@ -0,0 +1,432 @@
+"""Event-day load test: simulated teams playing against gunicorn and the fake Firestore.
+
+Usage:
+    python loadtest.py [--teams N] [--duration S] [--pace F] [--latency L] [--streams N]
+                       [--workers N] [--threads N] [--save FILE] [--compare FILE]
+
+Starts ``gunicorn app:app`` with the in-process fake backend
+(``FAKE_FIRESTORE``, see storage.py) and ``--latency`` seconds of injected
+delay per Firestore call, then lets every team play for ``--duration``
+seconds. A team logs in (logins are spread over the first few seconds),
+opens the dashboard, and then keeps playing rounds:
+
+    GET  /image-select              pick the first offered image
+    GET  /game/<n>                  the round's questions
+    POST /api/submit_answer         one per question, a wrong guess first 30% of the time
+    POST /api/complete_image        once every question is answered
+
+with 3-10 s of thinking before each answer, while its page keeps
+/api/status/stream open like main.js does: reconnecting when the server
+ends the stream, and polling /api/status every 3 s for a minute when it
+refuses one. ``--streams`` limits that to the first N teams (the rest
+only poll). ``--pace`` scales every wait (0.1 is ten times as busy). The report has requests, errors, throughput and p50/p95/p99
+latency per route, how many streams were opened and refused, plus the Firestore calls each route made, scraped from
+/metrics (with several workers that is one worker's share).
+
+``--save`` writes the results as JSON. ``--compare`` checks a run against
+saved results and exits with status 1 if a route got slower, lost
+throughput or makes more Firestore calls than it used to; keep one file
+per release (e.g. ``--save baselines/v1.4.json``) to compare against.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from question_bank import load_question_bank
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# main.js retries a refused status stream after this long, polling meanwhile
+STREAM_RETRY = 60.0
+
+# Report order; keys are the Flask endpoints, so they match /metrics labels
+ROUTES = ('login', 'dashboard', 'api_status', 'image_select', 'game',
+          'submit_answer', 'complete_image')
+
+_IMAGE_OFFER = re.compile(r'selectImage\((\d+)\)')
+_QUESTION_ID = re.compile(r'data-qid="([^"]+)"')
+_FIRESTORE_CALLS = re.compile(r'^firestore_calls_total\{endpoint="([^"]*)",method="([^"]*)",kind="([^"]*)"\} (\S+)$',
+                              re.MULTILINE)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(port, process, timeout=60.0, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/login')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(interval)
+    raise RuntimeError("gunicorn did not start")
+
+
+@contextlib.contextmanager
+def gunicorn(teams, latency, **overrides):
+    """Run gunicorn against a fake Firestore seeded with teams participants; yields the port"""
+    port = free_port()
+    env = dict(os.environ, FAKE_FIRESTORE='1', FAKE_FIRESTORE_LATENCY=latency,
+               FAKE_FIRESTORE_TEAMS=str(teams), GUNICORN_BIND=f'127.0.0.1:{port}', **overrides)
+    for name in ('FIREBASE_CREDENTIALS', 'FIREBASE_CREDENTIALS_PATH', 'FIREBASE_CREDENTIALS_JSON', 'METRICS_TOKEN'):
+        env.pop(name, None)
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    env.setdefault('SECRET_KEY', os.urandom(16).hex())
+    # Never write simulated teams into the repo's game.db
+    env.setdefault('GAME_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='ll-loadtest-'), 'game.db'))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_serving(port, process)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+class Recorder:
+    """Latencies and errors per route, from every team thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+        self.streams = {'opened': 0, 'refused': 0}
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies[route].append(seconds)
+            else:
+                self.errors[route] += 1
+
+    def record_stream(self, opened):
+        with self._lock:
+            self.streams['opened' if opened else 'refused'] += 1
+
+
+class Browser:
+    """One team's keep-alive connection and session cookie"""
+
+    def __init__(self, port, recorder):
+        self.port = port
+        self.recorder = recorder
+        self.cookie = None
+        self._conn = None
+
+    def _request(self, method, path, body, headers):
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self._conn.request(method, path, body, headers)
+                response = self._conn.getresponse()
+                return response, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; that's not an error
+                self._conn.close()
+                self._conn = None
+                if attempt == 2:
+                    raise
+
+    def call(self, route, method, path, form=None, payload=None, expect=200):
+        """Make a request and record its latency; returns the body, or None on failure"""
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        start = time.perf_counter()
+        try:
+            response, data = self._request(method, path, body, headers)
+        except OSError:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.recorder.record(route, time.perf_counter() - start, False)
+            return None
+        elapsed = time.perf_counter() - start
+        for header in response.headers.get_all('Set-Cookie') or ():
+            if header.startswith('session='):
+                self.cookie = header.split(';', 1)[0]
+        ok = response.status == expect
+        if ok and payload is not None:
+            ok = json.loads(data).get('success', False)
+        self.recorder.record(route, elapsed, ok)
+        return data if ok else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Team:
+    """Plays rounds like a person would until the deadline"""
+
+    def __init__(self, number, port, recorder, answers, deadline, pace):
+        self.code = f'code{number}'
+        self.recorder = recorder
+        self.port = port
+        self.answers = answers
+        self.deadline = deadline
+        self.pace = pace
+        self.rng = random.Random(number)
+        self.browser = Browser(port, recorder)
+        self.logged_in = threading.Event()
+
+    def wait(self, low, high):
+        """Think for low..high seconds (scaled by pace); False once the test is over"""
+        pause = self.rng.uniform(low, high) * self.pace
+        time.sleep(max(0.0, min(pause, self.deadline - time.monotonic())))
+        return time.monotonic() < self.deadline
+
+    def poll_status(self, until=None):
+        """The page's /api/status timer, on its own connection, until the deadline (or until)"""
+        self.logged_in.wait()
+        until = self.deadline if until is None else min(until, self.deadline)
+        poller = Browser(self.port, self.recorder)
+        while time.monotonic() < until:
+            poller.cookie = self.browser.cookie
+            poller.call('api_status', 'GET', '/api/status')
+            time.sleep(max(0.0, min(3.0 * self.pace, until - time.monotonic())))
+        poller.close()
+
+    def watch_status(self):
+        """The page's /api/status/stream, on its own connection, polling while refused"""
+        self.logged_in.wait()
+        while time.monotonic() < self.deadline:
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                conn.request('GET', '/api/status/stream', headers={'Cookie': self.browser.cookie or ''})
+                response = conn.getresponse()
+                if response.status == 200:
+                    self.recorder.record_stream(True)
+                    # Hold it until the server ends it (then reconnect) or the test is over
+                    while time.monotonic() < self.deadline:
+                        conn.sock.settimeout(max(0.1, self.deadline - time.monotonic()))
+                        if not response.readline():
+                            break
+                    continue
+                response.read()
+            except OSError:
+                continue
+            finally:
+                conn.close()
+            self.recorder.record_stream(False)
+            self.poll_status(until=time.monotonic() + STREAM_RETRY * self.pace)
+
+    def play(self, start_at):
+        time.sleep(max(0.0, start_at - time.monotonic()))
+        try:
+            if self.browser.call('login', 'POST', '/login', form={'unique_code': self.code}, expect=302) is None:
+                return
+            self.logged_in.set()
+            self.browser.call('dashboard', 'GET', '/dashboard')
+            while self.wait(1, 3):
+                page = self.browser.call('image_select', 'GET', '/image-select')
+                offers = _IMAGE_OFFER.findall(page.decode('utf-8')) if page else []
+                if not offers or not self.wait(1, 2):
+                    continue
+                page = self.browser.call('game', 'GET', f'/game/{offers[0]}')
+                if page is None:
+                    continue
+                if not self.play_round(_QUESTION_ID.findall(page.decode('utf-8'))):
+                    return
+                self.browser.call('complete_image', 'POST', '/api/complete_image', payload={})
+        finally:
+            self.logged_in.set()
+            self.browser.close()
+
+    def play_round(self, question_ids):
+        """Answer every question; False if the test ended first"""
+        for qid in dict.fromkeys(question_ids):
+            if not self.wait(3, 10):
+                return False
+            if self.rng.random() < 0.3:
+                self.browser.call('submit_answer', 'POST', '/api/submit_answer',
+                                  payload={'question_id': qid, 'answer': 'no idea'})
+                if not self.wait(2, 5):
+                    return False
+            self.browser.call('submit_answer', 'POST', '/api/submit_answer',
+                              payload={'question_id': qid, 'answer': self.answers[qid]})
+        return True
+
+
+def scrape_firestore_calls(port):
+    """endpoint -> Firestore calls so far, from /metrics"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', '/metrics')
+    text = conn.getresponse().read().decode('utf-8')
+    conn.close()
+    calls = {}
+    for endpoint, _method, _kind, value in _FIRESTORE_CALLS.findall(text):
+        calls[endpoint] = calls.get(endpoint, 0) + float(value)
+    return calls
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(teams=50, duration=60.0, pace=1.0, latency='0.05-0.2', workers=1, threads=32, ramp=5.0, streams=None):
+    """Run the simulation; returns the results dict that --save writes"""
+    streams = teams if streams is None else min(streams, teams)
+    bank = load_question_bank(os.path.join(HERE, 'data.json'), os.path.join(HERE, 'data.bank'))
+    answers = {question.qid: question.answer
+               for image_key in bank.image_keys() for question in bank.questions(image_key)}
+    recorder = Recorder()
+    with gunicorn(teams, latency, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads)) as port:
+        before = scrape_firestore_calls(port)
+        started = time.monotonic()
+        deadline = started + duration
+        rng = random.Random(0)
+        players = [Team(i, port, recorder, answers, deadline, pace) for i in range(teams)]
+        threads_ = []
+        for number, team in enumerate(players):
+            threads_.append(threading.Thread(target=team.play, args=(started + rng.uniform(0, ramp),)))
+            threads_.append(threading.Thread(target=team.watch_status if number < streams else team.poll_status))
+        for thread in threads_:
+            thread.start()
+        for thread in threads_:
+            thread.join()
+        elapsed = time.monotonic() - started
+        after = scrape_firestore_calls(port)
+
+    routes = {}
+    for route in ROUTES:
+        latencies = sorted(recorder.latencies[route])
+        count = len(latencies)
+        calls = after.get(route, 0) - before.get(route, 0)
+        routes[route] = {
+            'requests': count,
+            'errors': recorder.errors[route],
+            'rps': count / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000 if count else None,
+            'p95_ms': percentile(latencies, 0.95) * 1000 if count else None,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if count else None,
+            'firestore_per_request': calls / count if count else None,
+        }
+    return {
+        'config': {'teams': teams, 'duration': duration, 'pace': pace, 'latency': latency,
+                   'workers': workers, 'threads': threads, 'streams': streams},
+        'routes': routes,
+        'status_streams': dict(recorder.streams),
+        'background_firestore_calls': after.get('background', 0) - before.get('background', 0),
+    }
+
+
+def _ms(value):
+    return f"{value:7.1f}" if value is not None else "      -"
+
+
+def report(results):
+    config = results['config']
+    print(f"{config['teams']} teams for {config['duration']:.0f} s (pace {config['pace']}, "
+          f"Firestore latency {config['latency']} s, {config['workers']} x {config['threads']} request threads)")
+    print(f"{'route':>15} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'p99 ms':>7} {'fs/req':>6}")
+    for route, stats in results['routes'].items():
+        per_request = stats['firestore_per_request']
+        per_request = f"{per_request:6.2f}" if per_request is not None else "     -"
+        print(f"{route:>15} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>7.2f} "
+              f"{_ms(stats['p50_ms'])} {_ms(stats['p95_ms'])} {_ms(stats['p99_ms'])} {per_request}")
+    streams = results.get('status_streams')
+    if config.get('streams'):
+        print(f"status streams: {config['streams']} teams, {streams['opened']} opened, "
+              f"{streams['refused']} refused (polled instead)")
+    print(f"background Firestore calls (score sync, listeners): {results['background_firestore_calls']:.0f}")
+    if config['workers'] > 1:
+        print("(Firestore calls are from whichever worker answered /metrics)")
+
+
+def compare(results, baseline, tolerance, floor_ms=25.0):
+    """Regressions of results against baseline, as printable lines.
+
+    Latency counts as a regression when p95 or p99 grew by more than
+    tolerance and by at least floor_ms (the tail of a few-ms route moves
+    that much with the machine's load alone); throughput
+    when it fell by more than tolerance; Firestore calls per request on
+    any increase of more than 0.05.
+    """
+    if results['config'] != baseline['config']:
+        print(f"Note: baseline was recorded with {baseline['config']}")
+    regressions = []
+    for route, stats in results['routes'].items():
+        old = baseline['routes'].get(route)
+        if not old or not old['requests'] or not stats['requests']:
+            continue
+        # The p99 of fewer than 100 requests is just the slowest one
+        for key in ('p95_ms', 'p99_ms') if stats['requests'] >= 100 else ('p95_ms',):
+            if stats[key] > old[key] * (1 + tolerance) and stats[key] - old[key] >= floor_ms:
+                regressions.append(f"{route}: {key} {old[key]:.1f} -> {stats[key]:.1f}")
+        if stats['rps'] < old['rps'] * (1 - tolerance):
+            regressions.append(f"{route}: req/s {old['rps']:.2f} -> {stats['rps']:.2f}")
+        if stats['errors'] > old['errors']:
+            regressions.append(f"{route}: errors {old['errors']} -> {stats['errors']}")
+        if (stats['firestore_per_request'] or 0) > (old['firestore_per_request'] or 0) + 0.05:
+            regressions.append(f"{route}: Firestore calls/request {old['firestore_per_request']:.2f} -> "
+                               f"{stats['firestore_per_request']:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60.0, help="seconds of play")
+    parser.add_argument('--pace', type=float, default=1.0, help="scales think times and the status poll")
+    parser.add_argument('--latency', default='0.05-0.2', help="injected Firestore latency: seconds or low-high")
+    parser.add_argument('--streams', type=int, help="teams whose page holds a status stream (default all)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=32, help="request threads per worker, besides stream threads")
+    parser.add_argument('--save', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="fail on regressions against saved results")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative change")
+    parser.add_argument('--floor', type=float, default=25.0, help="ignore latency changes below this many ms")
+    args = parser.parse_args(argv)
+
+    results = run(teams=args.teams, duration=args.duration, pace=args.pace, latency=args.latency,
+                  workers=args.workers, threads=args.threads, streams=args.streams)
+    report(results)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.floor)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
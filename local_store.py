@@ -0,0 +1,630 @@
+"""Local SQLite store for leaderboard counters and game progress.
+
+Routes read and write team stats here, so request latency does not depend
+on Firestore round trips and offline (no Firebase) mode keeps real numbers.
+Every counter change is also appended to ``sync_outbox`` in the same
+transaction; ``score_writer.ScoreWriter`` drains that outbox to Firestore
+in the background. Changes made in Firestore (e.g. an admin flipping
+``status``) come back through ``apply_remote``.
+
+``game_progress`` holds each team's current round and completed images as
+bitsets (see ``progress.py``) and its ``scheduler`` seed and cursor. The
+round is the only copy there is: answers, hints and completions check and
+update it in one transaction. Scheduler state is written in batches by
+``progress.ProgressWriter``. ``round_results`` keeps the last state of
+every round a team played, one row per image, for the results export.
+
+``question_events`` collects answer attempts and hint reveals, as judged
+by the server, plus the game page's timings of them (``events.py``),
+appended in batches; ``calibration.py`` turns them into per-question
+solve rates.
+
+``admin_jobs`` records the bulk operations started at /admin/jobs and
+their progress (see ``admin_jobs.py``), so whichever worker serves the
+progress request can answer it.
+
+The database runs in WAL mode so gunicorn workers on one host can share
+it, with one connection per thread and process: a connection inherited
+through fork (gunicorn's ``preload_app``) is left alone, never used.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import progress
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS game_progress
+    (team_name TEXT, current_image INTEGER, completed_images TEXT,
+     current_score INTEGER, hints_used INTEGER);
+
+CREATE TABLE IF NOT EXISTS leaderboard (
+    team_name    TEXT PRIMARY KEY,
+    unique_code  TEXT,
+    total_points INTEGER NOT NULL DEFAULT 0,
+    wins         INTEGER NOT NULL DEFAULT 0,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL DEFAULT 'online',
+    firestore_id TEXT,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_unique_code ON leaderboard (unique_code);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_firestore_id ON leaderboard (firestore_id);
+
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_name    TEXT NOT NULL,
+    total_points INTEGER NOT NULL DEFAULT 0,
+    wins         INTEGER NOT NULL DEFAULT 0,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    claimed_by   TEXT,
+    claimed_at   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sync_outbox_team ON sync_outbox (team_name);
+CREATE INDEX IF NOT EXISTS idx_sync_outbox_claim ON sync_outbox (claimed_by);
+
+CREATE TABLE IF NOT EXISTS round_results (
+    team_name   TEXT NOT NULL,
+    image       INTEGER NOT NULL,
+    selected    BLOB NOT NULL,
+    solved      BLOB NOT NULL,
+    hints       BLOB NOT NULL,
+    score       INTEGER NOT NULL DEFAULT 0,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (team_name, image)
+);
+
+CREATE TABLE IF NOT EXISTS question_events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_name   TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    correct     INTEGER,
+    hint_index  INTEGER,
+    elapsed_ms  INTEGER,
+    created_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS admin_jobs (
+    id          TEXT PRIMARY KEY,
+    action      TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    total       INTEGER NOT NULL DEFAULT 0,
+    done        INTEGER NOT NULL DEFAULT 0,
+    failed      INTEGER NOT NULL DEFAULT 0,
+    batches     INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+'''
+
+# Round bitsets added to game_progress (see progress.py); older databases
+# get them on start-up
+PROGRESS_COLUMNS = {
+    'round_selected': 'BLOB',
+    'round_solved': 'BLOB',
+    'round_hints': 'BLOB',
+    'updated_at': 'REAL',
+    'schedule_seed': 'INTEGER',
+    'schedule_cursor': 'INTEGER',
+    'round_started': 'REAL',
+    'rounds_closed_at': 'REAL',
+    'round_id': 'TEXT',
+}
+
+# Local column -> Firestore leaderboard field
+COUNTER_FIELDS = {
+    'total_points': 'totalPoints',
+    'wins': 'wins',
+    'games_played': 'gamesPlayed',
+}
+
+
+def _round_from_row(row):
+    """The round in progress stored in a game_progress row, or None"""
+    if row['current_image'] is None or not row['round_selected'] or row['round_id'] is None:
+        return None
+    return {
+        'id': row['round_id'],
+        'image': row['current_image'],
+        'selected': progress.mask_from_bytes(row['round_selected']),
+        'solved': progress.mask_from_bytes(row['round_solved']),
+        'hints': progress.mask_from_bytes(row['round_hints']),
+        'score': row['current_score'] or 0,
+        'started': row['round_started'] or 0,
+    }
+
+
+def team_document(row):
+    """A leaderboard row in the Firestore document shape"""
+    return {
+        'name': row['team_name'],
+        'totalPoints': row['total_points'],
+        'wins': row['wins'],
+        'gamesPlayed': row['games_played'],
+        'status': row['status']
+    }
+
+
+class LocalStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._inherited = []
+        self.init_schema()
+
+    def _conn(self):
+        if self._pid != os.getpid():
+            # Forked: the parent's connections are not ours to use, and letting
+            # them be garbage collected here would close them under the parent
+            self._inherited.append(self._local)
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, so writers from several workers queue up"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def init_schema(self):
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(game_progress)')}
+        for name, kind in PROGRESS_COLUMNS.items():
+            if name not in columns:
+                try:
+                    conn.execute(f'ALTER TABLE game_progress ADD COLUMN {name} {kind}')
+                except sqlite3.OperationalError as e:
+                    # Another worker added it first
+                    if 'duplicate column' not in str(e):
+                        raise
+        # One progress row per team
+        conn.execute('DROP INDEX IF EXISTS idx_game_progress_team')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_game_progress_team_name ON game_progress (team_name)')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -- leaderboard -------------------------------------------------------
+
+    def get_team(self, team_name):
+        return self._conn().execute(
+            'SELECT * FROM leaderboard WHERE team_name = ?', (team_name,)).fetchone()
+
+    def get_team_by_code(self, unique_code):
+        return self._conn().execute(
+            'SELECT * FROM leaderboard WHERE unique_code = ?', (unique_code,)).fetchone()
+
+    def ensure_team(self, team_name, unique_code=None, status='online'):
+        """Create the team's row if missing and return it"""
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO leaderboard (team_name, unique_code, status, updated_at) '
+                'VALUES (?, ?, ?, ?)', (team_name, unique_code, status, time.time()))
+            if unique_code:
+                conn.execute('UPDATE leaderboard SET unique_code = ? WHERE team_name = ? AND unique_code IS NULL',
+                             (unique_code, team_name))
+            return conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (team_name,)).fetchone()
+
+    def add_counters(self, team_name, sync=True, **deltas):
+        """Apply counter deltas locally and, if sync, queue them for Firestore.
+
+        deltas use the local column names (total_points, wins, games_played).
+        A new team starts online; an existing one keeps its status, which
+        only admins change (set_status, apply_remote). Returns the updated row.
+        """
+        columns = {c: int(deltas.get(c, 0)) for c in COUNTER_FIELDS}
+        with self.transaction() as conn:
+            return self._add_counters(conn, team_name, sync, columns)
+
+    def _add_counters(self, conn, team_name, sync, columns):
+        conn.execute(
+            "INSERT OR IGNORE INTO leaderboard (team_name, status, updated_at) VALUES (?, 'online', ?)",
+            (team_name, time.time()))
+        conn.execute(
+            'UPDATE leaderboard SET total_points = total_points + ?, wins = wins + ?, '
+            'games_played = games_played + ?, updated_at = ? WHERE team_name = ?',
+            (columns['total_points'], columns['wins'], columns['games_played'], time.time(), team_name))
+        if sync:
+            conn.execute(
+                'INSERT INTO sync_outbox (team_name, total_points, wins, games_played) VALUES (?, ?, ?, ?)',
+                (team_name, columns['total_points'], columns['wins'], columns['games_played']))
+        return conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (team_name,)).fetchone()
+
+    def leaderboard_page(self, after=None, limit=500):
+        """Up to limit rows ordered by team name, starting after the team named after"""
+        return self._conn().execute(
+            'SELECT * FROM leaderboard WHERE team_name > ? ORDER BY team_name LIMIT ?',
+            (after if after is not None else '', limit)).fetchall()
+
+    def leaderboard_rows(self):
+        """Every team's counters, for rebuilding ranking.Ranking"""
+        return self._conn().execute(
+            'SELECT team_name, total_points, wins, games_played FROM leaderboard').fetchall()
+
+    def team_rows(self, team_names=None):
+        """Rows for these teams (those that exist), or for every team"""
+        conn = self._conn()
+        if team_names is None:
+            return conn.execute('SELECT * FROM leaderboard').fetchall()
+        return [row for name in team_names
+                for row in conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (name,))]
+
+    def set_status(self, team_names, status):
+        """Set status for several teams in one transaction, creating missing rows; returns the rows"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO leaderboard (team_name, status, updated_at) VALUES (?, ?, ?)',
+                [(name, status, now) for name in team_names])
+            conn.executemany('UPDATE leaderboard SET status = ?, updated_at = ? WHERE team_name = ?',
+                             [(status, now, name) for name in team_names])
+            return [conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (name,)).fetchone()
+                    for name in team_names]
+
+    def reset_counters(self, team_names):
+        """Zero several teams' counters; returns the rows.
+
+        Unclaimed outbox rows for them are dropped, since their deltas
+        predate the reset. A claim already in flight still lands in
+        Firestore and is mirrored back once the outbox is empty. A team
+        without a row yet starts online, as at login: a reset must not
+        lock out a team that hasn't played.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO leaderboard (team_name, status, updated_at) VALUES (?, ?, ?)',
+                [(name, 'online', now) for name in team_names])
+            conn.executemany(
+                'UPDATE leaderboard SET total_points = 0, wins = 0, games_played = 0, updated_at = ? '
+                'WHERE team_name = ?', [(now, name) for name in team_names])
+            conn.executemany('DELETE FROM sync_outbox WHERE team_name = ? AND claimed_by IS NULL',
+                             [(name,) for name in team_names])
+            return [conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (name,)).fetchone()
+                    for name in team_names]
+
+    def set_firestore_id(self, team_name, firestore_id):
+        self._conn().execute('UPDATE leaderboard SET firestore_id = ? WHERE team_name = ?',
+                             (firestore_id, team_name))
+
+    def apply_remote(self, firestore_id, data):
+        """Mirror a Firestore leaderboard document into the local table.
+
+        data is None when the document was removed. Counters are only taken
+        from Firestore while the team has nothing waiting in the outbox;
+        otherwise the remote values would not include our pending deltas yet.
+        Returns the resulting row, or None if nothing was stored.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            if data is None:
+                row = conn.execute('SELECT team_name FROM leaderboard WHERE firestore_id = ?',
+                                   (firestore_id,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE leaderboard SET status = 'offline', firestore_id = NULL, updated_at = ? "
+                             "WHERE team_name = ?", (now, row['team_name']))
+                return conn.execute('SELECT * FROM leaderboard WHERE team_name = ?',
+                                    (row['team_name'],)).fetchone()
+            team_name = data.get('name')
+            if not team_name:
+                return None
+            conn.execute(
+                'INSERT OR IGNORE INTO leaderboard (team_name, status, updated_at) VALUES (?, ?, ?)',
+                (team_name, data.get('status', 'offline'), now))
+            conn.execute('UPDATE leaderboard SET status = ?, firestore_id = ?, updated_at = ? WHERE team_name = ?',
+                         (data.get('status', 'offline'), firestore_id, now, team_name))
+            pending = conn.execute('SELECT 1 FROM sync_outbox WHERE team_name = ? LIMIT 1',
+                                   (team_name,)).fetchone()
+            if pending is None:
+                conn.execute(
+                    'UPDATE leaderboard SET total_points = ?, wins = ?, games_played = ? WHERE team_name = ?',
+                    (data.get('totalPoints', 0), data.get('wins', 0), data.get('gamesPlayed', 0), team_name))
+            return conn.execute('SELECT * FROM leaderboard WHERE team_name = ?', (team_name,)).fetchone()
+
+    # -- game progress -----------------------------------------------------
+
+    def get_progress(self, team_name):
+        """{'round': dict or None, 'completed': image bitset, 'schedule': (seed, cursor) or None}"""
+        row = self._conn().execute(
+            'SELECT * FROM game_progress WHERE team_name = ?', (team_name,)).fetchone()
+        if row is None:
+            return {'round': None, 'completed': 0, 'schedule': None}
+        schedule = None
+        if row['schedule_seed'] is not None:
+            schedule = (row['schedule_seed'], row['schedule_cursor'] or 0)
+        return {'round': _round_from_row(row), 'completed': int(row['completed_images'] or '0', 16),
+                'schedule': schedule}
+
+    def current_round(self, team_name):
+        """The team's round in progress, or None"""
+        row = self._conn().execute(
+            'SELECT * FROM game_progress WHERE team_name = ?', (team_name,)).fetchone()
+        return _round_from_row(row) if row is not None else None
+
+    def save_progress(self, records):
+        """Write several teams' scheduler state and completed images in one transaction.
+
+        records maps team_name -> {'completed': bits, 'schedule': (seed, cursor),
+        'reset_completed': bool} (all optional). completed bits are added to
+        the stored set, after clearing it if reset_completed.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            for team_name, entry in records.items():
+                self._ensure_progress(conn, team_name, now)
+                if entry.get('reset_completed'):
+                    conn.execute("UPDATE game_progress SET completed_images = '0' WHERE team_name = ?",
+                                 (team_name,))
+                if 'schedule' in entry:
+                    conn.execute('UPDATE game_progress SET schedule_seed = ?, schedule_cursor = ? WHERE team_name = ?',
+                                 entry['schedule'] + (team_name,))
+                if 'completed' in entry:
+                    self._add_completed(conn, team_name, entry['completed'])
+                conn.execute('UPDATE game_progress SET updated_at = ? WHERE team_name = ?', (now, team_name))
+
+    def start_round(self, team_name, game_round):
+        """Make game_round the team's round in progress, replacing any other"""
+        now = time.time()
+        with self.transaction() as conn:
+            self._ensure_progress(conn, team_name, now)
+            self._write_round(conn, team_name, game_round, now)
+
+    def solve_question(self, team_name, round_id, position, points_for, sync=True):
+        """Mark a question of the round in progress solved and credit it, in one transaction.
+
+        points_for(hints_used) gives the points, from the hints revealed up
+        to now. Returns (round, points, row): round is None if round_id is not
+        the team's round in progress (or position is not part of it); points
+        and row are None if the question was already solved.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            game_round = self._round_in_progress(conn, team_name, round_id, position)
+            if game_round is None or game_round['solved'] >> position & 1:
+                return game_round, None, None
+            points = points_for(progress.hints_revealed(game_round['hints'], position))
+            game_round['solved'] |= 1 << position
+            game_round['score'] += points
+            self._write_round(conn, team_name, game_round, now)
+            row = self._add_counters(conn, team_name, sync, {'total_points': points, 'wins': 1, 'games_played': 0})
+            return game_round, points, row
+
+    def reveal_hint(self, team_name, round_id, position, hint_index):
+        """Record a revealed hint (unless the question is solved); returns the round, or None as in solve_question"""
+        now = time.time()
+        with self.transaction() as conn:
+            game_round = self._round_in_progress(conn, team_name, round_id, position)
+            if game_round is None or game_round['solved'] >> position & 1:
+                return game_round
+            hints = progress.reveal_hint(game_round['hints'], position, hint_index)
+            if hints != game_round['hints']:
+                game_round['hints'] = hints
+                self._write_round(conn, team_name, game_round, now)
+            return game_round
+
+    def complete_round(self, team_name, round_id, sync=True):
+        """End a finished round: mark its image completed and count a game played.
+
+        Returns (round, row), or (None, None) if round_id is not the team's
+        round in progress or still has unsolved questions.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            game_round = self._round_in_progress(conn, team_name, round_id)
+            if game_round is None or not progress.round_finished(game_round):
+                return None, None
+            self._write_round(conn, team_name, None, now)
+            self._add_completed(conn, team_name, 1 << game_round['image'])
+            row = self._add_counters(conn, team_name, sync, {'total_points': 0, 'wins': 0, 'games_played': 1})
+            return game_round, row
+
+    def _ensure_progress(self, conn, team_name, now):
+        conn.execute('INSERT OR IGNORE INTO game_progress (team_name, completed_images, updated_at) '
+                     "VALUES (?, '0', ?)", (team_name, now))
+
+    def _round_in_progress(self, conn, team_name, round_id, position=None):
+        """The team's round if it is round_id (and includes position), else None"""
+        row = conn.execute('SELECT * FROM game_progress WHERE team_name = ?', (team_name,)).fetchone()
+        game_round = _round_from_row(row) if row is not None else None
+        if game_round is None or game_round['id'] != round_id:
+            return None
+        if position is not None and not game_round['selected'] >> position & 1:
+            return None
+        return game_round
+
+    def _write_round(self, conn, team_name, game_round, now):
+        """Store game_round as the team's round in progress (None clears it) and in round_results"""
+        if game_round is None:
+            values = (None, None, None, None, 0, 0, None, None)
+        else:
+            values = (game_round['image'],
+                      progress.mask_to_bytes(game_round['selected']),
+                      progress.mask_to_bytes(game_round['solved']),
+                      progress.mask_to_bytes(game_round['hints']),
+                      game_round['score'],
+                      bin(game_round['hints']).count('1'),
+                      game_round.get('started'),
+                      game_round['id'])
+        conn.execute(
+            'UPDATE game_progress SET current_image = ?, round_selected = ?, round_solved = ?, round_hints = ?, '
+            'current_score = ?, hints_used = ?, round_started = ?, round_id = ?, updated_at = ? WHERE team_name = ?',
+            values + (now, team_name))
+        if game_round is not None:
+            conn.execute(
+                'INSERT OR REPLACE INTO round_results (team_name, image, selected, solved, hints, score, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (team_name, game_round['image'], progress.mask_to_bytes(game_round['selected']),
+                 progress.mask_to_bytes(game_round['solved']), progress.mask_to_bytes(game_round['hints']),
+                 game_round['score'], now))
+
+    def _add_completed(self, conn, team_name, bits):
+        row = conn.execute('SELECT completed_images FROM game_progress WHERE team_name = ?',
+                           (team_name,)).fetchone()
+        completed = int(row['completed_images'] or '0', 16) | bits
+        conn.execute('UPDATE game_progress SET completed_images = ? WHERE team_name = ?',
+                     (format(completed, 'x'), team_name))
+
+    def round_results(self, team_name):
+        """The team's rounds as progress round dicts (without 'id' and 'started'), by image number"""
+        return [{
+            'image': row['image'],
+            'selected': progress.mask_from_bytes(row['selected']),
+            'solved': progress.mask_from_bytes(row['solved']),
+            'hints': progress.mask_from_bytes(row['hints']),
+            'score': row['score'],
+        } for row in self._conn().execute('SELECT * FROM round_results WHERE team_name = ? ORDER BY image',
+                                          (team_name,))]
+
+    def close_rounds(self, team_names, closed_at):
+        """End the teams' rounds in progress; answers and hints for them are refused from now on"""
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO game_progress (team_name, completed_images, updated_at) '
+                             "VALUES (?, '0', ?)", [(name, closed_at) for name in team_names])
+            conn.executemany(
+                'UPDATE game_progress SET current_image = NULL, round_selected = NULL, round_solved = NULL, '
+                'round_hints = NULL, current_score = 0, hints_used = 0, round_started = NULL, round_id = NULL, '
+                'rounds_closed_at = ?, updated_at = ? WHERE team_name = ?',
+                [(closed_at, closed_at, name) for name in team_names])
+
+    # -- gameplay events ---------------------------------------------------
+
+    def append_events(self, rows):
+        """Insert (team_name, question_id, kind, correct, hint_index, elapsed_ms, created_at) rows"""
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO question_events (team_name, question_id, kind, correct, hint_index, elapsed_ms, '
+                'created_at) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def question_stats(self, since=None):
+        """Per-question aggregates of question_events, one pass over the table.
+
+        teams: teams that attempted the question or revealed one of its hints;
+        solved: those with a correct attempt; hinted: teams that revealed at
+        least one hint. All three count server-recorded events only.
+        solve_ms: the solving teams' average time to the correct answer, from
+        the game page's timing of their last attempt when it sent one, else
+        from the start of the round.
+        """
+        return self._conn().execute(
+            "SELECT question_id, COUNT(*) AS teams, SUM(solved) AS solved, SUM(hinted) AS hinted, "
+            "       SUM(attempts) AS attempts, "
+            "       AVG(CASE WHEN solved THEN COALESCE(client_ms, server_ms) END) AS solve_ms "
+            "FROM (SELECT question_id, "
+            "             MAX(kind = 'attempt' AND correct = 1) AS solved, "
+            "             MAX(kind = 'hint') AS hinted, "
+            "             SUM(kind = 'attempt') AS attempts, "
+            "             MIN(CASE WHEN kind = 'attempt' AND correct THEN elapsed_ms END) AS server_ms, "
+            "             MAX(CASE WHEN kind = 'client_attempt' THEN elapsed_ms END) AS client_ms "
+            "      FROM question_events WHERE created_at >= ? GROUP BY question_id, team_name) "
+            "WHERE attempts > 0 OR hinted GROUP BY question_id ORDER BY question_id",
+            (since or 0,)).fetchall()
+
+    def event_count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM question_events').fetchone()[0]
+
+    # -- admin jobs --------------------------------------------------------
+
+    def create_admin_job(self, job_id, action, params):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO admin_jobs (id, action, params, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)", (job_id, action, json.dumps(params), now, now))
+        return self.get_admin_job(job_id)
+
+    def update_admin_job(self, job_id, state=None, total=None, error=None, done=0, failed=0, batches=0):
+        """Set state/total/error if given and add to the done, failed and batches counts"""
+        self._conn().execute(
+            'UPDATE admin_jobs SET state = COALESCE(?, state), total = COALESCE(?, total), '
+            'error = COALESCE(?, error), done = done + ?, failed = failed + ?, batches = batches + ?, '
+            'updated_at = ? WHERE id = ?',
+            (state, total, error, done, failed, batches, time.time(), job_id))
+
+    def get_admin_job(self, job_id):
+        return self._conn().execute('SELECT * FROM admin_jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def admin_jobs(self, limit=20):
+        """The most recent jobs, newest first"""
+        return self._conn().execute('SELECT * FROM admin_jobs ORDER BY created_at DESC LIMIT ?',
+                                    (limit,)).fetchall()
+
+    # -- sync outbox -------------------------------------------------------
+
+    def claim_outbox(self, owner, limit=500, stale_after=60.0):
+        """Claim up to ``limit`` unsynced rows for ``owner``, summed per team.
+
+        Claims left behind by a worker that died are taken over after
+        ``stale_after`` seconds. Returns a list of dicts with the team's row
+        plus the summed ``deltas`` (Firestore field names).
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE sync_outbox SET claimed_by = ?, claimed_at = ? WHERE id IN ('
+                '  SELECT id FROM sync_outbox WHERE claimed_by IS NULL OR claimed_at < ?'
+                '  ORDER BY id LIMIT ?)', (owner, now, now - stale_after, limit))
+            rows = conn.execute(
+                'SELECT o.team_name, SUM(o.total_points) AS d_points, SUM(o.wins) AS d_wins, '
+                '       SUM(o.games_played) AS d_games, l.firestore_id, l.total_points, l.wins, '
+                '       l.games_played, l.status '
+                'FROM sync_outbox o JOIN leaderboard l ON l.team_name = o.team_name '
+                'WHERE o.claimed_by = ? GROUP BY o.team_name', (owner,)).fetchall()
+        return [{
+            'team_name': row['team_name'],
+            'firestore_id': row['firestore_id'],
+            'deltas': {'totalPoints': row['d_points'], 'wins': row['d_wins'], 'gamesPlayed': row['d_games']},
+            'document': team_document(row),
+        } for row in rows]
+
+    def ack_outbox(self, owner, team_names=None):
+        """Delete rows synced by ``owner`` (all of them, or only these teams)"""
+        conn = self._conn()
+        if team_names is None:
+            conn.execute('DELETE FROM sync_outbox WHERE claimed_by = ?', (owner,))
+        else:
+            conn.executemany('DELETE FROM sync_outbox WHERE claimed_by = ? AND team_name = ?',
+                             [(owner, name) for name in team_names])
+
+    def release_outbox(self, owner, team_names=None):
+        """Give claimed rows back so the next flush retries them"""
+        conn = self._conn()
+        if team_names is None:
+            conn.execute('UPDATE sync_outbox SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ?',
+                         (owner,))
+        else:
+            conn.executemany(
+                'UPDATE sync_outbox SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ? AND team_name = ?',
+                [(owner, name) for name in team_names])
+
+    def outbox_size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM sync_outbox').fetchone()[0]
+
+
+def default_store_path():
+    return os.environ.get('GAME_DB_PATH', 'game.db')
@@ -0,0 +1,200 @@
+"""Logging setup: per-module levels, a non-blocking handler and request ids.
+
+Modules log through ``logging.getLogger(__name__)``. ``configure_logging``
+puts a ``ProcessQueueHandler`` on the root logger, so a request thread only
+enqueues the record; a ``QueueListener`` thread formats and writes it to
+stderr. Threads don't survive fork, so the listener belongs to one
+process: a gunicorn worker forked from the preloaded master starts its
+own on the first record it logs, and stops it in ``worker_exit`` (see
+gunicorn.conf.py). Levels come from the environment:
+
+    LOG_LEVEL=INFO                          default level for everything
+    LOG_LEVELS=app=DEBUG,score_writer=WARNING   per-logger overrides
+    LOG_FORMAT=text | json
+
+Hot request paths only log at DEBUG, so at the default INFO level they
+emit nothing. ``init_request_ids`` gives every request an id (taken from
+an incoming ``X-Request-ID`` header when present), returns it in the
+response and stamps it on each record logged while handling that request.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_handler = None
+
+
+def current_request_id():
+    """The id of the request being handled, or '-' outside a request"""
+    if has_request_context():
+        return getattr(g, 'request_id', '-')
+    return '-'
+
+
+class RequestIdFilter(logging.Filter):
+    """Copies the current request id onto each record.
+
+    It runs on the logging thread before the record is queued, while the
+    request context is still available.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = current_request_id()
+        return True
+
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler whose listener thread runs in the process that logs.
+
+    After fork the inherited queue has no thread draining it, so the first
+    record in a new process swaps in a fresh queue and starts a listener
+    for it. Once stopped, records are written directly.
+    """
+
+    def __init__(self, output):
+        super().__init__(queue.SimpleQueue())
+        self.output = output
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start this process's listener, unless it is running or was stopped"""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.output, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Write what is queued and stop this process's listener"""
+        with self._start_lock:
+            listener, self.listener = self.listener, None
+            if listener is not None and self._pid == os.getpid():
+                listener.stop()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        if self.listener is None:
+            self.output.handle(self.prepare(record))
+            return
+        super().emit(record)
+
+
+def record_extras(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """``time level logger [request id] message key=value ...``"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extras = record_extras(record)
+        if extras:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra=`` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        entry.update(record_extras(record))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def parse_levels(spec):
+    """'app=DEBUG,score_writer=warning' -> {'app': 'DEBUG', 'score_writer': 'WARNING'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, levels=None, fmt=None, stream=None):
+    """Route all logging through a queue; safe to call more than once"""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    level = (level or os.environ.get('LOG_LEVEL') or 'INFO').upper()
+    levels = levels if levels is not None else parse_levels(os.environ.get('LOG_LEVELS'))
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'text')
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    handler = ProcessQueueHandler(output)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    # The listener thread starts with the first record of each process
+    _handler = handler
+    atexit.register(stop_logging)
+    return handler
+
+
+def start_logging():
+    """Start this process's listener now instead of on its first record"""
+    if _handler is not None:
+        _handler.start()
+
+
+def stop_logging():
+    """Flush queued records and stop this process's listener thread"""
+    if _handler is not None:
+        _handler.stop()
+
+
+def init_request_ids(app):
+    """Assign each request an id and echo it back in ``X-Request-ID``"""
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16]
+
+    @app.after_request
+    def send_request_id(response):
+        response.headers[REQUEST_ID_HEADER] = current_request_id()
+        return response
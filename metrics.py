@@ -0,0 +1,338 @@
+"""In-process request and Firestore metrics in Prometheus text format.
+
+``REGISTRY`` holds counters and histograms keyed by label values, and
+gauges that are read from callbacks when ``/metrics`` is scraped (cache hit
+counts, outbox size, ...). ``init_request_metrics`` times every request by
+endpoint. ``instrument_firestore`` wraps a Firestore client so every backend
+call is counted (and timed) against the endpoint that made it, or
+``background`` for the sync thread and listener.
+
+Values are per process; with several gunicorn workers each one reports
+its own series (scrape them separately or aggregate by instance).
+"""
+import bisect
+import math
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+# Latency buckets in seconds, from cache hits up to slow Firestore round trips
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def total(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[1] if series else 0.0
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = (('le', _number(float(bound))),)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}"
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from ``callback`` at scrape time.
+
+    ``callback`` returns {labelvalues tuple: value}.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labelvalues, value in sorted(self.callback().items()):
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._caches = {}
+        self._lock = threading.Lock()
+        self.register(CallbackMetric('cache_hits_total', 'Cache lookups that found a fresh entry.',
+                                     ('cache',), lambda: self._cache_stat('hits'), kind='counter'))
+        self.register(CallbackMetric('cache_misses_total', 'Cache lookups that missed or had expired.',
+                                     ('cache',), lambda: self._cache_stat('misses'), kind='counter'))
+        self.register(CallbackMetric('cache_entries', 'Entries currently held per cache.',
+                                     ('cache',), lambda: self._cache_stat(len)))
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name, documentation, callback, labelnames=()):
+        """Register a gauge read at scrape time; callback returns a number or {labels: value}"""
+        return self._register_callback(name, documentation, callback, labelnames, 'gauge')
+
+    def counter_callback(self, name, documentation, callback, labelnames=()):
+        """Like gauge_callback, for values that only go up (e.g. a writer's commit count)"""
+        return self._register_callback(name, documentation, callback, labelnames, 'counter')
+
+    def _register_callback(self, name, documentation, callback, labelnames, kind):
+        def samples():
+            value = callback()
+            return value if isinstance(value, dict) else {(): value}
+        return self.register(CallbackMetric(name, documentation, labelnames, samples, kind))
+
+    def register_cache(self, name, cache):
+        """Report hits/misses/size of a cache.TTLCache under cache=name"""
+        self._caches[name] = cache
+
+    def _cache_stat(self, stat):
+        if callable(stat):
+            return {(name,): stat(cache) for name, cache in self._caches.items()}
+        return {(name,): getattr(cache, stat) for name, cache in self._caches.items()}
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to build the response, by endpoint.',
+    ('endpoint', 'method', 'status'))
+FIRESTORE_CALLS = REGISTRY.counter(
+    'firestore_calls_total', 'Firestore backend calls, by calling endpoint and client method.',
+    ('endpoint', 'method', 'kind'))
+FIRESTORE_DOCUMENTS_READ = REGISTRY.counter(
+    'firestore_documents_read_total', 'Documents returned by Firestore get() calls, by calling endpoint.',
+    ('endpoint',))
+FIRESTORE_LATENCY = REGISTRY.histogram(
+    'firestore_call_duration_seconds', 'Firestore call latency, by client method.', ('method',))
+
+TEMPLATE_RENDER = REGISTRY.histogram(
+    'template_render_duration_seconds', 'Jinja render time for timed templates.', ('template',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025))
+
+
+def current_endpoint():
+    """Flask endpoint of the request being handled, or 'background'"""
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+def init_request_metrics(app, registry=REGISTRY, token=None):
+    """Time every request and serve the registry at /metrics.
+
+    If token is set, /metrics requires ``Authorization: Bearer <token>``.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('request_started', None)
+        if started is not None and request.endpoint != 'metrics':
+            REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                    request.endpoint or 'unknown', request.method, str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+# -- Firestore instrumentation ---------------------------------------------
+
+# Client methods that reach the backend, and how they are counted
+FIRESTORE_METHODS = {
+    'get': 'read', 'stream': 'read',
+    'add': 'write', 'create': 'write', 'set': 'write', 'update': 'write', 'delete': 'write',
+    'commit': 'write',
+    'on_snapshot': 'listen',
+}
+_FIRESTORE_MODULES = ('google.cloud.firestore', 'fake_firestore')
+
+
+def _is_firestore_object(value):
+    return type(value).__module__.startswith(_FIRESTORE_MODULES)
+
+
+def _counts_calls(target, method):
+    class_name = type(target).__name__
+    if class_name.endswith('Snapshot'):
+        # Snapshot.get(field) reads local data
+        return False
+    if class_name.endswith('Batch') or class_name.endswith('Transaction'):
+        # Batched writes only reach the backend on commit
+        return method == 'commit'
+    return method in FIRESTORE_METHODS
+
+
+def _wrap(value):
+    if isinstance(value, InstrumentedFirestore):
+        return value
+    if _is_firestore_object(value):
+        return InstrumentedFirestore(value)
+    if isinstance(value, list) and value and _is_firestore_object(value[0]):
+        return [_wrap(item) for item in value]
+    if isinstance(value, tuple) and any(_is_firestore_object(item) for item in value):
+        return tuple(_wrap(item) for item in value)
+    return value
+
+
+def _unwrap(value):
+    return value._target if isinstance(value, InstrumentedFirestore) else value
+
+
+class InstrumentedFirestore:
+    """Transparent proxy over a Firestore client (and everything it returns).
+
+    Query, reference and batch objects handed out by the client are wrapped
+    too, so a call like ``snapshot.reference.update(...)`` is still counted.
+    Wrapped objects passed back into the client are unwrapped.
+    """
+
+    __slots__ = ('_target',)
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return _wrap(attr)
+        counted = _counts_calls(self._target, name)
+
+        def call(*args, **kwargs):
+            args = tuple(_unwrap(arg) for arg in args)
+            kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+            if not counted:
+                return _wrap(attr(*args, **kwargs))
+            endpoint = current_endpoint()
+            FIRESTORE_CALLS.inc(endpoint, name, FIRESTORE_METHODS[name])
+            started = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            finally:
+                FIRESTORE_LATENCY.observe(time.perf_counter() - started, name)
+            if name == 'get':
+                FIRESTORE_DOCUMENTS_READ.inc(endpoint, amount=len(result) if isinstance(result, list) else 1)
+            return _wrap(result)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __iter__(self):
+        return (_wrap(item) for item in self._target)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"InstrumentedFirestore({self._target!r})"
+
+
+def instrument_firestore(client):
+    """Count and time every backend call made through client (None passes through)"""
+    return None if client is None else InstrumentedFirestore(client)
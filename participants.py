@@ -0,0 +1,91 @@
+"""In-memory roster of participants, keyed by ``uniqueCode``.
+
+Login used to query ``participants.where('uniqueCode', '==', code)`` on
+every attempt, and at event start every team logs in within the same
+minute. Instead each worker attaches one snapshot listener to the
+collection: its first snapshot streams the whole roster in bulk, and
+later ones carry additions, edits and removals as they happen. Once that
+first snapshot is in (``ready``), a code lookup is a dict access and an
+unknown code is rejected without a round trip.
+
+Until then, or if the listener could not start, callers fall back to the
+query (``storage.FirestoreStorage.find_participant``).
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ParticipantIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._by_code = {}
+        self._codes = {}
+        # Participants this worker counted; the listener catches up shortly after
+        self._counted = set()
+        self._ready = threading.Event()
+        self._watch = None
+
+    def start(self, db):
+        """Attach the participants listener once; later calls are no-ops"""
+        with self._start_lock:
+            if self._watch is not None or db is None:
+                return
+            try:
+                self._watch = db.collection('participants').on_snapshot(self._on_snapshot)
+                logger.info("📇 Participant roster listener started")
+            except Exception as e:
+                logger.error("❌ Failed to start participant listener: %s", e)
+
+    def stop(self):
+        with self._start_lock:
+            watch, self._watch = self._watch, None
+        self._ready.clear()
+        if watch is not None:
+            watch.unsubscribe()
+
+    @property
+    def ready(self):
+        """True once the full roster has loaded and the listener is attached"""
+        return self._watch is not None and self._ready.is_set()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                old_code = self._codes.pop(doc.id, None)
+                if old_code is not None and self._by_code.get(old_code) is not None \
+                        and self._by_code[old_code].id == doc.id:
+                    del self._by_code[old_code]
+                if change.type.name == 'REMOVED':
+                    self._counted.discard(doc.id)
+                    continue
+                code = (doc.to_dict() or {}).get('uniqueCode')
+                if code:
+                    self._by_code[code] = doc
+                    self._codes[doc.id] = code
+        if not self._ready.is_set():
+            self._ready.set()
+            logger.info("📇 Loaded %d participant codes", len(self._by_code))
+
+    def get(self, unique_code):
+        """The participant's document snapshot, or None"""
+        with self._lock:
+            return self._by_code.get(unique_code)
+
+    def is_counted(self, participant):
+        """Whether the participant was already added to meta/counters"""
+        with self._lock:
+            if participant.id in self._counted:
+                return True
+        return bool(participant.to_dict().get('counted', False))
+
+    def mark_counted(self, participant):
+        with self._lock:
+            self._counted.add(participant.id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_code)
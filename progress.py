@@ -0,0 +1,184 @@
+"""Server-side game progress: one compact record per team.
+
+A round is stored as bitsets over the image's question positions (the
+``n`` in ``"LAUGH/001.jpg#n"``) rather than lists of question ids:
+
+    selected   bit n set: question n is part of the round
+    solved     bit n set: question n was answered correctly
+    hints      bit n * HINT_SLOTS + i set: hint i of question n was revealed
+
+plus a random round id, the points scored so far and when the round
+started. ``completed`` is a bitset over the image numbers finished in the
+team's current ``scheduler`` epoch.
+
+The round in progress lives only in the local store's ``game_progress``
+table; the session cookie keeps just its id. Answers and hints are
+checked and recorded against the stored round in one transaction
+(``LocalStore.solve_question``, ``reveal_hint``), so an old cookie can't
+score a question twice or undo a hint. Every state of a round is also
+kept in ``round_results`` for the results export (``export.py``). An
+admin can close every round of a team (``admin_jobs``), which clears it.
+
+``ProgressWriter`` batches the scheduler state and completed images that
+``scheduler`` needs, coalesced per team and written in one transaction
+every ``interval`` seconds.
+"""
+import atexit
+import logging
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Hint bits reserved per question; data.json has at most three hints each
+HINT_SLOTS = 4
+_HINT_MASK = (1 << HINT_SLOTS) - 1
+
+
+def to_mask(positions):
+    """Bitset with the given bit positions set"""
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+    return mask
+
+
+def positions(mask):
+    """Set bit positions of mask, lowest first"""
+    result = []
+    position = 0
+    while mask:
+        if mask & 1:
+            result.append(position)
+        mask >>= 1
+        position += 1
+    return result
+
+
+def mask_to_bytes(mask):
+    """Little-endian bytes for a BLOB column (b'' for an empty set)"""
+    return mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+
+
+def mask_from_bytes(data):
+    return int.from_bytes(data or b'', 'little')
+
+
+def hint_bits(hints, position):
+    """Revealed-hint bits of one question"""
+    return (hints >> (position * HINT_SLOTS)) & _HINT_MASK
+
+
+def hints_revealed(hints, position):
+    """Number of hints revealed for the question at position"""
+    return bin(hint_bits(hints, position)).count('1')
+
+
+def reveal_hint(hints, position, hint_index):
+    return hints | (1 << (position * HINT_SLOTS + hint_index))
+
+
+def new_round(image_number, question_positions, started=None):
+    """Round record for freshly selected questions"""
+    return {'id': secrets.token_hex(6), 'image': image_number, 'selected': to_mask(question_positions),
+            'solved': 0, 'hints': 0, 'score': 0, 'started': time.time() if started is None else started}
+
+
+def round_finished(game_round):
+    return game_round['solved'] & game_round['selected'] == game_round['selected']
+
+
+class ProgressWriter:
+    """Coalescing write-behind buffer in front of ``LocalStore.save_progress``.
+
+    ``save_schedule`` replaces the team's pending scheduler state. Rounds
+    and completed images are not buffered here: they are written straight
+    to the store (see the module docstring).
+    """
+
+    def __init__(self, store, interval=1.0):
+        self._store = store
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.flushes = 0
+        self.records = 0
+
+    def start(self):
+        """Start the background thread once per process"""
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("❌ Progress flush failed: %s", e)
+
+    def save_schedule(self, team_name, seed, cursor, new_epoch=False):
+        """Store the team's scheduler state; new_epoch also empties completed"""
+        with self._lock:
+            entry = self._pending.setdefault(team_name, {})
+            entry['schedule'] = (seed, cursor)
+            if new_epoch:
+                entry['reset_completed'] = True
+
+    def load(self, team_name):
+        """The team's record (round, completed, schedule), including unflushed changes"""
+        record = self._store.get_progress(team_name)
+        with self._lock:
+            entry = self._pending.get(team_name)
+            if entry is None:
+                return record
+            entry = dict(entry)
+        return {
+            'round': record['round'],
+            'completed': 0 if entry.get('reset_completed') else record['completed'],
+            'schedule': entry.get('schedule', record['schedule']),
+        }
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Write every pending record in one transaction; returns records written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self._store.save_progress(pending)
+        except Exception:
+            # Put them back unless newer saves arrived meanwhile
+            with self._lock:
+                for team_name, entry in pending.items():
+                    newer = self._pending.get(team_name, {})
+                    if entry.get('reset_completed'):
+                        newer['reset_completed'] = True
+                    newer.setdefault('schedule', entry['schedule'])
+                    self._pending[team_name] = newer
+            raise
+        self.flushes += 1
+        self.records += len(pending)
+        logger.debug("Saved progress for %d teams", len(pending))
+        return len(pending)
+
+    def close(self):
+        """Stop the background thread and write whatever is still pending"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def register_shutdown_flush(self):
+        atexit.register(self.close)
@@ -0,0 +1,312 @@
+"""Question index and compiled question bank built from data.json.
+
+The game route used to walk the raw JSON for an image on every request.
+Here each image's questions are resolved once into immutable ``Question``
+records (difficulty and points already attached); which of them a round
+asks is up to ``scheduler.py``.
+
+``compile_question_bank`` turns data.json into a compact binary file (a
+deduplicated string table plus fixed-size offset records per image and
+question). ``QuestionBank`` memory-maps that file and decodes questions
+lazily, so gunicorn workers share the pages through the OS page cache
+instead of each holding its own parsed copy of data.json.
+
+Compile offline with::
+
+    python question_bank.py [data.json] [data.bank]
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTY_SCORES = {
+    'easy': 10,
+    'medium': 20,
+    'hard': 30,
+    'impossible': 50
+}
+
+
+def get_difficulty_score(difficulty):
+    """Get score points based on difficulty level"""
+    return DIFFICULTY_SCORES.get(difficulty, 10)
+
+
+class Question(namedtuple('Question', 'qid question answer hints difficulty points aliases',
+                          defaults=((),))):
+    """A single resolved question. Tuple-backed, so it is immutable and compact.
+
+    aliases are extra accepted answers from the optional "aliases" list in
+    data.json.
+    """
+
+    __slots__ = ()
+
+
+def _iter_raw_questions(image_data):
+    """Yield (item, difficulty) pairs from any supported image structure"""
+    if isinstance(image_data, dict):
+        for key, value in image_data.items():
+            if isinstance(value, list):
+                # Structure: {"easy": [questions], "medium": [questions], ...}
+                for item in value:
+                    if isinstance(item, dict) and 'question' in item:
+                        yield item, key
+            elif isinstance(value, dict) and 'question' in value:
+                # Structure: {"easy": {"question": "...", ...}}
+                yield value, key
+    elif isinstance(image_data, list):
+        for item in image_data:
+            if isinstance(item, dict) and 'question' in item:
+                yield item, item.get('difficulty', 'easy')
+
+
+def extract_questions(image_key, image_data):
+    """Resolve all questions for one image into a tuple of Question records.
+
+    Question ids are ``"<image_key>#<n>"`` where ``n`` is the position of the
+    question in data.json order, so they stay stable across restarts.
+    """
+    questions = []
+    for position, (item, difficulty) in enumerate(_iter_raw_questions(image_data)):
+        questions.append(Question(
+            qid=f"{image_key}#{position}",
+            question=item['question'],
+            answer=item.get('answer', ''),
+            hints=tuple(item.get('hints', [])),
+            difficulty=difficulty,
+            points=get_difficulty_score(difficulty),
+            aliases=tuple(item.get('aliases', []))
+        ))
+    return tuple(questions)
+
+
+def parse_qid(qid, question_count=None):
+    """Split a question id into (image_key, position); raises ValueError.
+
+    position must be a plain non-negative number, below question_count if given.
+    """
+    image_key, _, position = qid.rpartition('#')
+    # int() alone would also take '-1', '+1', ' 1' and '1_0'
+    if not image_key or not (position.isascii() and position.isdigit()):
+        raise ValueError(f"Malformed question id: {qid!r}")
+    position = int(position)
+    if question_count is not None and position >= question_count:
+        raise ValueError(f"No question {position} for {image_key} ({question_count} questions)")
+    return image_key, position
+
+
+def build_question_index(game_data):
+    """Build {image_key: (Question, ...)} for every image in game_data"""
+    return {
+        image_key: extract_questions(image_key, image_data)
+        for image_key, image_data in game_data.items()
+    }
+
+
+# Bank file layout (little-endian), sections in this order:
+#   header
+#   string offsets   (n_strings + 1) x u32, relative to the string blob
+#   string blob      UTF-8
+#   difficulties     n_difficulties x u32 string id
+#   images           n_images x _IMAGE
+#   questions        n_questions x _QUESTION
+#   hints            n_hints x u32 string id (each question's hints, then its aliases)
+BANK_MAGIC = b'LLQB'
+BANK_VERSION = 2
+_HEADER = struct.Struct('<4sIQqIIIII')
+_U32 = struct.Struct('<I')
+_STRING_SPAN = struct.Struct('<II')
+_IMAGE = struct.Struct('<III')          # key string id, first question, question count
+_QUESTION = struct.Struct('<IIIHHH2x')  # question id, answer id, first hint, hint count, alias count, difficulty
+
+
+def _source_signature(source_path):
+    st = os.stat(source_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def compile_question_bank(source_path, bank_path):
+    """Compile data.json at source_path into a bank file at bank_path.
+
+    The file is written next to its destination and moved into place, so
+    workers racing to compile never see a half-written bank.
+    """
+    source_size, source_mtime_ns = _source_signature(source_path)
+    with open(source_path, 'r', encoding='utf-8') as f:
+        index = build_question_index(json.load(f))
+
+    strings = {}
+
+    def sid(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    difficulties = {}
+    image_records = []
+    question_records = []
+    hint_ids = []
+    for image_key, questions in index.items():
+        image_records.append(_IMAGE.pack(sid(image_key), len(question_records), len(questions)))
+        for q in questions:
+            if q.difficulty not in difficulties:
+                difficulties[q.difficulty] = len(difficulties)
+            question_records.append(_QUESTION.pack(
+                sid(q.question), sid(q.answer), len(hint_ids), len(q.hints), len(q.aliases),
+                difficulties[q.difficulty]))
+            hint_ids.extend(sid(h) for h in q.hints)
+            hint_ids.extend(sid(a) for a in q.aliases)
+    difficulty_ids = [sid(d) for d in difficulties]
+
+    blob = bytearray()
+    offsets = [0]
+    for text in strings:
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+
+    header = _HEADER.pack(BANK_MAGIC, BANK_VERSION, source_size, source_mtime_ns,
+                          len(strings), len(difficulty_ids), len(image_records),
+                          len(question_records), len(hint_ids))
+    tmp_path = f"{bank_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(blob)
+        f.write(struct.pack(f'<{len(difficulty_ids)}I', *difficulty_ids))
+        f.writelines(image_records)
+        f.writelines(question_records)
+        f.write(struct.pack(f'<{len(hint_ids)}I', *hint_ids))
+    os.replace(tmp_path, bank_path)
+    return bank_path
+
+
+class QuestionBank:
+    """Read-only, memory-mapped view of a compiled question bank.
+
+    Only the image table (a few hundred entries) is decoded up front;
+    questions are decoded from the mapping when they are asked for.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.source_size, self.source_mtime_ns, n_strings,
+         n_difficulties, n_images, n_questions, n_hints) = _HEADER.unpack_from(self._buf, 0)
+        if magic != BANK_MAGIC or version != BANK_VERSION:
+            raise ValueError(f"{path} is not a version {BANK_VERSION} question bank")
+
+        self._string_offsets = _HEADER.size
+        self._string_blob = self._string_offsets + (n_strings + 1) * _U32.size
+        blob_size = _U32.unpack_from(self._buf, self._string_offsets + n_strings * _U32.size)[0]
+        difficulties_at = self._string_blob + blob_size
+        images_at = difficulties_at + n_difficulties * _U32.size
+        self._questions_at = images_at + n_images * _IMAGE.size
+        self._hints_at = self._questions_at + n_questions * _QUESTION.size
+        self.question_total = n_questions
+
+        self.difficulties = tuple(
+            self._string(_U32.unpack_from(self._buf, difficulties_at + i * _U32.size)[0])
+            for i in range(n_difficulties)
+        )
+        self._images = {}
+        for i in range(n_images):
+            key_id, first, count = _IMAGE.unpack_from(self._buf, images_at + i * _IMAGE.size)
+            self._images[self._string(key_id)] = (first, count)
+
+    def _string(self, string_id):
+        start, end = _STRING_SPAN.unpack_from(self._buf, self._string_offsets + string_id * _U32.size)
+        return str(self._buf[self._string_blob + start:self._string_blob + end], 'utf-8')
+
+    def _decode(self, image_key, first, position):
+        question_id, answer_id, first_hint, hint_count, alias_count, difficulty = _QUESTION.unpack_from(
+            self._buf, self._questions_at + (first + position) * _QUESTION.size)
+        strings = tuple(
+            self._string(_U32.unpack_from(self._buf, self._hints_at + (first_hint + i) * _U32.size)[0])
+            for i in range(hint_count + alias_count)
+        )
+        difficulty_name = self.difficulties[difficulty]
+        return Question(
+            qid=f"{image_key}#{position}",
+            question=self._string(question_id),
+            answer=self._string(answer_id),
+            hints=strings[:hint_count],
+            difficulty=difficulty_name,
+            points=get_difficulty_score(difficulty_name),
+            aliases=strings[hint_count:]
+        )
+
+    def __contains__(self, image_key):
+        return image_key in self._images
+
+    def __len__(self):
+        return len(self._images)
+
+    def image_keys(self):
+        """Image keys in data.json order"""
+        return list(self._images)
+
+    def question_count(self, image_key):
+        return self._images[image_key][1]
+
+    def question(self, image_key, position):
+        first, count = self._images[image_key]
+        if not 0 <= position < count:
+            raise IndexError(position)
+        return self._decode(image_key, first, position)
+
+    def get(self, qid):
+        """Look a question up by its id; returns None if it doesn't exist"""
+        try:
+            image_key, position = parse_qid(qid)
+            return self.question(image_key, position)
+        except (ValueError, KeyError, IndexError):
+            return None
+
+    def questions(self, image_key):
+        """All questions for one image, decoded"""
+        first, count = self._images[image_key]
+        return tuple(self._decode(image_key, first, i) for i in range(count))
+
+    def difficulty_positions(self, image_key):
+        """{difficulty: [positions]} for one image, without decoding any strings"""
+        first, count = self._images[image_key]
+        grouped = {}
+        for position in range(count):
+            difficulty = _QUESTION.unpack_from(self._buf, self._questions_at + (first + position) * _QUESTION.size)[5]
+            grouped.setdefault(self.difficulties[difficulty], []).append(position)
+        return grouped
+
+    def is_stale(self, source_path):
+        """True if source_path changed since this bank was compiled"""
+        return _source_signature(source_path) != (self.source_size, self.source_mtime_ns)
+
+
+def load_question_bank(source_path, bank_path):
+    """Open bank_path, compiling it from source_path first if missing or stale"""
+    if os.path.exists(bank_path):
+        try:
+            bank = QuestionBank(bank_path)
+            if not bank.is_stale(source_path):
+                return bank
+        except ValueError:
+            pass
+    logger.info("🛠️ Compiling question bank %s from %s", bank_path, source_path)
+    compile_question_bank(source_path, bank_path)
+    return QuestionBank(bank_path)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'data.bank'
+    compile_question_bank(source, target)
+    bank = QuestionBank(target)
+    print(f"✅ Compiled {len(bank)} images / {bank.question_total} questions "
+          f"into {target} ({os.path.getsize(target)} bytes)")
@@ -0,0 +1,131 @@
+"""In-process leaderboard standings for /api/leaderboard.
+
+Teams are kept in a list sorted by ``(-total_points, -wins, team_name)``.
+A team's rank is the number of teams strictly ahead of it plus one (tied
+teams share a rank), which is a single bisect: O(log n). Top-K is a slice.
+A score change moves one entry (bisect plus a list insert/delete, a
+memmove of a few KB even for thousands of teams).
+
+The routes feed every leaderboard row they write or mirror into
+``update``, so a worker's standings follow its own requests and the
+Firestore listener immediately. Other workers write the shared SQLite
+store directly, so ``reconcile_if_due`` rebuilds the index from the store
+every ``interval`` seconds; ``drift`` counts entries that were corrected.
+"""
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(team_name, total_points, wins):
+    return (-total_points, -wins, team_name)
+
+
+class Ranking:
+    def __init__(self, interval=5.0, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._order = []
+        self._teams = {}
+        self._reconciled_at = None
+        # Bumped on every change; a cheap "has anything moved" check
+        self.version = 0
+        self.reconciles = 0
+        self.drift = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def _set(self, team_name, entry):
+        """Move team_name to entry (None removes it); caller holds the lock"""
+        old = self._teams.get(team_name)
+        if old == entry:
+            return False
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, _sort_key(team_name, old[0], old[1]))]
+        if entry is None:
+            del self._teams[team_name]
+        else:
+            self._teams[team_name] = entry
+            bisect.insort(self._order, _sort_key(team_name, entry[0], entry[1]))
+        self.version += 1
+        return True
+
+    def update(self, row):
+        """Record a leaderboard row (sqlite3.Row or dict with the local column names)"""
+        with self._lock:
+            return self._set(row['team_name'], (row['total_points'], row['wins'], row['games_played']))
+
+    def remove(self, team_name):
+        with self._lock:
+            return self._set(team_name, None)
+
+    def reconcile(self, rows):
+        """Make the index match rows exactly; returns how many teams were corrected"""
+        entries = {row['team_name']: (row['total_points'], row['wins'], row['games_played']) for row in rows}
+        order = sorted(_sort_key(team_name, entry[0], entry[1]) for team_name, entry in entries.items())
+        with self._lock:
+            corrected = sum(self._teams.get(team_name) != entry for team_name, entry in entries.items())
+            corrected += sum(team_name not in entries for team_name in self._teams)
+            if corrected:
+                self._teams, self._order = entries, order
+                self.version += 1
+            self._reconciled_at = self._clock()
+        self.reconciles += 1
+        self.drift += corrected
+        if corrected:
+            logger.debug("Leaderboard reconcile corrected %d teams", corrected)
+        return corrected
+
+    def reconcile_if_due(self, load_rows):
+        """Reconcile from load_rows() if the last one is older than interval.
+
+        Only one thread reloads at a time; the others keep answering from
+        the current index.
+        """
+        if self._reconciled_at is not None and self._clock() - self._reconciled_at < self.interval:
+            return False
+        if not self._reconcile_lock.acquire(blocking=self._reconciled_at is None):
+            return False
+        try:
+            if self._reconciled_at is None or self._clock() - self._reconciled_at >= self.interval:
+                self.reconcile(load_rows())
+                return True
+            return False
+        finally:
+            self._reconcile_lock.release()
+
+    def rank(self, team_name):
+        """1-based rank of the team (ties share a rank), or None if unknown"""
+        with self._lock:
+            entry = self._teams.get(team_name)
+            if entry is None:
+                return None
+            return bisect.bisect_left(self._order, (-entry[0], -entry[1])) + 1
+
+    def entry(self, team_name):
+        """The team's standing as returned by top(), or None"""
+        with self._lock:
+            entry = self._teams.get(team_name)
+            if entry is None:
+                return None
+            rank = bisect.bisect_left(self._order, (-entry[0], -entry[1])) + 1
+        return {'rank': rank, 'name': team_name, 'score': entry[0], 'wins': entry[1], 'games_played': entry[2]}
+
+    def top(self, k):
+        """The first k teams with their ranks; returns (version, entries)"""
+        with self._lock:
+            keys = self._order[:k]
+            entries = []
+            rank = 1
+            for i, (neg_points, neg_wins, team_name) in enumerate(keys):
+                if i and keys[i - 1][:2] != (neg_points, neg_wins):
+                    rank = i + 1
+                entries.append({'rank': rank, 'name': team_name, 'score': -neg_points, 'wins': -neg_wins,
+                                'games_played': self._teams[team_name][2]})
+            return self.version, entries
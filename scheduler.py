@@ -0,0 +1,213 @@
+"""Fair, non-repeating image and question draws per team.
+
+Each team gets a random ``seed`` and an image ``cursor``, and nothing
+else. The seed picks a pseudo-random permutation of the available images.
+The cursor counts slots of that permutation the team has used up, across
+epochs: epoch ``cursor // len(images)`` gets its own permutation, so a
+team sees every image once before any image comes back. Permutations are
+computed from the seed (a seeded shuffle, or a keyed Feistel network
+for large domains), not stored,
+so the next draw is O(1) and memory does not grow with the number of
+teams (a bounded LRU keeps recently used ones).
+
+Offers are the first uncompleted images from the cursor on. The cursor
+only moves past images that were completed, so an image that was offered
+but not played is offered again. Questions for an image come from one
+permutation per difficulty. The round's ``k`` slots are split between
+difficulties by ``DIFFICULTY_MIX``. In epoch e a team gets the e-th block
+of each difficulty's permutation, so replaying an image in a later epoch
+brings questions it has not seen yet.
+
+``tests/test_scheduler.py`` checks coverage and uniformity; ``python bench.py
+schedule`` prints the same measures along with draw times.
+"""
+import hashlib
+import random
+
+from cache import TTLCache
+
+# Relative share of a round's questions per difficulty
+DIFFICULTY_MIX = {'easy': 3, 'medium': 3, 'hard': 2, 'impossible': 2}
+
+# Domains up to this size are shuffled outright: a Feistel network over a
+# few bits is measurably biased, and a table of a few hundred ints is cheap
+SHUFFLE_LIMIT = 256
+_ROUNDS = 8
+_M64 = (1 << 64) - 1
+
+
+def new_seed():
+    """A random 62-bit team seed (fits a signed SQLite INTEGER)"""
+    return random.SystemRandom().getrandbits(62)
+
+
+def derive_key(*parts):
+    """64-bit key from a seed and any context (image, difficulty, epoch)"""
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _mix(value, key):
+    """splitmix64 finalizer of value ^ key"""
+    value = (value ^ key) & _M64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _M64
+    return value ^ (value >> 31)
+
+
+class Permutation:
+    """A keyed pseudo-random permutation of range(n).
+
+    Up to SHUFFLE_LIMIT elements it is a Fisher-Yates shuffle seeded with
+    key. Above that, a balanced Feistel network permutes the smallest
+    even-bit-width domain holding n values, and outputs outside range(n)
+    are fed back in (cycle walking, fewer than four steps on average).
+    """
+
+    __slots__ = ('n', '_table', '_half', '_mask', '_keys')
+
+    def __init__(self, n, key):
+        if n <= 0:
+            raise ValueError("Permutation needs at least one element")
+        self.n = n
+        self._table = None
+        if n <= SHUFFLE_LIMIT:
+            table = list(range(n))
+            random.Random(key).shuffle(table)
+            self._table = tuple(table)
+            return
+        bits = max(2, (n - 1).bit_length())
+        self._half = (bits + 1) // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = tuple(_mix(round_number, key) for round_number in range(_ROUNDS))
+
+    def _encrypt(self, value):
+        left, right = value >> self._half, value & self._mask
+        for round_key in self._keys:
+            left, right = right, left ^ (_mix(right, round_key) & self._mask)
+        return (left << self._half) | right
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.n:
+            raise IndexError(index)
+        if self._table is not None:
+            return self._table[index]
+        value = self._encrypt(index)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (self[i] for i in range(self.n))
+
+
+def allocate(k, available, mix=DIFFICULTY_MIX):
+    """Split k slots between difficulties by mix, capped by what is available.
+
+    available maps difficulty -> question count. Uses largest remainders;
+    slots a difficulty cannot fill go to the others in mix order.
+    """
+    weights = {name: mix.get(name, 1) for name, count in available.items() if count}
+    total = sum(weights.values())
+    k = min(k, sum(available.values()))
+    if not total:
+        return {}
+    exact = {name: k * weight / total for name, weight in weights.items()}
+    slots = {name: min(int(share), available[name]) for name, share in exact.items()}
+    by_remainder = sorted(weights, key=lambda name: (-(exact[name] - int(exact[name])), -weights[name]))
+    while sum(slots.values()) < k:
+        for name in by_remainder:
+            if sum(slots.values()) < k and slots[name] < available[name]:
+                slots[name] += 1
+    return {name: count for name, count in slots.items() if count}
+
+
+def draw_block(seed, context, count, start, size):
+    """size items from position start of an endless sequence of permutations of range(count).
+
+    Permutation number ``j // count`` (keyed by seed, context and that
+    number) supplies item j, so consecutive blocks never repeat an item
+    until all count items were drawn. A block that straddles two
+    permutations skips items it already holds.
+    """
+    size = min(size, count)
+    items = []
+    permutation, permutation_number = None, None
+    j = start
+    while len(items) < size:
+        if j // count != permutation_number:
+            permutation_number = j // count
+            permutation = Permutation(count, derive_key(seed, context, permutation_number))
+        item = permutation[j % count]
+        if item not in items:
+            items.append(item)
+        j += 1
+    return items
+
+
+class Scheduler:
+    """Draws for a fixed list of image numbers"""
+
+    def __init__(self, image_numbers, mix=DIFFICULTY_MIX):
+        self.image_numbers = list(image_numbers)
+        self.mix = mix
+        # (seed, epoch) -> Permutation of the images, for recently active teams
+        self.permutations = TTLCache(maxsize=4096, ttl=float('inf'))
+
+    def _image_at(self, seed, slot):
+        """Image number at absolute cursor slot (any epoch)"""
+        n = len(self.image_numbers)
+        epoch = slot // n
+        key = (seed, epoch)
+        permutation = self.permutations.get(key)
+        if permutation is None:
+            permutation = Permutation(n, derive_key(seed, 'images', epoch))
+            self.permutations.set(key, permutation)
+        return self.image_numbers[permutation[slot % n]]
+
+    def epoch(self, cursor):
+        return cursor // len(self.image_numbers) if self.image_numbers else 0
+
+    def offer(self, seed, cursor, completed, k=4):
+        """Pick up to k images to offer.
+
+        completed is a bitset of image numbers finished in the current
+        epoch. Returns (images, cursor, new_epoch): the cursor moved past
+        leading completed images, and new_epoch is True when that finished
+        the epoch (the caller should then clear completed).
+        """
+        n = len(self.image_numbers)
+        if not n:
+            return [], cursor, False
+        epoch_end = (cursor // n + 1) * n
+        while cursor < epoch_end and completed >> self._image_at(seed, cursor) & 1:
+            cursor += 1
+        new_epoch = cursor == epoch_end
+        if new_epoch:
+            completed = 0
+            epoch_end += n
+
+        # Near the end of an epoch fewer than k images may be left
+        images = []
+        slot = cursor
+        while len(images) < k and slot < epoch_end:
+            image = self._image_at(seed, slot)
+            if not completed >> image & 1:
+                images.append(image)
+            slot += 1
+        return images, cursor, new_epoch
+
+    def questions(self, seed, cursor, image_key, positions_by_difficulty, k=10):
+        """Question positions for a new round on image_key, in the team's current epoch"""
+        available = {name: len(positions) for name, positions in positions_by_difficulty.items()}
+        slots = allocate(k, available, self.mix)
+        epoch = self.epoch(cursor)
+        chosen = []
+        for name, size in slots.items():
+            positions = positions_by_difficulty[name]
+            picks = draw_block(seed, (image_key, name), len(positions), epoch * size, size)
+            chosen.extend(positions[i] for i in picks)
+        return sorted(chosen)
@@ -0,0 +1,171 @@
+"""Background replication of leaderboard counters to Firestore.
+
+Routes record counter changes in the local SQLite store
+(``local_store.LocalStore.add_counters``), which appends them to a
+``sync_outbox`` table. ``ScoreWriter`` drains that outbox every
+``interval`` seconds: rows are claimed, summed per team and committed as
+``firestore.Increment`` writes in one batch, so a burst of answers from a
+team costs a single write and never loses an update. Because the outbox is
+on disk, nothing queued is lost if a worker is killed; another worker takes
+over stale claims.
+
+Only deltas are ever written. A team without a document gets one under an
+id derived from its name (``document_id_for``), created with zeroed
+counters in the same batch as its first increments. The create fails if
+the document is already there, so two workers syncing a new team at once
+never count its points twice.
+"""
+import atexit
+import hashlib
+import itertools
+import logging
+import os
+import threading
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from storage import new_team_stats
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+# Claim owners are unique per process, even with several writers in it
+_claims = itertools.count(1)
+
+logger = logging.getLogger(__name__)
+
+
+def document_id_for(team_name):
+    """Leaderboard document id the writer creates for a team, the same in every worker"""
+    return 'team-' + hashlib.sha256(team_name.encode('utf-8')).hexdigest()[:20]
+
+
+class ScoreWriter:
+    """Drains the local outbox into the Firestore ``leaderboard`` collection.
+
+    ``storage`` is the app's ``storage.FirestoreStorage``; it looks the
+    client up at flush time, so the client can be swapped (or be None in
+    offline mode).
+    """
+
+    def __init__(self, store, storage, interval=0.25):
+        self._store = store
+        self._storage = storage
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+
+    def start(self):
+        """Start the background thread once per process"""
+        with self._start_lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("❌ Score sync failed: %s", e)
+
+    @staticmethod
+    def _update_for(deltas):
+        # Counters only: status is the admin's (an offline team stays offline)
+        return {field: firestore.Increment(delta) for field, delta in deltas.items() if delta}
+
+    def flush(self):
+        """Replicate one claim's worth of outbox rows; returns documents written"""
+        if not self._storage.available:
+            return 0
+        owner = f"{os.getpid()}-{threading.get_ident()}-{next(_claims)}"
+        # A team without a document takes two writes (create, then increment)
+        entries = self._store.claim_outbox(owner, limit=MAX_BATCH_WRITES // 2)
+        if not entries:
+            return 0
+
+        # (entry, document id, update, document to create first or None)
+        writes = []
+        try:
+            for entry in entries:
+                firestore_id = entry['firestore_id']
+                document = None
+                if firestore_id is None:
+                    # First sync for this team: attach to its existing doc or create one
+                    snapshot = self._storage.find_team(entry['team_name'])
+                    if snapshot is not None:
+                        firestore_id = snapshot.id
+                    else:
+                        firestore_id = document_id_for(entry['team_name'])
+                        document = dict(new_team_stats(entry['team_name']), status=entry['document']['status'])
+                writes.append((entry, firestore_id, self._update_for(entry['deltas']), document))
+        except Exception as e:
+            logger.warning("❌ Score sync lookup failed, will retry: %s", e)
+            self._store.release_outbox(owner)
+            return 0
+
+        batch = []
+        for _, firestore_id, update, document in writes:
+            if document is not None:
+                batch.append(('create', firestore_id, document))
+            batch.append(('update', firestore_id, update))
+        try:
+            self._storage.write_teams(batch)
+            self.commits += 1
+            written = [(entry, firestore_id) for entry, firestore_id, _, _ in writes]
+        except (NotFound, AlreadyExists):
+            # One deleted document, or one another worker just created,
+            # fails the whole batch; retry one by one
+            written = self._write_individually(owner, writes)
+        except Exception as e:
+            logger.warning("❌ Score batch commit failed, will retry: %s", e)
+            self._store.release_outbox(owner)
+            return 0
+
+        for entry, firestore_id in written:
+            if entry['firestore_id'] != firestore_id:
+                self._store.set_firestore_id(entry['team_name'], firestore_id)
+        self._store.ack_outbox(owner, [entry['team_name'] for entry, _ in written])
+        logger.debug("Synced %d leaderboard documents", len(written))
+        self.writes += len(written)
+        return len(written)
+
+    def _write_individually(self, owner, writes):
+        written = []
+        for entry, firestore_id, update, document in writes:
+            try:
+                if document is not None:
+                    try:
+                        self._storage.create_team(firestore_id, document)
+                    except AlreadyExists:
+                        # Created by another worker since the lookup: just add ours
+                        pass
+                self._storage.update_team(firestore_id, update)
+                written.append((entry, firestore_id))
+            except NotFound:
+                # The doc was deleted in Firestore; look it up again next time
+                logger.warning("⚠️ Leaderboard doc %s for %s is gone, re-resolving", firestore_id, entry['team_name'])
+                self._store.set_firestore_id(entry['team_name'], None)
+                self._store.release_outbox(owner, [entry['team_name']])
+            except Exception as e:
+                logger.warning("❌ Score update failed, will retry: %s", e)
+                self._store.release_outbox(owner, [entry['team_name']])
+        return written
+
+    def close(self):
+        """Stop the background thread and flush whatever is still queued"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        while self.flush():
+            pass
+
+    def register_shutdown_flush(self):
+        atexit.register(self.close)
@@ -0,0 +1,40 @@
+"""Where a process's start-up time goes.
+
+``app`` creates one ``StartupReport`` before its heavy imports and marks
+each phase as it finishes. The summary is logged once the app is ready
+(in the gunicorn master when ``preload_app`` is on, otherwise in every
+worker) and exported as ``startup_phase_seconds`` at /metrics.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self._last = self.started
+        # (phase, seconds) in the order they ran
+        self.phases = []
+
+    def mark(self, phase):
+        """Record the time since the previous mark as phase"""
+        now = self._clock()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def by_phase(self):
+        """{(phase,): seconds}, the shape a registry gauge callback returns"""
+        return {(phase,): seconds for phase, seconds in self.phases}
+
+    def summary(self):
+        return ', '.join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+
+    def log(self, what):
+        logger.info("🚀 %s ready in %.0f ms (%s)", what, self.total * 1000, self.summary())
@@ -0,0 +1,480 @@
+let answeredQuestions = new Set();
+// Round settings rendered by the server onto .game-container
+const gameContainer = document.querySelector('.game-container');
+let totalQuestions = parseInt(gameContainer.dataset.totalQuestions, 10);
+let currentScore = 0;
+let hintsUsed = {};
+let imageNumber = parseInt(gameContainer.dataset.imageNumber, 10);
+let imageCompleted = false;
+// Solved questions and revealed hints of a resumed round (absent for a new one)
+const savedProgress = gameContainer.dataset.progress ? JSON.parse(gameContainer.dataset.progress) : null;
+
+// When answers were tried and hints revealed, sent to /api/events in batches;
+// the server records the outcomes itself and uses these for solve times
+const EVENT_BATCH_SIZE = 20;
+const EVENT_FLUSH_MS = 10000;
+const roundShownAt = performance.now();
+let pendingEvents = [];
+
+// Initialize hints tracking
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('🎮 Game page loaded for image:', imageNumber);
+    console.log('📸 Image URL:', gameContainer.dataset.imageUrl);
+    console.log('Total random questions:', totalQuestions);
+    
+    // Show welcome message for random questions
+    setTimeout(() => {
+        if (savedProgress) {
+            alert(`🔄 Welcome back to Image ${imageNumber}!\n\n${answeredQuestions.size} of ${totalQuestions} questions solved so far. Keep going!`);
+        } else {
+            alert(`🎯 Welcome to Image ${imageNumber}!\n\nYou have ${totalQuestions} random questions to solve. Good luck!`);
+        }
+    }, 500);
+    
+    // Initialize hints tracking for each question
+    const questions = document.querySelectorAll('.question-card');
+    questions.forEach(question => {
+        const questionId = question.id.replace('question-', '');
+        hintsUsed[questionId] = 0;
+        console.log(`Initialized hints tracking for question ${questionId}`);
+    });
+    
+    if (savedProgress) {
+        restoreProgress(savedProgress);
+    }
+    
+    // Debug: Log all hint buttons and their data
+    const hintButtons = document.querySelectorAll('.hint-btn');
+    console.log(`🔧 Found ${hintButtons.length} hint buttons`);
+    hintButtons.forEach(button => {
+        const questionId = button.getAttribute('data-question-id');
+        const hintIndex = button.getAttribute('data-hint-index');
+        console.log(`Hint Button - Q${questionId}, Hint${hintIndex}:`, button.getAttribute('data-qid'));
+    });
+    
+    // Add animations to questions
+    const questionCards = document.querySelectorAll('.question-card');
+    questionCards.forEach((card, index) => {
+        card.style.animationDelay = `${index * 0.1}s`;
+        card.classList.add('slide-up');
+    });
+    
+    // Add focus effects to answer inputs
+    const answerInputs = document.querySelectorAll('.answer-input');
+    answerInputs.forEach(input => {
+        input.addEventListener('focus', function() {
+            this.classList.add('answer-input-focused');
+        });
+        
+        input.addEventListener('blur', function() {
+            if (!this.disabled) {
+                this.classList.remove('answer-input-focused');
+            }
+        });
+        
+        // Add Enter key support for desktop
+        input.addEventListener('keypress', function(event) {
+            if (event.key === 'Enter') {
+                checkAnswer(this);
+            }
+        });
+    });
+    
+    // Hide mobile enter buttons on desktop, show on mobile
+    checkMobileView();
+    window.addEventListener('resize', checkMobileView);
+    
+    // Check if image loaded successfully
+    checkImageLoad();
+    
+    // Send gameplay events periodically, and whatever is left when the page goes away
+    setInterval(flushEvents, EVENT_FLUSH_MS);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flushEvents(true);
+        }
+    });
+});
+
+function trackEvent(type, qid, details) {
+    pendingEvents.push(Object.assign({
+        type: type,
+        question_id: qid,
+        elapsed_ms: Math.round(performance.now() - roundShownAt)
+    }, details));
+    if (pendingEvents.length >= EVENT_BATCH_SIZE) {
+        flushEvents();
+    }
+}
+
+function flushEvents(leavingPage) {
+    if (!pendingEvents.length) return Promise.resolve();
+    const body = JSON.stringify({events: pendingEvents});
+    pendingEvents = [];
+    // sendBeacon survives the page being closed; fetch is used otherwise
+    if (leavingPage && navigator.sendBeacon &&
+        navigator.sendBeacon('/api/events', new Blob([body], {type: 'application/json'}))) {
+        return Promise.resolve();
+    }
+    return fetch('/api/events', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: body,
+        keepalive: true
+    }).catch(error => {
+        console.error('❌ Error sending gameplay events:', error);
+    });
+}
+
+function checkImageLoad() {
+    const img = document.querySelector('.game-image-display');
+    if (img && !img.complete) {
+        img.addEventListener('load', function() {
+            console.log('✅ Image loaded successfully');
+        });
+        img.addEventListener('error', function() {
+            console.log('❌ Image failed to load');
+            showImageErrorModal();
+        });
+    }
+}
+
+function handleImageError(img) {
+    console.log('❌ Image error handler triggered');
+    showImageErrorModal();
+}
+
+function showImageErrorModal() {
+    const modal = document.getElementById('imageErrorModal');
+    if (modal) {
+        modal.style.display = 'block';
+    }
+}
+
+function closeImageErrorModal() {
+    const modal = document.getElementById('imageErrorModal');
+    if (modal) {
+        modal.style.display = 'none';
+    }
+}
+
+function checkMobileView() {
+    const mobileButtons = document.querySelectorAll('.mobile-enter-btn');
+    const isMobile = window.innerWidth <= 768;
+    
+    mobileButtons.forEach(button => {
+        button.style.display = isMobile ? 'block' : 'none';
+    });
+}
+
+function checkAnswer(inputElement) {
+    const questionId = inputElement.getAttribute('data-question-id');
+    const qid = inputElement.getAttribute('data-qid');
+    const userAnswer = inputElement.value.trim();
+    
+    if (!userAnswer) {
+        showTemporaryMessage(`result-${questionId}`, '❌ Please enter an answer!', 'error');
+        return;
+    }
+    if (inputElement.disabled || answeredQuestions.has(questionId)) return;
+    
+    // Answers are checked and scored on the server
+    fetch('/api/submit_answer', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({question_id: qid, answer: userAnswer})
+    }).then(response => response.json())
+      .then(data => {
+          if (!data.success) {
+              showTemporaryMessage(`result-${questionId}`, `❌ ${data.error || 'Could not check answer'}`, 'error');
+          } else if (data.correct) {
+              if (!data.already_solved) {
+                  trackEvent('attempt', qid);
+              }
+              markQuestionSolved(inputElement, questionId, data);
+          } else {
+              trackEvent('attempt', qid);
+              showWrongAnswer(inputElement, questionId);
+          }
+      })
+      .catch(error => {
+          console.error('❌ Error checking answer:', error);
+          showTemporaryMessage(`result-${questionId}`, '❌ Network error, please try again', 'error');
+      });
+}
+
+function restoreProgress(saved) {
+    Object.entries(saved.questions).forEach(([questionId, state]) => {
+        state.hints.forEach(([hintIndex, text]) => {
+            const button = document.querySelector(
+                `.hint-btn[data-question-id="${questionId}"][data-hint-index="${hintIndex}"]`);
+            if (button) {
+                renderHint(button, questionId, hintIndex, text);
+            }
+        });
+        hintsUsed[questionId] = state.hints.length;
+        
+        const inputElement = document.getElementById(`answer-input-${questionId}`);
+        if (state.solved && inputElement) {
+            inputElement.value = state.answer;
+            lockQuestion(inputElement, questionId);
+            document.getElementById(`result-${questionId}`).innerHTML =
+                '<div class="result-success">✅ Solved earlier</div>';
+            answeredQuestions.add(questionId);
+        }
+    });
+    currentScore = saved.score;
+    updateProgress();
+    console.log(`🔄 Resumed round: ${answeredQuestions.size}/${totalQuestions} solved, ${currentScore} points`);
+}
+
+function lockQuestion(inputElement, questionId) {
+    inputElement.classList.add('answer-correct');
+    inputElement.disabled = true;
+    
+    // Disable mobile button too
+    const mobileBtn = document.querySelector(`.mobile-enter-btn[data-question-id="${questionId}"]`);
+    if (mobileBtn) {
+        mobileBtn.disabled = true;
+        mobileBtn.classList.add('answer-correct');
+    }
+    
+    // Disable hint buttons
+    const hintBtns = document.querySelectorAll(`.hint-btn[data-question-id="${questionId}"]`);
+    hintBtns.forEach(btn => {
+        btn.disabled = true;
+        btn.classList.add('hint-used');
+    });
+}
+
+function markQuestionSolved(inputElement, questionId, data) {
+    const finalPoints = data.points;
+    
+    lockQuestion(inputElement, questionId);
+    
+    // Show success message
+    const resultElement = document.getElementById(`result-${questionId}`);
+    resultElement.innerHTML = `
+        <div class="result-success">
+            ✅ Correct! +${finalPoints} points 
+            ${data.hints_used > 0 ? `(after ${data.hints_used} hint penalty)` : ''}
+        </div>
+    `;
+    
+    answeredQuestions.add(questionId);
+    currentScore += finalPoints;
+    updateProgress();
+}
+
+function showWrongAnswer(inputElement, questionId) {
+    inputElement.classList.add('answer-wrong');
+    
+    const resultElement = document.getElementById(`result-${questionId}`);
+    resultElement.innerHTML = `
+        <div class="result-error">
+            ❌ Wrong answer! Try again.
+        </div>
+    `;
+    
+    setTimeout(() => {
+        inputElement.classList.remove('answer-wrong');
+        resultElement.innerHTML = '';
+    }, 2000);
+}
+
+// Mobile-specific answer checking function
+function checkMobileAnswer(button) {
+    const questionId = button.getAttribute('data-question-id');
+    const inputElement = document.getElementById(`answer-input-${questionId}`);
+    
+    if (!inputElement) {
+        console.error('Input element not found for question:', questionId);
+        return;
+    }
+    
+    // Add a quick animation to the button
+    button.classList.add('mobile-btn-pressed');
+    setTimeout(() => {
+        button.classList.remove('mobile-btn-pressed');
+    }, 200);
+    
+    checkAnswer(inputElement);
+}
+
+function showHint(button) {
+    const questionId = button.getAttribute('data-question-id');
+    const hintIndex = button.getAttribute('data-hint-index');
+    const qid = button.getAttribute('data-qid');
+    
+    // Get the hint area
+    const hintArea = document.getElementById(`hints-${questionId}`);
+    if (!hintArea) {
+        console.error('❌ Hint area not found:', `hints-${questionId}`);
+        return;
+    }
+    
+    button.disabled = true;
+    
+    // Hint text comes from the server, which also records the penalty
+    fetch('/api/reveal_hint', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({question_id: qid, hint_index: parseInt(hintIndex)})
+    }).then(response => response.json())
+      .then(data => {
+          if (!data.success) {
+              button.disabled = false;
+              alert('No hint available for this question.');
+              return;
+          }
+          
+          renderHint(button, questionId, hintIndex, data.hint);
+          trackEvent('hint', qid, {hint_index: parseInt(hintIndex)});
+          
+          // Track hints used
+          hintsUsed[questionId] = data.hints_used;
+          console.log(`📊 Hints used for question ${questionId}: ${hintsUsed[questionId]}`);
+          
+          // Show hint used message
+          showTemporaryMessage(`result-${questionId}`, `💡 Hint ${parseInt(hintIndex) + 1} used! -25% score penalty for this question.`, 'info');
+      })
+      .catch(error => {
+          button.disabled = false;
+          console.error('❌ Error revealing hint:', error);
+      });
+}
+
+function renderHint(button, questionId, hintIndex, text) {
+    // Create and append hint element
+    const hintElement = document.createElement('div');
+    hintElement.className = 'hint-text';
+    hintElement.innerHTML = `
+        <div class="hint-content">
+            <span class="hint-icon">💡</span>
+            <span class="hint-message">
+                <strong>Hint ${parseInt(hintIndex) + 1}:</strong> <span class="hint-body"></span>
+            </span>
+        </div>
+    `;
+    hintElement.querySelector('.hint-body').textContent = text;
+    document.getElementById(`hints-${questionId}`).appendChild(hintElement);
+    
+    // Update the button appearance
+    button.disabled = true;
+    button.classList.add('hint-used');
+    button.innerHTML = `💡 Hint ${parseInt(hintIndex) + 1} (Used)`;
+}
+
+function showTemporaryMessage(elementId, message, type) {
+    const element = document.getElementById(elementId);
+    if (!element) return;
+    
+    const className = type === 'error' ? 'result-error' : 
+                     type === 'success' ? 'result-success' : 'result-info';
+    
+    element.innerHTML = `<div class="${className}">${message}</div>`;
+    
+    if (type !== 'success') { // Success messages stay permanent
+        setTimeout(() => {
+            if (element.innerHTML.includes(message)) {
+                element.innerHTML = '';
+            }
+        }, 3000);
+    }
+}
+
+function updateProgress() {
+    const answeredCount = answeredQuestions.size;
+    const progressPercent = (answeredCount / totalQuestions) * 100;
+    
+    document.getElementById('answered-count').textContent = answeredCount;
+    document.getElementById('current-score').textContent = currentScore;
+    document.getElementById('progress-bar').style.width = `${progressPercent}%`;
+    
+    if (answeredCount === totalQuestions && !imageCompleted) {
+        // All questions answered - mark image as completed
+        imageCompleted = true;
+        
+        document.getElementById('skip-btn').style.display = 'none';
+        document.getElementById('next-btn').style.display = 'block';
+        document.getElementById('game-status').innerHTML = `
+            <p class="completion-message">
+                🎉 All ${totalQuestions} questions completed! Ready for next image!
+            </p>
+        `;
+        
+        // Update Firestore with image completion (gamesPlayed)
+        updateImageCompletion();
+        
+        // Show completion alert
+        setTimeout(() => {
+            alert(`🎊 Congratulations! You completed Image ${imageNumber} and earned ${currentScore} points!\n\nYou solved all ${totalQuestions} random questions!`);
+        }, 500);
+    }
+}
+
+function updateImageCompletion() {
+    console.log('📤 Recording image completion in Firestore');
+    
+    // Timings are only accepted while the round is open, so send them first
+    flushEvents().then(() => fetch('/api/complete_image', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({})
+    }).then(response => response.json())
+      .then(data => {
+          if (data.success) {
+              console.log('✅ Image completion recorded:', data);
+          } else {
+              console.error('❌ Image completion failed:', data.error);
+          }
+      })
+      .catch(error => {
+          console.error('❌ Error recording image completion:', error);
+      }));
+}
+
+function skipImage() {
+    if (confirm('Are you sure you want to skip this image? You will not earn any points for the remaining questions.')) {
+        alert('⏭️ Image skipped! Moving to image selection...');
+        moveToImageSelection();
+    }
+}
+
+function moveToImageSelection() {
+    alert('🎯 Moving to image selection... Choose your next challenge!');
+    setTimeout(() => {
+        window.location.href = gameContainer.dataset.imageSelectUrl;
+    }, 1000);
+}
+
+// Test function - you can call this from browser console
+window.testAllHints = function() {
+    console.log('🧪 Testing all hint buttons...');
+    const hintButtons = document.querySelectorAll('.hint-btn');
+    hintButtons.forEach(button => {
+        const questionId = button.getAttribute('data-question-id');
+        const hintIndex = button.getAttribute('data-hint-index');
+        console.log(`Q${questionId} Hint${hintIndex}: ${button.getAttribute('data-qid')}`);
+    });
+};
+
+window.testAnswerCheck = function(questionId, testAnswer) {
+    const input = document.getElementById(`answer-input-${questionId}`);
+    if (input) {
+        input.value = testAnswer;
+        checkAnswer(input);
+    }
+};
+
+// Display current stats
+window.showStats = function() {
+    console.log('📊 Current Game Stats:', {
+        imageNumber: imageNumber,
+        questionsCompleted: answeredQuestions.size,
+        totalQuestions: totalQuestions,
+        currentScore: currentScore,
+        imageCompleted: imageCompleted,
+        hintsUsed: hintsUsed
+    });
+};
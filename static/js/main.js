@@ -6,23 +6,56 @@ let gameState = {
     currentImage: null
 };
 
-// Status polling
+// Status updates: pushed over Server-Sent Events, polling only as a fallback
+let statusPollTimer = null;
+// A refused stream is retried after this long, polling meanwhile
+const STATUS_STREAM_RETRY_MS = 60000;
+
+function handleStatusUpdate(data) {
+    updateStatus(data.status, data.score);
+    
+    if (data.status === 'offline' && window.location.pathname !== '/dashboard') {
+        alert('Admin has ended your game session!');
+        window.location.href = '/dashboard';
+    }
+}
+
+function startStatusUpdates() {
+    if (!window.EventSource) {
+        startStatusPolling();
+        return;
+    }
+    
+    const source = new EventSource('/api/status/stream');
+    source.onopen = stopStatusPolling;
+    source.onmessage = event => handleStatusUpdate(JSON.parse(event.data));
+    source.onerror = () => {
+        // EventSource reconnects by itself when a stream ends; it gives up
+        // (CLOSED) when the server refuses one, e.g. because all its stream
+        // slots are taken, so poll until trying again
+        if (source.readyState === EventSource.CLOSED) {
+            console.warn('Status stream unavailable, polling for now');
+            startStatusPolling();
+            setTimeout(startStatusUpdates, STATUS_STREAM_RETRY_MS);
+        }
+    };
+}
+
 function startStatusPolling() {
-    setInterval(() => {
+    if (statusPollTimer) return;
+    statusPollTimer = setInterval(() => {
         fetch('/api/status')
             .then(response => response.json())
-            .then(data => {
-                updateStatus(data.status, data.score);
-                
-                if (data.status === 'offline' && window.location.pathname !== '/dashboard') {
-                    alert('Admin has ended your game session!');
-                    window.location.href = '/dashboard';
-                }
-            })
+            .then(handleStatusUpdate)
             .catch(error => console.error('Status check failed:', error));
     }, 3000);
 }
 
+function stopStatusPolling() {
+    clearInterval(statusPollTimer);
+    statusPollTimer = null;
+}
+
 function updateStatus(status, score) {
     const statusElement = document.getElementById('status-indicator');
     const startButton = document.getElementById('start-game-btn');
@@ -50,7 +83,7 @@ function updateStatus(status, score) {
 
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
-    startStatusPolling();
+    startStatusUpdates();
     
     // Add floating animation to elements
     const cards = document.querySelectorAll('.glass-card, .stat-card');
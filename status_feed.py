@@ -0,0 +1,208 @@
+"""Server-push team status for /api/status/stream.
+
+One Firestore snapshot listener on the ``leaderboard`` collection is shared
+by every connected client in the worker. Each change is fanned out to the
+subscribers for that team name, so the Firestore cost no longer grows with
+the number of open tabs. In mock mode (no Firestore) ``publish`` feeds the
+hub directly.
+
+Each open stream holds a worker thread, so a worker only serves
+``max_streams`` of them at a time (``open_stream``); gunicorn.conf.py gives
+the worker that many threads on top of the ones for requests, so open
+tabs never starve the other routes. A refused client polls /api/status
+instead, and streams end after ``max_duration`` so the slots rotate.
+``close_streams`` ends them all at once when the worker stops.
+
+``on_change(doc_id, data)`` lets the app mirror each change (data is None
+for a removed document) and return the leaderboard document to publish.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def status_payload(team_data):
+    """The /api/status response body for a leaderboard document"""
+    return {
+        'status': team_data.get('status', 'offline'),
+        'score': team_data.get('totalPoints', 0),
+        'wins': team_data.get('wins', 0),
+        'games_played': team_data.get('gamesPlayed', 0)
+    }
+
+
+def format_event(payload):
+    """Encode a payload as one Server-Sent Events message"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class StatusHub:
+    """Latest status per team plus the subscriber queues waiting on it"""
+
+    def __init__(self, on_change=None, max_streams=16):
+        self._on_change = on_change
+        self.max_streams = max_streams
+        self._streams = 0
+        self._streams_closed = False
+        self.streams_refused = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._latest = {}
+        self._doc_names = {}
+        self._subscribers = {}
+        self._watch = None
+        self._synced = threading.Event()
+
+    def start(self, db):
+        """Attach the shared leaderboard listener once; later calls are no-ops"""
+        with self._start_lock:
+            if self._watch is not None or db is None:
+                return
+            try:
+                self._watch = db.collection('leaderboard').on_snapshot(self._on_snapshot)
+                logger.info("📡 Leaderboard status listener started")
+            except Exception as e:
+                logger.error("❌ Failed to start leaderboard listener: %s", e)
+
+    def stop(self):
+        with self._start_lock:
+            watch, self._watch = self._watch, None
+        self._synced.clear()
+        if watch is not None:
+            watch.unsubscribe()
+
+    @property
+    def listening(self):
+        return self._watch is not None
+
+    @property
+    def synced(self):
+        """True once the listener delivered the whole collection (and on_change mirrored it)"""
+        return self._watch is not None and self._synced.is_set()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        for change in changes:
+            doc = change.document
+            if self._on_change is not None:
+                removed = change.type.name == 'REMOVED'
+                stored = self._on_change(doc.id, None if removed else doc.to_dict())
+                if stored is not None:
+                    self.publish(stored['name'], status_payload(stored))
+                continue
+            if change.type.name == 'REMOVED':
+                team_name = self._doc_names.pop(doc.id, None)
+                if team_name is not None:
+                    self.publish(team_name, {'status': 'offline', 'score': 0, 'wins': 0, 'games_played': 0})
+                continue
+            team_data = doc.to_dict() or {}
+            team_name = team_data.get('name')
+            if team_name is None:
+                continue
+            self._doc_names[doc.id] = team_name
+            self.publish(team_name, status_payload(team_data))
+        self._synced.set()
+
+    def publish(self, team_name, payload):
+        """Record the latest payload for a team and wake its subscribers"""
+        with self._lock:
+            if self._latest.get(team_name) == payload:
+                return
+            self._latest[team_name] = payload
+            # After close_streams the queues only carry its wake-up
+            subscribers = [] if self._streams_closed else list(self._subscribers.get(team_name, ()))
+        for sub in subscribers:
+            # Subscribers only care about the newest state; drop anything stale
+            try:
+                sub.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                sub.put_nowait(payload)
+            except queue.Full:
+                pass
+
+    def latest(self, team_name):
+        with self._lock:
+            return self._latest.get(team_name)
+
+    def subscribe(self, team_name):
+        sub = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(team_name, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, team_name, sub):
+        with self._lock:
+            subs = self._subscribers.get(team_name)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[team_name]
+
+    def open_stream(self):
+        """Take a stream slot; False (and counted) when all max_streams are taken"""
+        with self._lock:
+            if self._streams_closed or self._streams >= self.max_streams:
+                self.streams_refused += 1
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        """Give back a slot taken by open_stream"""
+        with self._lock:
+            self._streams -= 1
+
+    def close_streams(self):
+        """End every open stream and refuse new ones (the worker is stopping)"""
+        with self._lock:
+            self._streams_closed = True
+            subscribers = [sub for subs in self._subscribers.values() for sub in subs]
+        for sub in subscribers:
+            try:
+                sub.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                sub.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def stream(self, team_name, initial, keepalive=15.0, max_duration=60.0, clock=time.monotonic):
+        """Yield SSE text for one client until max_duration elapses.
+
+        Ending the response periodically frees its slot; EventSource
+        reconnects on its own using the ``retry`` interval.
+        """
+        sub = self.subscribe(team_name)
+        try:
+            yield "retry: 3000\n\n"
+            last = self.latest(team_name) or initial
+            if last is not None:
+                yield format_event(last)
+            deadline = clock() + max_duration
+            while True:
+                remaining = deadline - clock()
+                if remaining <= 0 or self._streams_closed:
+                    return
+                try:
+                    payload = sub.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if payload is None:
+                    # Woken by close_streams
+                    return
+                if payload != last:
+                    last = payload
+                    yield format_event(payload)
+        finally:
+            self.unsubscribe(team_name, sub)
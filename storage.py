@@ -0,0 +1,227 @@
+"""Firestore access for the routes: backend selection and the queries they share.
+
+``connect`` picks the backend once at start-up:
+
+    FAKE_FIRESTORE=1                       fake_firestore.FakeFirestore, in memory
+                                           (FAKE_FIRESTORE_LATENCY, FAKE_FIRESTORE_TEAMS)
+    FIREBASE_CREDENTIALS_PATH              service-account JSON file
+    FIREBASE_CREDENTIALS_JSON              the JSON itself
+    FIREBASE_CREDENTIALS                   legacy; either of the above
+    none of them                           None: offline mode, local store only
+
+Credentials are checked at start-up, but the real client (firebase_admin
+app, gRPC channel) is only created on first use, by ``LazyClient``. That
+keeps it out of worker boot, and out of the gunicorn master when
+``preload_app`` imports the app before forking: gRPC channels must not be
+carried across fork.
+
+Routes, the background writers (score_writer.py, admin_jobs.py) and
+export.py reach it through ``FirestoreStorage``; only the snapshot
+listeners (status_feed.py, participants.py) take the client itself. That class
+only uses the client API the fake also implements (``where('==')``,
+``order_by``/``start_after``/``limit``, ``Increment``, batches with
+create/update preconditions), so a load test against the fake runs the
+same code as production. ``get_client`` is called on every operation, so a
+benchmark can swap the client while the app is running.
+"""
+import json
+import logging
+import os
+import threading
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+from fake_firestore import client_from_env
+
+logger = logging.getLogger(__name__)
+
+
+class LazyClient:
+    """Stands in for ``firestore.client()`` and creates it on first attribute access"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._client is not None
+
+    def _get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def _firebase_client(cred, source):
+    def create():
+        firebase_admin.initialize_app(cred)
+        logger.info("✅ Firebase initialized successfully %s", source)
+        return firestore.client()
+    return LazyClient(create)
+
+
+def connect(environ=os.environ):
+    """The Firestore client (real or fake) configured by environ, or None"""
+    try:
+        # Support multiple ways to provide credentials:
+        # - FIREBASE_CREDENTIALS_PATH : path to service-account JSON file
+        # - FIREBASE_CREDENTIALS_JSON : full JSON content as env var
+        # - FIREBASE_CREDENTIALS : legacy; can be either a path or the JSON string
+        legacy_env = environ.get('FIREBASE_CREDENTIALS')
+        firebase_cred_path = environ.get('FIREBASE_CREDENTIALS_PATH') or legacy_env
+        firebase_cred_json = environ.get('FIREBASE_CREDENTIALS_JSON')
+
+        # If legacy env looks like JSON (starts with '{'), prefer it as JSON
+        if not firebase_cred_json and legacy_env and legacy_env.strip().startswith('{'):
+            firebase_cred_json = legacy_env
+
+        fake_db = client_from_env(environ)
+
+        # Local fake backend for testing (see fake_firestore.py)
+        if fake_db is not None:
+            logger.warning("🧪 Using the in-process fake Firestore (latency %s)", fake_db.latency)
+            return fake_db
+
+        # Try file path first (if provided and exists)
+        if firebase_cred_path and os.path.exists(firebase_cred_path):
+            return _firebase_client(credentials.Certificate(firebase_cred_path), f"with file: {firebase_cred_path}")
+
+        # Otherwise, try JSON content (but avoid parsing empty strings)
+        if firebase_cred_json and firebase_cred_json.strip():
+            try:
+                cred_dict = json.loads(firebase_cred_json)
+                return _firebase_client(credentials.Certificate(cred_dict), "from JSON environment variable")
+            except Exception as inner_e:
+                logger.error("❌ Failed to parse FIREBASE_CREDENTIALS_JSON: %s", inner_e)
+                return None
+
+        logger.warning("⚠️ No valid Firebase credentials provided. Set FIREBASE_CREDENTIALS_PATH (file) "
+                       "or FIREBASE_CREDENTIALS_JSON (JSON string). 🚫 Using mock data mode")
+        return None
+
+    except Exception as e:
+        logger.error("❌ Firebase initialization failed: %s. 🚫 Using mock data mode", e)
+        return None
+
+
+def participant_team_name(data, default=None):
+    """Be flexible with field names (teamName, team_name, name)"""
+    return data.get('teamName') or data.get('team_name') or data.get('name') or default
+
+
+def new_team_stats(team_name):
+    return {
+        'name': team_name,
+        'totalPoints': 0,
+        'wins': 0,
+        'gamesPlayed': 0,
+        'status': 'online'
+    }
+
+
+class FirestoreStorage:
+    """The participant and leaderboard operations the routes make.
+
+    Methods raise whatever the client raises; callers decide whether a
+    failure is fatal (login) or just logged (status reads).
+    """
+
+    def __init__(self, get_client):
+        self._get_client = get_client
+
+    @property
+    def client(self):
+        return self._get_client()
+
+    @property
+    def available(self):
+        """False in offline mode"""
+        return self._get_client() is not None
+
+    def find_participant(self, unique_code):
+        """The participants snapshot for unique_code, or None"""
+        found = self.client.collection('participants').where('uniqueCode', '==', unique_code).limit(1).get()
+        return found[0] if len(found) == 1 else None
+
+    def find_team(self, team_name):
+        """The leaderboard snapshot for team_name, or None"""
+        found = self.client.collection('leaderboard').where('name', '==', team_name).limit(1).get()
+        return found[0] if len(found) == 1 else None
+
+    def team_ref(self, document_id):
+        return self.client.collection('leaderboard').document(document_id)
+
+    def bootstrap_login(self, participant, counted, team_name, team_ref):
+        """A login's writes in one batch: whichever of the two bootstraps is still needed.
+
+        Counts the participant in meta/counters unless counted, and creates
+        the team's leaderboard document if team_ref is None. Returns (team_ref, team_stats); team_stats is None unless the
+        document was created. Nothing is sent if there is nothing to write.
+        """
+        batch = self.client.batch()
+        writes = 0
+        if not counted:
+            # Atomic increment of the central counters doc, and mark the
+            # participant so a re-login doesn't count it twice
+            batch.set(self.client.collection('meta').document('counters'),
+                      {'totalParticipants': firestore.Increment(1)}, merge=True)
+            batch.update(participant.reference, {'counted': True})
+            writes += 2
+        team_stats = None
+        if team_ref is None:
+            team_stats = new_team_stats(team_name)
+            team_ref = self.client.collection('leaderboard').document()
+            batch.set(team_ref, team_stats)
+            writes += 1
+        if writes:
+            batch.commit()
+        return team_ref, team_stats
+
+    def read_team(self, team_ref):
+        """A fresh snapshot of a leaderboard document"""
+        return team_ref.get()
+
+    def leaderboard(self):
+        """Every leaderboard snapshot, in one read"""
+        return self.client.collection('leaderboard').stream()
+
+    def leaderboard_pages(self, page_size):
+        """Leaderboard snapshots by name, one list per query of page_size"""
+        query = self.client.collection('leaderboard').order_by('name').limit(page_size)
+        page = query.get()
+        while page:
+            yield page
+            if len(page) < page_size:
+                return
+            page = query.start_after(page[-1]).get()
+
+    def write_teams(self, writes):
+        """Commit (op, document_id, data) leaderboard writes in one batch.
+
+        op is 'create', which fails if the document exists, or 'update',
+        which fails if it doesn't; either failure (AlreadyExists, NotFound)
+        fails the whole batch.
+        """
+        batch = self.client.batch()
+        for op, document_id, data in writes:
+            if op == 'create':
+                batch.create(self.team_ref(document_id), data)
+            else:
+                batch.update(self.team_ref(document_id), data)
+        batch.commit()
+
+    def create_team(self, document_id, data):
+        """Create a leaderboard document; AlreadyExists if it is there"""
+        self.team_ref(document_id).create(data)
+
+    def update_team(self, document_id, data):
+        """Update a leaderboard document; NotFound if it is gone"""
+        self.team_ref(document_id).update(data)
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def game_app(tmp_path_factory):
+    """The app module on the in-process fake Firestore, with a local store of its own.
+
+    It is imported once per session, so each test plays as its own team
+    (codeN logs in as Team N).
+    """
+    env = {'FAKE_FIRESTORE': '1', 'FAKE_FIRESTORE_TEAMS': '20', 'SECRET_KEY': 'test', 'ADMIN_TOKEN': 'admin',
+           'LOG_LEVEL': 'WARNING', 'GAME_DB_PATH': str(tmp_path_factory.mktemp('app') / 'game.db')}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        import app
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return app
@@ -0,0 +1,145 @@
+"""Answer normalization and the fuzzy matching that decides every score."""
+import json
+import random
+
+import pytest
+
+from answers import AnswerIndex, answer_variants, bounded_distance, normalize_answer, typo_budget
+from question_bank import QuestionBank, compile_question_bank
+
+IMAGE = 'LAUGH/001.jpg'
+QUESTIONS = [
+    {'answer': 'Mohandas Karamchand Gandhi', 'aliases': ['Mahatma Gandhi']},
+    {'answer': 'Affordable Care Act (Obamacare)'},
+    {'answer': '1984'},
+    {'answer': 'Penicillin'},
+    {'answer': 'Penicillium'},
+    {'answer': 'Prime Minister / President of Cuba'},
+    {'answer': 'Lawyer'},
+    {'answer': 'Rome'},
+    {'answer': 'Apollo 11'},
+]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    path = tmp_path_factory.mktemp('bank')
+    questions = [dict(q, question=f"Question {i}?", hints=['a hint']) for i, q in enumerate(QUESTIONS)]
+    (path / 'data.json').write_text(json.dumps({IMAGE: {'easy': questions}}))
+    compile_question_bank(str(path / 'data.json'), str(path / 'data.bank'))
+    return AnswerIndex(QuestionBank(str(path / 'data.bank')))
+
+
+def qid(answer):
+    return f"{IMAGE}#{[q['answer'] for q in QUESTIONS].index(answer)}"
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("The Story of My Experiments with Truth!", 'story of my experiments with truth'),
+    ("  PELÉ ", 'pele'),
+    ("Crème brûlée", 'creme brulee'),
+    ("Rock & Roll", 'rock and roll'),
+    ("O’Brien's", 'obriens'),
+    ("1,000,000", '1000000'),
+    ("The", 'the'),
+    ("", ''),
+])
+def test_normalize_folds_case_accents_and_punctuation(text, expected):
+    assert normalize_answer(text) == expected
+
+
+def test_variants_split_parentheses_and_slashes():
+    assert answer_variants('Affordable Care Act (Obamacare)') == [
+        'Affordable Care Act (Obamacare)', 'Affordable Care Act', 'Obamacare']
+    # Notes and bare numbers in parentheses are not answers by themselves
+    assert answer_variants('Mount Everest (approx)') == ['Mount Everest (approx)', 'Mount Everest']
+    assert answer_variants('Apollo (11)') == ['Apollo (11)', 'Apollo']
+    assert answer_variants('Prime Minister / President of Cuba')[1:] == ['Prime Minister', 'President of Cuba']
+
+
+@pytest.mark.parametrize('answer, guess', [
+    ('Affordable Care Act (Obamacare)', 'obamacare'),
+    ('Affordable Care Act (Obamacare)', 'The Affordable Care Act'),
+    ('Prime Minister / President of Cuba', 'president of cuba'),
+    ('Mohandas Karamchand Gandhi', 'Mahatma Gandhi'),
+    ('Mohandas Karamchand Gandhi', 'Gandhi Mohandas Karamchand'),
+])
+def test_variants_aliases_and_word_order_are_accepted(index, answer, guess):
+    assert index.check(qid(answer), guess)
+
+
+@pytest.mark.parametrize('length, budget', [(1, 0), (4, 0), (5, 1), (9, 1), (10, 2), (19, 2), (20, 3), (60, 3)])
+def test_typo_budget_boundaries(length, budget):
+    assert typo_budget(length) == budget
+
+
+@pytest.mark.parametrize('answer, guess, correct', [
+    # 4 characters: no typos at all
+    ('Rome', 'rome', True),
+    ('Rome', 'rime', False),
+    # 6 characters: one
+    ('Lawyer', 'lawyr', True),
+    ('Lawyer', 'lwyr', False),
+    # 10 characters: two
+    ('Penicillin', 'penicilin', True),
+    ('Penicillin', 'penisilin', True),
+    ('Penicillin', 'penisilinn', False),
+    # 24 characters: three
+    ('Mohandas Karamchand Gandhi', 'mohandas karamchnd ghandi', True),
+    ('Mohandas Karamchand Gandhi', 'mohandas krmchnd gandi', False),
+])
+def test_typos_within_budget_only(index, answer, guess, correct):
+    assert index.check(qid(answer), guess) is correct
+    # Cached verdicts agree with fresh ones
+    assert index.check(qid(answer), guess) is correct
+
+
+def test_numbers_never_fuzz(index):
+    assert index.check(qid('1984'), '1984')
+    assert not index.check(qid('1984'), '1985')
+    assert not index.check(qid('1984'), '1948')
+    assert not index.check(qid('Apollo 11'), 'Apollo 12')
+    assert index.check(qid('Apollo 11'), 'Apolo 11')
+
+
+def test_another_questions_answer_is_never_fuzzed_into_a_match(index):
+    assert not index.check(qid('Penicillin'), 'Penicillium')
+    assert index.check(qid('Penicillium'), 'Penicillium')
+    assert not index.check(qid('Penicillin'), 'penicilin', fuzzy=False)
+
+
+def test_unknown_question_raises_key_error(index):
+    with pytest.raises(KeyError):
+        index.check(f"{IMAGE}#99", 'anything')
+
+
+@pytest.mark.parametrize('a, b, limit, expected', [
+    ('kitten', 'sitting', 3, 3),
+    ('kitten', 'sitting', 2, 3),
+    ('abcdef', 'ghijkl', 2, 3),
+    ('abc', 'abcdefg', 2, 3),
+    ('same', 'same', 0, 0),
+    ('', 'ab', 2, 2),
+])
+def test_bounded_distance_reports_over_budget(a, b, limit, expected):
+    assert bounded_distance(a, b, limit) == expected
+
+
+def test_bounded_distance_is_levenshtein_or_over_budget():
+    rng = random.Random(7)
+    for _ in range(2000):
+        a = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 12)))
+        b = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 12)))
+        limit = rng.randint(0, 4)
+        distance = levenshtein(a, b)
+        assert bounded_distance(a, b, limit) == (distance if distance <= limit else limit + 1), (a, b, limit)
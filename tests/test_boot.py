@@ -0,0 +1,62 @@
+"""A worker forked from the preloaded master serves its first /game from warm caches."""
+import http.client
+import os
+import re
+import subprocess
+import sys
+from urllib.parse import urlencode
+
+import pytest
+
+pytest.importorskip('gunicorn')
+
+import loadtest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CARD_MISSES = re.compile(r'^cache_misses_total\{cache="question_fragments"\} (\S+)$', re.MULTILINE)
+
+
+def card_misses(conn):
+    conn.request('GET', '/metrics')
+    return float(_CARD_MISSES.search(conn.getresponse().read().decode('utf-8')).group(1))
+
+
+def first_game_card_misses(tmp_path, preload):
+    """Question card cache misses while a lone worker serves its first /game"""
+    port = loadtest.free_port()
+    env = dict(os.environ, FAKE_FIRESTORE='1', FAKE_FIRESTORE_TEAMS='2', GUNICORN_PRELOAD=preload,
+               GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY='1', LOG_LEVEL='WARNING',
+               SECRET_KEY='test', GAME_DB_PATH=str(tmp_path / 'game.db'))
+    for name in ('FIREBASE_CREDENTIALS', 'FIREBASE_CREDENTIALS_PATH', 'FIREBASE_CREDENTIALS_JSON', 'METRICS_TOKEN'):
+        env.pop(name, None)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        loadtest.wait_until_serving(port, process, interval=0.05)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.request('POST', '/login', urlencode({'unique_code': 'code1'}),
+                     {'Content-Type': 'application/x-www-form-urlencoded'})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 302
+        cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        # One keep-alive connection, so every request reaches the same worker
+        before = card_misses(conn)
+        conn.request('GET', '/game/1', headers={'Cookie': cookie})
+        response = conn.getresponse()
+        assert b'data-qid=' in response.read()
+        after = card_misses(conn)
+        conn.close()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return after - before
+
+
+def test_preloaded_worker_renders_first_game_from_warm_cards(tmp_path):
+    assert first_game_card_misses(tmp_path, preload='1') == 0
+
+
+def test_worker_without_preload_renders_first_game_cold(tmp_path):
+    # The same check catches a cold worker, so the test above means something
+    assert first_game_card_misses(tmp_path, preload='0') > 0
@@ -0,0 +1,39 @@
+"""An exported team row's counters agree with its rounds, right after play."""
+import csv
+import io
+
+ADMIN = {'Authorization': 'Bearer admin'}
+
+
+def solve_first_question(game_app, code, team_name):
+    """Log in as code, start a round and answer its first question; returns the points"""
+    client = game_app.app.test_client()
+    assert client.post('/login', data={'unique_code': code}).status_code == 302
+    image = game_app.AVAILABLE_IMAGES[0]
+    assert client.get(f'/game/{image}').status_code == 200
+    game_round = game_app.LOCAL_STORE.current_round(team_name)
+    position = game_app.progress.positions(game_round['selected'])[0]
+    question = game_app.QUESTION_BANK.question(f"LAUGH/{image:03d}.jpg", position)
+    reply = client.post('/api/submit_answer', json={'question_id': question.qid, 'answer': question.answer}).json
+    assert reply['correct'] and reply['points'] > 0
+    return reply['points']
+
+
+def team_rows(game_app, query=''):
+    response = game_app.app.test_client().get(f'/admin/export{query}', headers=ADMIN)
+    assert response.status_code == 200
+    return [row for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))]
+
+
+def test_export_counters_include_rounds_not_yet_synced(game_app):
+    points = solve_first_question(game_app, 'code11', 'Team 11')
+    rows = [row for row in team_rows(game_app) if row['team'] == 'Team 11']
+    assert {int(row['total_points']) for row in rows} == {points}
+    assert {int(row['round_score']) for row in rows} == {points}
+
+
+def test_firestore_export_sends_the_outbox_first(game_app):
+    points = solve_first_question(game_app, 'code12', 'Team 12')
+    rows = [row for row in team_rows(game_app, '?source=firestore') if row['team'] == 'Team 12']
+    assert {int(row['total_points']) for row in rows} == {points}
+    assert {int(row['round_score']) for row in rows} == {points}
@@ -0,0 +1,18 @@
+"""Admin changes to teams in the local store."""
+from local_store import LocalStore
+
+
+def test_reset_scores_for_a_team_that_never_played_leaves_it_online(tmp_path):
+    store = LocalStore(str(tmp_path / 'game.db'))
+    store.add_counters('Team 1', total_points=30, wins=1)
+    rows = store.reset_counters(['Team 1', 'Team 2'])
+    assert [(row['team_name'], row['total_points'], row['status']) for row in rows] == [
+        ('Team 1', 0, 'online'), ('Team 2', 0, 'online')]
+    # Its first login keeps the row as it is
+    assert store.ensure_team('Team 2', 'code2')['status'] == 'online'
+
+
+def test_reset_scores_keeps_an_admin_set_offline_status(tmp_path):
+    store = LocalStore(str(tmp_path / 'game.db'))
+    store.set_status(['Team 1'], 'offline')
+    assert store.reset_counters(['Team 1'])[0]['status'] == 'offline'
@@ -0,0 +1,49 @@
+import logging
+import os
+
+import pytest
+
+from log_config import ProcessQueueHandler
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / 'app.log'
+    output = logging.StreamHandler(open(path, 'w'))
+    output.setFormatter(logging.Formatter('%(process)d %(message)s'))
+    handler = ProcessQueueHandler(output)
+    logger = logging.getLogger('test_log_config')
+    logger.propagate = False
+    logger.addHandler(handler)
+    yield logger, handler, path
+    logger.removeHandler(handler)
+    handler.stop()
+    output.stream.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_worker_starts_its_own_listener(log_file):
+    logger, handler, path = log_file
+    logger.warning("from the master")
+    pid = os.fork()
+    if pid == 0:
+        # A gunicorn worker forked from the preloaded master
+        try:
+            logger.warning("from the worker")
+            handler.stop()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    handler.stop()
+    lines = path.read_text().splitlines()
+    assert f"{os.getpid()} from the master" in lines
+    assert f"{pid} from the worker" in lines
+
+
+def test_records_after_stop_are_written_directly(log_file):
+    logger, handler, path = log_file
+    logger.warning("queued")
+    handler.stop()
+    logger.warning("after stop")
+    handler.output.flush()
+    assert path.read_text().split('\n')[:2] == [f"{os.getpid()} queued", f"{os.getpid()} after stop"]
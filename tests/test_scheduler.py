@@ -0,0 +1,90 @@
+"""Scheduler coverage and uniformity (the checks ``bench.py schedule`` prints)."""
+import random
+
+import pytest
+
+from scheduler import DIFFICULTY_MIX, Scheduler, allocate
+
+# Every image in data.json has five questions of each difficulty
+POSITIONS_BY_DIFFICULTY = {
+    'easy': [0, 1, 2, 3, 4],
+    'medium': [5, 6, 7, 8, 9],
+    'hard': [10, 11, 12, 13, 14],
+    'impossible': [15, 16, 17, 18, 19],
+}
+
+
+def chi_square(counts):
+    """Pearson statistic of counts against a uniform expectation"""
+    expected = sum(counts) / len(counts)
+    return sum((count - expected) ** 2 / expected for count in counts)
+
+
+def chi_square_limit(degrees):
+    """Upper 0.1% point of the chi-square distribution (Wilson-Hilferty approximation)"""
+    z = 3.090
+    return degrees * (1 - 2 / (9 * degrees) + z * (2 / (9 * degrees)) ** 0.5) ** 3
+
+
+# 245 images is the current bank; 600 goes through the Feistel network
+@pytest.mark.parametrize('image_count', [245, 600])
+def test_epochs_cover_every_image_once_and_never_reoffer_completed(image_count):
+    images = list(range(1, image_count + 1))
+    scheduler = Scheduler(images)
+    rng = random.Random(16)
+    for _ in range(20):
+        seed, cursor, completed = rng.getrandbits(62), 0, 0
+        for _ in range(2):
+            played = []
+            while True:
+                offered, cursor, new_epoch = scheduler.offer(seed, cursor, completed, 4)
+                if new_epoch:
+                    completed = 0
+                    break
+                assert offered
+                assert not any(completed >> image & 1 for image in offered)
+                image = rng.choice(offered)
+                played.append(image)
+                completed |= 1 << image
+            assert sorted(played) == images
+
+
+def test_first_offered_image_is_uniform_across_teams():
+    images = list(range(1, 61))
+    scheduler = Scheduler(images)
+    rng = random.Random(7)
+    first = {image: 0 for image in images}
+    for _ in range(len(images) * 40):
+        first[scheduler.offer(rng.getrandbits(62), 0, 0, 1)[0][0]] += 1
+    assert chi_square(list(first.values())) < chi_square_limit(len(images) - 1)
+
+
+def test_rounds_keep_the_difficulty_mix_and_dont_repeat_early():
+    scheduler = Scheduler(list(range(1, 61)))
+    available = {name: len(positions) for name, positions in POSITIONS_BY_DIFFICULTY.items()}
+    expected = allocate(10, available, DIFFICULTY_MIX)
+    difficulty_of = {p: name for name, positions in POSITIONS_BY_DIFFICULTY.items() for p in positions}
+    for team in range(50):
+        seen = {name: set() for name in POSITIONS_BY_DIFFICULTY}
+        for epoch in range(2):
+            chosen = scheduler.questions(team, epoch * 60, 'LAUGH/001.jpg', POSITIONS_BY_DIFFICULTY, 10)
+            assert len(set(chosen)) == len(chosen)
+            mix = {}
+            for position in chosen:
+                mix[difficulty_of[position]] = mix.get(difficulty_of[position], 0) + 1
+                seen[difficulty_of[position]].add(position)
+            assert mix == expected
+        # Two rounds draw 2 x slots per difficulty: all distinct, or all of them
+        for name, positions in seen.items():
+            assert len(positions) == min(2 * expected[name], available[name])
+
+
+def test_question_picks_are_uniform_within_each_difficulty():
+    scheduler = Scheduler(list(range(1, 61)))
+    counts = {}
+    for team in range(2000):
+        for position in scheduler.questions(team, 0, 'LAUGH/001.jpg', POSITIONS_BY_DIFFICULTY, 10):
+            counts[position] = counts.get(position, 0) + 1
+    for name, positions in POSITIONS_BY_DIFFICULTY.items():
+        picks = [counts.get(position, 0) for position in positions]
+        assert chi_square(picks) < chi_square_limit(len(picks) - 1), (name, picks)
@@ -0,0 +1,65 @@
+"""Leaderboard counters reach Firestore exactly once, even for a team's first sync."""
+import fake_firestore
+from fake_firestore import FakeFirestore
+from local_store import LocalStore
+from score_writer import ScoreWriter, document_id_for
+from storage import FirestoreStorage
+
+
+def leaderboard_docs(client):
+    return [snapshot.to_dict() for snapshot in client.collection('leaderboard').stream()]
+
+
+def test_new_team_is_created_once_and_only_deltas_are_added(tmp_path):
+    client = FakeFirestore()
+    store = LocalStore(str(tmp_path / 'game.db'))
+    writer = ScoreWriter(store, FirestoreStorage(lambda: client))
+    store.add_counters('Team 1', total_points=10, wins=1)
+    assert writer.flush() == 1
+    store.add_counters('Team 1', total_points=20, wins=1)
+    store.add_counters('Team 1', games_played=1)
+    assert writer.flush() == 1
+    assert store.get_team('Team 1')['firestore_id'] == document_id_for('Team 1')
+    assert leaderboard_docs(client) == [
+        {'name': 'Team 1', 'totalPoints': 30, 'wins': 2, 'gamesPlayed': 1, 'status': 'online'}]
+
+
+def test_two_workers_syncing_a_new_team_count_each_delta_once(tmp_path, monkeypatch):
+    client = FakeFirestore()
+    store = LocalStore(str(tmp_path / 'game.db'))
+    first = ScoreWriter(store, FirestoreStorage(lambda: client))
+    second = ScoreWriter(store, FirestoreStorage(lambda: client))
+    store.add_counters('Team 1', total_points=10, wins=1)
+
+    lookup = fake_firestore.Query.get
+    interleaved = []
+
+    def get(query):
+        result = lookup(query)
+        if not interleaved:
+            # The first worker found no document; before it commits, the team
+            # scores again and the second worker syncs that on its own
+            interleaved.append(True)
+            store.add_counters('Team 1', total_points=20, wins=1)
+            assert second.flush() == 1
+        return result
+
+    monkeypatch.setattr(fake_firestore.Query, 'get', get)
+    assert first.flush() == 1
+    assert store.outbox_size() == 0
+    assert leaderboard_docs(client) == [
+        {'name': 'Team 1', 'totalPoints': 30, 'wins': 2, 'gamesPlayed': 0, 'status': 'online'}]
+
+
+def test_a_batch_of_new_teams_stays_within_the_write_limit(tmp_path):
+    client = FakeFirestore()
+    store = LocalStore(str(tmp_path / 'game.db'))
+    writer = ScoreWriter(store, FirestoreStorage(lambda: client))
+    for number in range(600):
+        store.add_counters(f'Team {number}', total_points=10)
+    # The fake rejects batches of more than 500 writes, like Firestore
+    while writer.flush():
+        pass
+    assert store.outbox_size() == 0
+    assert writer.commits == 3
+    assert len(leaderboard_docs(client)) == 600
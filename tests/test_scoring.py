@@ -0,0 +1,83 @@
+"""A question scores once per team, however often (or concurrently) it is answered."""
+import threading
+
+
+def start_round(game_app, code, team_name):
+    """A logged-in test client with a round in progress; returns (client, first question)"""
+    client = game_app.app.test_client()
+    assert client.post('/login', data={'unique_code': code}).status_code == 302
+    image = game_app.AVAILABLE_IMAGES[0]
+    assert client.get(f'/game/{image}').status_code == 200
+    game_round = game_app.LOCAL_STORE.current_round(team_name)
+    position = game_app.progress.positions(game_round['selected'])[0]
+    return client, game_app.QUESTION_BANK.question(f"LAUGH/{image:03d}.jpg", position)
+
+
+def same_session(game_app, client):
+    """A second client (another tab, or a replay) with client's session cookie"""
+    other = game_app.app.test_client()
+    with client.session_transaction() as source:
+        data = dict(source)
+    with other.session_transaction() as session:
+        session.update(data)
+    return other
+
+
+def counters(game_app, team_name):
+    row = game_app.LOCAL_STORE.get_team(team_name)
+    return row['total_points'], row['wins']
+
+
+def firestore_counters(game_app, team_name):
+    """The team's Firestore document counters once the outbox is sent"""
+    while game_app.SCORE_WRITER.flush():
+        pass
+    snapshot = game_app.STORAGE.find_team(team_name)
+    return snapshot.get('totalPoints'), snapshot.get('wins')
+
+
+def answer(client, question):
+    return client.post('/api/submit_answer', json={'question_id': question.qid, 'answer': question.answer}).json
+
+
+def test_answering_twice_scores_once(game_app):
+    client, question = start_round(game_app, 'code13', 'Team 13')
+    before = counters(game_app, 'Team 13')
+    first = answer(client, question)
+    assert first['correct'] and first['points'] > 0
+    second = answer(same_session(game_app, client), question)
+    assert second == {'success': True, 'correct': True, 'already_solved': True, 'points': 0}
+    assert counters(game_app, 'Team 13') == (before[0] + first['points'], before[1] + 1)
+    assert firestore_counters(game_app, 'Team 13') == (before[0] + first['points'], before[1] + 1)
+
+
+def test_concurrent_answers_score_once(game_app, monkeypatch):
+    client, question = start_round(game_app, 'code14', 'Team 14')
+    clients = [client] + [same_session(game_app, client) for _ in range(3)]
+    before = counters(game_app, 'Team 14')
+    # Every request gets past the route's own "already solved" check before
+    # any of them scores, so only the store's transaction can stop a double
+    barrier = threading.Barrier(len(clients), timeout=10)
+    check = game_app.ANSWER_INDEX.check
+
+    def check_together(*args, **kwargs):
+        verdict = check(*args, **kwargs)
+        barrier.wait()
+        return verdict
+
+    monkeypatch.setattr(game_app.ANSWER_INDEX, 'check', check_together)
+    replies = [None] * len(clients)
+
+    def submit(i):
+        replies[i] = answer(clients[i], question)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(clients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scored = [reply for reply in replies if not reply.get('already_solved')]
+    assert len(scored) == 1 and scored[0]['points'] > 0
+    assert all(reply['correct'] and reply['points'] == 0 for reply in replies if reply.get('already_solved'))
+    assert counters(game_app, 'Team 14') == (before[0] + scored[0]['points'], before[1] + 1)
+    assert firestore_counters(game_app, 'Team 14') == (before[0] + scored[0]['points'], before[1] + 1)
@@ -0,0 +1,56 @@
+"""Open status streams never take the threads the other routes need."""
+import http.client
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+pytest.importorskip('gunicorn')
+
+import loadtest
+
+STREAM_SLOTS = 2
+STREAMS = 6
+
+
+def login(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('POST', '/login', urlencode({'unique_code': 'code1'}),
+                 {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 302
+    conn.close()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def test_routes_answer_while_more_streams_are_open_than_slots(tmp_path):
+    with loadtest.gunicorn(2, '0', WEB_CONCURRENCY='1', GUNICORN_THREADS='2',
+                           MAX_STATUS_STREAMS=str(STREAM_SLOTS), GAME_DB_PATH=str(tmp_path / 'game.db')) as port:
+        cookie = login(port)
+        streams = []
+        statuses = []
+        for _ in range(STREAMS):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('GET', '/api/status/stream', headers={'Cookie': cookie})
+            response = conn.getresponse()
+            statuses.append(response.status)
+            if response.status == 200:
+                assert response.getheader('Content-Type').startswith('text/event-stream')
+            else:
+                response.read()
+            streams.append(conn)
+        # The rest were told to poll rather than left waiting for a thread
+        assert sorted(statuses) == [200] * STREAM_SLOTS + [503] * (STREAMS - STREAM_SLOTS)
+
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        for path in ('/api/status', '/dashboard', '/api/status', '/image-select'):
+            start = time.perf_counter()
+            conn.request('GET', path, headers={'Cookie': cookie})
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 200, path
+            assert time.perf_counter() - start < 5, path
+        conn.close()
+        for stream in streams:
+            stream.close()